@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
-from .models import AdBanner
+from .models import AdBanner, AdEventBucket
 
 
 # Resource for import/export
@@ -162,3 +162,10 @@ class AdBannerAdmin(ImportExportModelAdmin):
             'all': ('admin/css/custom_admin.css',)
         }
 
+
+@admin.register(AdEventBucket)
+class AdEventBucketAdmin(admin.ModelAdmin):
+    list_display = ['banner', 'hour', 'impressions', 'clicks']
+    list_filter = ['hour']
+    search_fields = ['banner__title']
+    readonly_fields = ['banner', 'hour', 'impressions', 'clicks']
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AdvertisementsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'advertisements'
+
+    def ready(self):
+        # Register signal handlers (response cache invalidation)
+        from . import signals  # noqa: F401
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_placements(apps, schema_editor):
+    AdBanner = apps.get_model('advertisements', 'AdBanner')
+    BannerPlacement = apps.get_model('advertisements', 'BannerPlacement')
+
+    placements = []
+    deactivated = []
+    taken = set()
+    for banner in AdBanner.objects.order_by('id'):
+        locations = list(dict.fromkeys(banner.locations or []))
+        is_active = banner.is_active
+        if is_active and taken.intersection(locations):
+            # Banners saved before validation existed may overlap; the oldest keeps
+            # its spots and the others are deactivated, as clean() would require
+            is_active = False
+            deactivated.append(banner.id)
+        if is_active:
+            taken.update(locations)
+        placements.extend(
+            BannerPlacement(banner_id=banner.id, location=location, is_active=is_active)
+            for location in locations
+        )
+    AdBanner.objects.filter(id__in=deactivated).update(is_active=False)
+    BannerPlacement.objects.bulk_create(placements)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advertisements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BannerPlacement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(choices=[('home_between_sections', 'Home - Between Categories and Topics'), ('home_categories_grid', 'Home - Inside Categories Grid'), ('home_topics_list', 'Home - Inside Topics List'), ('sidebar_main', 'Sidebar - Between Popular Topics and Top Members'), ('category_header', 'Category Page - Between Header and Tabs'), ('category_topics_list', 'Category Page - Inside Topics List'), ('category_sidebar', 'Category Page - Sidebar Between Rules and Tags'), ('topic_before_replies', 'Topic Page - Between Active Users and Replies'), ('topic_sidebar', 'Topic Page - Sidebar After Thread Info')], max_length=50)),
+                ('is_active', models.BooleanField(default=True, help_text="Copy of the banner's is_active")),
+                ('banner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='placements', to='advertisements.adbanner')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', 'is_active'], name='banner_placement_location_idx')],
+                'constraints': [models.UniqueConstraint(fields=('banner', 'location'), name='banner_placement_unique'), models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('location',), name='banner_placement_one_active_per_location')],
+            },
+        ),
+        migrations.RunPython(populate_placements, migrations.RunPython.noop),
+    ]
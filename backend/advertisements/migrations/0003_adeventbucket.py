@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('advertisements', '0002_bannerplacement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdEventBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('impressions', models.IntegerField(default=0)),
+                ('clicks', models.IntegerField(default=0)),
+                ('banner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_buckets', to='advertisements.adbanner')),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour'], name='ad_event_bucket_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('banner', 'hour'), name='ad_event_bucket_unique_hour')],
+            },
+        ),
+    ]
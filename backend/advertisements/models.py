@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from cloudinary.models import CloudinaryField
+from forum.cache import ProcessLocalCache
 
 
 class AdBanner(models.Model):
@@ -87,29 +88,42 @@ class AdBanner(models.Model):
         
         # Validate locations uniqueness
         if self.locations and self.is_active:
-            # Check if any other active banner uses the same locations
-            conflicting_banners = AdBanner.objects.filter(
-                is_active=True
-            ).exclude(id=self.id)
+            # Active placements of other banners in the same locations (one indexed query)
+            conflicts = list(
+                BannerPlacement.objects.filter(location__in=self.locations, is_active=True)
+                .exclude(banner_id=self.id).select_related('banner').order_by('banner_id', 'location')
+            )
             
-            for banner in conflicting_banners:
-                if banner.locations:
-                    # Check for overlapping locations
-                    overlap = set(self.locations) & set(banner.locations)
-                    if overlap:
-                        location_names = [
-                            dict(self.LOCATION_CHOICES).get(loc, loc) 
-                            for loc in overlap
-                        ]
-                        raise ValidationError(
-                            f"Cannot activate banner: Location(s) {', '.join(location_names)} "
-                            f"already used by banner '{banner.title}'. "
-                            "Deactivate that banner first or choose different locations."
-                        )
+            if conflicts:
+                banner = conflicts[0].banner
+                location_names = [
+                    dict(self.LOCATION_CHOICES).get(placement.location, placement.location)
+                    for placement in conflicts if placement.banner_id == banner.id
+                ]
+                raise ValidationError(
+                    f"Cannot activate banner: Location(s) {', '.join(location_names)} "
+                    f"already used by banner '{banner.title}'. "
+                    "Deactivate that banner first or choose different locations."
+                )
     
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or {'locations', 'is_active'} & set(update_fields):
+                self.sync_placements()
+    
+    def sync_placements(self):
+        """Mirror ``locations`` and ``is_active`` into BannerPlacement rows"""
+        locations = set(self.locations or [])
+        self.placements.exclude(location__in=locations).delete()
+        self.placements.exclude(is_active=self.is_active).update(is_active=self.is_active)
+        existing = set(self.placements.values_list('location', flat=True))
+        BannerPlacement.objects.bulk_create([
+            BannerPlacement(banner=self, location=location, is_active=self.is_active)
+            for location in sorted(locations - existing)
+        ])
     
     @property
     def click_through_rate(self):
@@ -136,3 +150,69 @@ class AdBanner(models.Model):
             return self.video.url
         return None
 
+
+
+class BannerPlacement(models.Model):
+    """One location of a banner, mirrored from AdBanner.locations on save
+
+    Indexed per location so lookups and conflict checks are single queries;
+    the partial unique constraint allows one active banner per location.
+    """
+    banner = models.ForeignKey(AdBanner, on_delete=models.CASCADE, related_name='placements')
+    location = models.CharField(max_length=50, choices=AdBanner.LOCATION_CHOICES)
+    is_active = models.BooleanField(default=True, help_text="Copy of the banner's is_active")
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['banner', 'location'], name='banner_placement_unique'),
+            models.UniqueConstraint(
+                fields=['location'],
+                condition=models.Q(is_active=True),
+                name='banner_placement_one_active_per_location'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['location', 'is_active'], name='banner_placement_location_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.banner.title} @ {self.location}"
+
+
+class AdEventBucket(models.Model):
+    """Impressions and clicks of a banner during one hour (written by advertisements.tracking)"""
+    banner = models.ForeignKey(AdBanner, on_delete=models.CASCADE, related_name='event_buckets')
+    hour = models.DateTimeField(help_text="Start of the hour (UTC)")
+    impressions = models.IntegerField(default=0)
+    clicks = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-hour']
+        constraints = [
+            models.UniqueConstraint(fields=['banner', 'hour'], name='ad_event_bucket_unique_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='ad_event_bucket_hour_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.banner_id} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+def _load_banner_locations():
+    locations = {}
+    for location, banner_id in BannerPlacement.objects.filter(is_active=True).values_list(
+        'location', 'banner_id'
+    ).order_by('location', 'banner_id'):
+        locations.setdefault(location, []).append(banner_id)
+    return locations
+
+
+def _load_active_banner_ids():
+    return frozenset(AdBanner.objects.filter(is_active=True).values_list('id', flat=True))
+
+
+# location -> active banner IDs, reloaded after banner changes (see advertisements.signals)
+banner_locations = ProcessLocalCache('banner-locations', _load_banner_locations)
+# Every active banner, with or without locations (event tracking accepts these)
+active_banner_ids = ProcessLocalCache('active-banner-ids', _load_active_banner_ids)
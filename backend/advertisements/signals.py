@@ -0,0 +1,19 @@
+"""
+Signal handlers for the advertisements app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from forum import cache
+from .models import AdBanner, active_banner_ids, banner_locations
+
+
+@receiver(post_save, sender=AdBanner)
+@receiver(post_delete, sender=AdBanner)
+def invalidate_banner_responses(sender, update_fields=None, **kwargs):
+    # Impression/click tracking does not change the public payload
+    if update_fields and set(update_fields) <= {'impressions', 'clicks'}:
+        return
+    cache.invalidate('banners')
+    banner_locations.invalidate()
+    active_banner_ids.invalidate()
@@ -0,0 +1,83 @@
+"""
+Banner statistics computed in the database
+
+All-time numbers come from the AdBanner counters; a date range reads the
+hourly AdEventBucket rows instead. Every figure (totals, per location, per
+size, per day) is a single aggregate()/values().annotate() query. Banners
+placed in several locations count fully towards each of them.
+"""
+from django.db.models import Count, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+from .models import AdBanner, AdEventBucket, BannerPlacement
+
+
+def _ctr(impressions, clicks):
+    return round(clicks / impressions * 100, 2) if impressions else 0
+
+
+def _sum(field):
+    return Coalesce(Sum(field), Value(0), output_field=IntegerField())
+
+
+def _rows(queryset, key, label):
+    return [
+        {
+            label: row[key],
+            'impressions': row['impressions'],
+            'clicks': row['clicks'],
+            'ctr': _ctr(row['impressions'], row['clicks']),
+        }
+        for row in queryset
+    ]
+
+
+def banner_stats(start=None, end=None):
+    """Totals and breakdowns; ``start``/``end`` (datetimes, end exclusive) select the bucket range"""
+    banners = AdBanner.objects.aggregate(
+        total_banners=Count('id'),
+        active_banners=Count('id', filter=Q(is_active=True)),
+        total_impressions=_sum('impressions'),
+        total_clicks=_sum('clicks'),
+    )
+
+    if start is None and end is None:
+        by_location = BannerPlacement.objects.values('location').annotate(
+            impressions=_sum('banner__impressions'), clicks=_sum('banner__clicks')
+        ).order_by('location')
+        by_size = AdBanner.objects.values('size').annotate(
+            impressions=_sum('impressions'), clicks=_sum('clicks')
+        ).order_by('size')
+        stats = dict(banners)
+    else:
+        buckets = AdEventBucket.objects.all()
+        if start is not None:
+            buckets = buckets.filter(hour__gte=start)
+        if end is not None:
+            buckets = buckets.filter(hour__lt=end)
+
+        totals = buckets.aggregate(impressions=_sum('impressions'), clicks=_sum('clicks'))
+        by_location = buckets.values(location=F('banner__placements__location')).annotate(
+            impressions=_sum('impressions'), clicks=_sum('clicks')
+        ).exclude(location=None).order_by('location')
+        by_size = buckets.values(size=F('banner__size')).annotate(
+            impressions=_sum('impressions'), clicks=_sum('clicks')
+        ).order_by('size')
+        by_day = buckets.annotate(day=TruncDate('hour')).values('day').annotate(
+            impressions=_sum('impressions'), clicks=_sum('clicks')
+        ).order_by('day')
+
+        stats = {
+            'total_banners': banners['total_banners'],
+            'active_banners': banners['active_banners'],
+            'total_impressions': totals['impressions'],
+            'total_clicks': totals['clicks'],
+            'start': start,
+            'end': end,
+            'by_day': _rows(by_day, 'day', 'day'),
+        }
+
+    stats['average_ctr'] = _ctr(stats['total_impressions'], stats['total_clicks'])
+    stats['by_location'] = _rows(by_location, 'location', 'location')
+    stats['by_size'] = _rows(by_size, 'size', 'size')
+    return stats
@@ -1,3 +1,246 @@
+from datetime import date, datetime, timezone as dt_timezone
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .models import AdBanner, AdEventBucket, BannerPlacement, active_banner_ids
+from .stats import banner_stats
+from .tracking import AdEventBuffer
+
+
+def make_banner(title='Tyres', locations=('sidebar_main',), **kwargs):
+    banner = AdBanner(title=title, locations=list(locations), image='banners/tyres.jpg', **kwargs)
+    banner.save()
+    return banner
+
+
+class AdEventBufferTests(TestCase):
+    def setUp(self):
+        self.banner = make_banner()
+        self.other = make_banner('Oil', locations=['topic_sidebar'])
+
+    def test_flush_updates_totals_and_hourly_buckets(self):
+        buffer = AdEventBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.add(self.banner.id, 'impression', count=3)
+        buffer.add(self.banner.id, 'click')
+        buffer.add(self.other.id, 'impression')
+
+        self.assertEqual(buffer.flush(), 2)
+
+        self.banner.refresh_from_db()
+        self.assertEqual((self.banner.impressions, self.banner.clicks), (3, 1))
+        bucket = AdEventBucket.objects.get(banner=self.banner)
+        self.assertEqual((bucket.impressions, bucket.clicks), (3, 1))
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_events_of_deleted_banners_are_dropped(self):
+        buffer = AdEventBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.add(self.other.id, 'impression')
+        self.other.delete()
+
+        self.assertEqual(buffer.flush(), 0)
+        self.assertFalse(AdEventBucket.objects.exists())
+
+    def test_failed_flush_keeps_events_for_the_next_one(self):
+        buffer = AdEventBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.add(self.banner.id, 'impression', count=2)
+        buffer.add(self.other.id, 'click')
+
+        update = QuerySet.update
+        calls = []
+
+        def fail_third_update(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 3:
+                raise RuntimeError('database went away')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', fail_third_update):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+
+        self.banner.refresh_from_db()
+        self.assertEqual(self.banner.impressions, 0)
+        self.assertFalse(AdEventBucket.objects.exists())
+
+        buffer.flush()
+        self.banner.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.banner.impressions, self.other.clicks), (2, 1))
+        self.assertEqual(AdEventBucket.objects.count(), 2)
+
+
+class BannerPlacementTests(TestCase):
+    def test_active_banners_cannot_share_a_location(self):
+        make_banner(locations=['sidebar_main', 'topic_sidebar'])
+
+        with self.assertRaises(ValidationError):
+            make_banner('Oil', locations=['topic_sidebar'])
+
+        inactive = make_banner('Oil', locations=['topic_sidebar'], is_active=False)
+        self.assertFalse(inactive.placements.get().is_active)
+
+    def test_placements_follow_locations_and_activity(self):
+        banner = make_banner(locations=['sidebar_main', 'topic_sidebar'])
+        banner.locations = ['topic_sidebar', 'category_header']
+        banner.is_active = False
+        banner.save()
+
+        self.assertEqual(
+            set(banner.placements.values_list('location', 'is_active')),
+            {('topic_sidebar', False), ('category_header', False)}
+        )
+        make_banner('Oil', locations=['topic_sidebar'])
+
+    def test_database_allows_one_active_placement_per_location(self):
+        banner = make_banner()
+        other = make_banner('Oil', locations=['topic_sidebar'])
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BannerPlacement.objects.create(banner=other, location='sidebar_main', is_active=True)
+        self.assertTrue(banner.placements.get().is_active)
+
+    def test_migration_deactivates_banners_losing_a_location(self):
+        populate_placements = import_module('advertisements.migrations.0002_bannerplacement').populate_placements
+        # Overlapping banners saved before validation existed
+        oldest, loser, inactive = AdBanner.objects.bulk_create([
+            AdBanner(title='Tyres', locations=['sidebar_main'], image='banners/tyres.jpg'),
+            AdBanner(title='Oil', locations=['topic_sidebar', 'sidebar_main'], image='banners/oil.jpg'),
+            AdBanner(title='Wax', locations=['sidebar_main'], image='banners/wax.jpg', is_active=False),
+        ])
+
+        populate_placements(apps, None)
+
+        loser.refresh_from_db()
+        self.assertFalse(loser.is_active)
+        self.assertEqual(
+            set(BannerPlacement.objects.values_list('banner_id', 'location', 'is_active')),
+            {
+                (oldest.id, 'sidebar_main', True),
+                (loser.id, 'topic_sidebar', False),
+                (loser.id, 'sidebar_main', False),
+                (inactive.id, 'sidebar_main', False),
+            }
+        )
+
+
+class TrackingTests(TestCase):
+    def setUp(self):
+        self.banner = make_banner()
+        # Banners saved before locations were required may have none
+        self.unplaced = make_banner('Oil', locations=['topic_sidebar'])
+        AdBanner.objects.filter(pk=self.unplaced.pk).update(locations=[])
+        self.unplaced.placements.all().delete()
+        active_banner_ids.invalidate()
+        self.buffer = AdEventBuffer(flush_interval=3600, flush_threshold=1000)
+        patcher = mock.patch('advertisements.views.ad_events', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def track(self, *events):
+        return self.client.post('/api/advertisements/banners/track/', {'events': list(events)}, format='json')
+
+    def totals(self, banner):
+        self.buffer.flush()
+        banner.refresh_from_db()
+        return banner.impressions, banner.clicks
+
+    def test_impressions_can_be_aggregated_but_clicks_count_once(self):
+        response = self.track(
+            {'banner': self.banner.id, 'type': 'impression', 'count': 50},
+            {'banner': self.banner.id, 'type': 'click', 'count': 5},
+            {'banner': self.banner.id, 'type': 'click'},
+            {'banner': self.banner.id, 'type': 'click'},
+            {'banner': self.banner.id, 'type': 'impression', 'count': 51},
+        )
+
+        self.assertEqual(response.data['accepted'], 2)
+        self.assertEqual(self.totals(self.banner), (50, 1))
+
+    def test_active_banners_without_locations_can_be_tracked(self):
+        response = self.client.post(f'/api/advertisements/banners/{self.unplaced.id}/track_click/')
+        self.assertEqual(response.status_code, 200)
+        self.track({'banner': self.unplaced.id, 'type': 'impression'})
+
+        self.assertEqual(self.totals(self.unplaced), (1, 1))
+
+    def test_inactive_banners_are_not_tracked(self):
+        self.banner.is_active = False
+        self.banner.save()
+
+        response = self.client.post(f'/api/advertisements/banners/{self.banner.id}/track_impression/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.track({'banner': self.banner.id, 'type': 'impression'}).data['accepted'], 0)
+
+
+class BannerStatsTests(TestCase):
+    def setUp(self):
+        self.tyres = make_banner(
+            locations=['sidebar_main', 'topic_sidebar'], size='small', impressions=100, clicks=5
+        )
+        self.oil = make_banner(
+            'Oil', locations=['topic_sidebar'], is_active=False, impressions=50, clicks=0
+        )
+        for banner, hour, impressions, clicks in [
+            (self.tyres, datetime(2026, 3, 1, 10, tzinfo=dt_timezone.utc), 10, 1),
+            (self.tyres, datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc), 20, 2),
+            (self.oil, datetime(2026, 3, 5, 8, tzinfo=dt_timezone.utc), 30, 0),
+        ]:
+            AdEventBucket.objects.create(banner=banner, hour=hour, impressions=impressions, clicks=clicks)
+
+    def admin_client(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', 'admin@example.com', is_staff=True))
+        return client
+
+    def test_all_time_stats_use_the_banner_counters(self):
+        stats = banner_stats()
+
+        self.assertEqual(stats['total_banners'], 2)
+        self.assertEqual(stats['active_banners'], 1)
+        self.assertEqual((stats['total_impressions'], stats['total_clicks']), (150, 5))
+        self.assertEqual(stats['average_ctr'], 3.33)
+        self.assertEqual(stats['by_location'], [
+            {'location': 'sidebar_main', 'impressions': 100, 'clicks': 5, 'ctr': 5.0},
+            {'location': 'topic_sidebar', 'impressions': 150, 'clicks': 5, 'ctr': 3.33},
+        ])
+        self.assertEqual(
+            [(row['size'], row['impressions']) for row in stats['by_size']],
+            [('medium', 50), ('small', 100)]
+        )
+        self.assertNotIn('by_day', stats)
+
+    def test_date_range_reads_the_hourly_buckets(self):
+        client = self.admin_client()
+
+        response = client.get('/api/advertisements/banners/stats/?start=2026-03-01&end=2026-03-02')
+
+        self.assertEqual(response.status_code, 200)
+        stats = response.data
+        self.assertEqual((stats['total_impressions'], stats['total_clicks']), (30, 3))
+        self.assertEqual(stats['total_banners'], 2)
+        self.assertEqual(
+            [(row['day'], row['impressions'], row['clicks']) for row in stats['by_day']],
+            [(date(2026, 3, 1), 10, 1), (date(2026, 3, 2), 20, 2)]
+        )
+        self.assertEqual(
+            [(row['location'], row['impressions']) for row in stats['by_location']],
+            [('sidebar_main', 30), ('topic_sidebar', 30)]
+        )
+        self.assertEqual([row['size'] for row in stats['by_size']], ['small'])
+
+    def test_invalid_range_is_rejected(self):
+        client = self.admin_client()
+
+        response = client.get('/api/advertisements/banners/stats/?start=March')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
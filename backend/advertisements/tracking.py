@@ -0,0 +1,137 @@
+"""
+Buffered ad impression and click tracking
+
+Events are counted in process memory per (banner, hour) and written in
+batches: every flush shifts AdBanner.impressions/clicks with ``F()``
+increments (one UPDATE per distinct increment) and adds the same counts to
+the banner's hourly AdEventBucket row, all in one transaction. No banner is
+loaded or saved on the request path and concurrent events are never lost to
+read-modify-write races.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from forum.periodic import PeriodicFlush
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('impression', 'click')
+
+
+def current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+class AdEventBuffer:
+    """Collect ad events per banner and hour and flush them periodically
+
+    Same flushing rules as forum.view_counter.ViewCounterBuffer: on the first
+    add() after ``flush_interval`` seconds or once ``flush_threshold`` events
+    are pending. An interval of 0 writes every event immediately. With
+    ``periodic`` a background thread also flushes every ``flush_interval``
+    seconds.
+    """
+
+    def __init__(self, flush_interval, flush_threshold, periodic=False):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0, 0])
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._timer = PeriodicFlush(self.flush, flush_interval, 'ad-events') if periodic else None
+
+    def add(self, banner_id, event_type, count=1):
+        """Record ``count`` impressions or clicks for a banner"""
+        index = EVENT_TYPES.index(event_type)
+        if self._timer is not None:
+            self._timer.ensure_started()
+        with self._lock:
+            self._pending[(banner_id, current_hour())][index] += count
+            self._pending_total += count
+            due = (
+                self._pending_total >= self.flush_threshold
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write all pending events; returns the number of banners updated"""
+        from .models import AdBanner, AdEventBucket
+
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0, 0])
+            self._pending_total = 0
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        try:
+            # Banners deleted since the events were recorded are dropped
+            existing = set(AdBanner.objects.filter(
+                pk__in={banner_id for banner_id, hour in pending}
+            ).values_list('pk', flat=True))
+            pending = {key: counts for key, counts in pending.items() if key[0] in existing}
+
+            totals = defaultdict(lambda: [0, 0])
+            for (banner_id, hour), (impressions, clicks) in pending.items():
+                totals[banner_id][0] += impressions
+                totals[banner_id][1] += clicks
+
+            # One UPDATE per distinct increment keeps the statement count low
+            banners_by_delta = defaultdict(list)
+            for banner_id, (impressions, clicks) in totals.items():
+                banners_by_delta[(impressions, clicks)].append(banner_id)
+            buckets_by_delta = defaultdict(list)
+            for (banner_id, hour), (impressions, clicks) in pending.items():
+                buckets_by_delta[(hour, impressions, clicks)].append(banner_id)
+
+            with transaction.atomic():
+                for (impressions, clicks), banner_ids in banners_by_delta.items():
+                    AdBanner.objects.filter(pk__in=banner_ids).update(
+                        impressions=F('impressions') + impressions, clicks=F('clicks') + clicks
+                    )
+                AdEventBucket.objects.bulk_create(
+                    [AdEventBucket(banner_id=banner_id, hour=hour) for banner_id, hour in pending],
+                    ignore_conflicts=True
+                )
+                for (hour, impressions, clicks), banner_ids in buckets_by_delta.items():
+                    AdEventBucket.objects.filter(hour=hour, banner_id__in=banner_ids).update(
+                        impressions=F('impressions') + impressions, clicks=F('clicks') + clicks
+                    )
+        except Exception:
+            # Keep the events for the next flush rather than dropping them
+            with self._lock:
+                for key, (impressions, clicks) in pending.items():
+                    self._pending[key][0] += impressions
+                    self._pending[key][1] += clicks
+                    self._pending_total += impressions + clicks
+            raise
+
+        return len(totals)
+
+
+ad_events = AdEventBuffer(
+    flush_interval=settings.AD_EVENT_FLUSH_INTERVAL,
+    flush_threshold=settings.AD_EVENT_FLUSH_THRESHOLD,
+    periodic=True,
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        ad_events.flush()
+    except Exception:
+        logger.exception('Flushing buffered ad events on exit failed')
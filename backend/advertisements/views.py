@@ -1,9 +1,22 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
-from .models import AdBanner
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from forum.cache import cache_anonymous_response
+from .models import AdBanner, active_banner_ids, banner_locations
 from .serializers import AdBannerSerializer, AdBannerPublicSerializer
+from .stats import banner_stats
+from .tracking import EVENT_TYPES, ad_events
+
+# Limits for one batched tracking request: impressions may be aggregated,
+# clicks are counted once per banner, as with track_click
+MAX_TRACKED_EVENTS = 100
+MAX_EVENT_COUNT = {'impression': 50, 'click': 1}
 
 
 class AdBannerViewSet(viewsets.ReadOnlyModelViewSet):
@@ -21,55 +34,112 @@ class AdBannerViewSet(viewsets.ReadOnlyModelViewSet):
             return AdBannerSerializer
         return AdBannerPublicSerializer
     
+    @method_decorator(cache_anonymous_response('banners'))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     def get_queryset(self):
         """Filter banners by location if specified"""
         queryset = super().get_queryset()
         location = self.request.query_params.get('location', None)
         
         if location:
-            # Filter banners that have this location in their locations list
-            # Using Python filtering since SQLite doesn't support JSON contains
-            all_banners = list(queryset)
-            filtered_banners = [
-                banner for banner in all_banners 
-                if banner.locations and location in banner.locations
-            ]
-            # Return the filtered list as queryset
-            banner_ids = [b.id for b in filtered_banners]
-            queryset = queryset.filter(id__in=banner_ids)
+            # Active banner IDs per location come from the cached placement map
+            queryset = queryset.filter(id__in=banner_locations.get().get(location, []))
         
         return queryset
     
+    def _track(self, pk, event_type):
+        """Buffer one event for an active banner (see advertisements.tracking)"""
+        try:
+            banner_id = int(pk)
+        except (TypeError, ValueError):
+            banner_id = None
+        if banner_id not in active_banner_ids.get():
+            return Response({'error': 'Banner not found'}, status=status.HTTP_404_NOT_FOUND)
+        ad_events.add(banner_id, event_type)
+        return None
+    
     @action(detail=True, methods=['post'], permission_classes=[])
     def track_impression(self, request, pk=None):
         """Track when a banner is displayed"""
-        banner = self.get_object()
-        banner.impressions += 1
-        banner.save(update_fields=['impressions'])
-        return Response({'status': 'impression tracked'})
+        return self._track(pk, 'impression') or Response({'status': 'impression tracked'})
     
     @action(detail=True, methods=['post'], permission_classes=[])
     def track_click(self, request, pk=None):
         """Track when a banner is clicked"""
-        banner = self.get_object()
-        banner.clicks += 1
-        banner.save(update_fields=['clicks'])
-        return Response({'status': 'click tracked'})
+        return self._track(pk, 'click') or Response({'status': 'click tracked'})
+    
+    @action(detail=False, methods=['post'], permission_classes=[])
+    def track(self, request):
+        """
+        Track a batch of events in one request:
+        {"events": [{"banner": 1, "type": "impression", "count": 1}, ...]}
+        Events for unknown or inactive banners are skipped; a click counts
+        once per banner and request, an impression count may be up to
+        MAX_EVENT_COUNT.
+        """
+        events = request.data.get('events')
+        if not isinstance(events, list) or len(events) > MAX_TRACKED_EVENTS:
+            return Response(
+                {'error': f'events must be a list of at most {MAX_TRACKED_EVENTS} items'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        active_ids = active_banner_ids.get()
+        clicked = set()
+        accepted = 0
+        for event in events:
+            if not isinstance(event, dict) or event.get('type') not in EVENT_TYPES:
+                continue
+            try:
+                banner_id = int(event.get('banner'))
+                count = int(event.get('count', 1))
+            except (TypeError, ValueError):
+                continue
+            if banner_id not in active_ids or not 0 < count <= MAX_EVENT_COUNT[event['type']]:
+                continue
+            if event['type'] == 'click':
+                if banner_id in clicked:
+                    continue
+                clicked.add(banner_id)
+            ad_events.add(banner_id, event['type'], count)
+            accepted += 1
+        
+        return Response({'status': 'tracked', 'accepted': accepted})
     
     @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
     def stats(self, request):
-        """Get overall statistics for all banners"""
-        all_banners = AdBanner.objects.all()
+        """
+        Get overall statistics for all banners, broken down by location and size.
+        Optional ?start=&end= (ISO dates or datetimes, end inclusive for dates)
+        report the events in that range from the hourly buckets, plus a per-day series.
+        """
+        try:
+            start = _parse_range_param(request.query_params.get('start'))
+            end = _parse_range_param(request.query_params.get('end'), end=True)
+        except ValueError:
+            return Response(
+                {'error': 'start and end must be ISO dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        total_impressions = sum(b.impressions for b in all_banners)
-        total_clicks = sum(b.clicks for b in all_banners)
-        avg_ctr = (total_clicks / total_impressions * 100) if total_impressions > 0 else 0
-        
-        return Response({
-            'total_banners': all_banners.count(),
-            'active_banners': all_banners.filter(is_active=True).count(),
-            'total_impressions': total_impressions,
-            'total_clicks': total_clicks,
-            'average_ctr': round(avg_ctr, 2)
-        })
+        return Response(banner_stats(start, end))
+
 
+def _parse_range_param(value, end=False):
+    """Parse a date/datetime query parameter; a plain end date includes that whole day"""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, time.min)
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
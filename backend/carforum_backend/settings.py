@@ -141,6 +141,78 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local-memory cache by default. Set CACHE_URL to share the cache between
+# workers, e.g. redis://localhost:6379/1 (requires the redis package) or
+# file:///var/tmp/carforum_cache
+
+CACHE_URL = config('CACHE_URL', default='')
+
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith('file://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL[len('file://'):],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'carforum',
+        }
+    }
+
+# Seconds anonymous API responses stay cached (invalidated early on model changes)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Topic views are buffered in memory and written every N seconds (also from a
+# background thread) or once M views are pending (see forum.view_counter).
+# An interval of 0 writes each view.
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=10, cast=int)
+VIEW_COUNT_FLUSH_THRESHOLD = config('VIEW_COUNT_FLUSH_THRESHOLD', default=200, cast=int)
+
+# Ad impressions/clicks are buffered the same way (see advertisements.tracking)
+AD_EVENT_FLUSH_INTERVAL = config('AD_EVENT_FLUSH_INTERVAL', default=10, cast=int)
+AD_EVENT_FLUSH_THRESHOLD = config('AD_EVENT_FLUSH_THRESHOLD', default=500, cast=int)
+
+# Queue gamification work (XP, badges, streaks) in an outbox table instead of
+# running it inside the request; drain it with
+# `python manage.py process_gamification_events --loop`
+GAMIFICATION_ASYNC = config('GAMIFICATION_ASYNC', default=False, cast=bool)
+
+# Seconds a worker keeps its leaderboard rank snapshot before reloading it
+LEADERBOARD_SNAPSHOT_TTL = config('LEADERBOARD_SNAPSHOT_TTL', default=60, cast=int)
+
+# Following feed (see forum.feed): topics by authors with more followers than
+# this are read at request time instead of being copied into every feed
+FEED_FANOUT_MAX_FOLLOWERS = config('FEED_FANOUT_MAX_FOLLOWERS', default=1000, cast=int)
+# Topics copied into a feed when the user follows someone: 0 copies all of
+# them; a limit keeps only that many recent topics (older ones leave the feed)
+FEED_BACKFILL_LIMIT = config('FEED_BACKFILL_LIMIT', default=0, cast=int)
+# Queue new topics and copy them into followers' feeds with
+# `python manage.py process_feed_fan_out --loop` instead of during the post
+FEED_FANOUT_ASYNC = config('FEED_FANOUT_ASYNC', default=False, cast=bool)
+
+# Image uploads (see forum.uploads): storage backend class
+# (forum.storage.LocalImageStorage keeps files under MEDIA_ROOT, for tests),
+# and threads used to upload several images at once. With IMAGE_UPLOAD_ASYNC
+# files are staged to IMAGE_UPLOAD_STAGING_DIR and uploaded by
+# `python manage.py process_image_uploads --loop`
+IMAGE_UPLOAD_STORAGE = config('IMAGE_UPLOAD_STORAGE', default='forum.storage.CloudinaryImageStorage')
+IMAGE_UPLOAD_ASYNC = config('IMAGE_UPLOAD_ASYNC', default=False, cast=bool)
+IMAGE_UPLOAD_STAGING_DIR = config('IMAGE_UPLOAD_STAGING_DIR', default=str(BASE_DIR / 'upload_staging'))
+IMAGE_UPLOAD_WORKERS = config('IMAGE_UPLOAD_WORKERS', default=4, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -3,7 +3,7 @@ from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 from .models import (
     Category, CategoryRule, Tag, Topic, Reply, UserProfile, ReportReason, Report, Bookmark,
-    TopicImage, Poll, PollOption, PollVote, ReplyImage, SiteSettings
+    TopicImage, Poll, PollOption, PollVote, ReplyImage, SiteSettings, UserStats, ImageUpload
 )
 
 
@@ -136,10 +136,10 @@ class TagAdmin(ImportExportModelAdmin):
 @admin.register(Topic)
 class TopicAdmin(ImportExportModelAdmin):
     resource_class = TopicResource
-    list_display = ['title', 'author', 'category', 'replies_count', 'likes_count', 'views', 'created_at', 'updated_at']
+    list_display = ['title', 'author', 'category', 'replies_count', 'likes_count', 'bookmarks_count', 'views', 'created_at', 'updated_at']
     list_filter = ['category', 'created_at']
     search_fields = ['title', 'content', 'author__username']
-    readonly_fields = ['views', 'created_at', 'updated_at', 'likes_list']
+    readonly_fields = ['views', 'replies_count', 'likes_count', 'bookmarks_count', 'created_at', 'updated_at', 'likes_list']
     filter_horizontal = ['likes']
     fieldsets = (
         (None, {
@@ -147,10 +147,6 @@ class TopicAdmin(ImportExportModelAdmin):
         }),
     )
     
-    def likes_count(self, obj):
-        return obj.likes.count()
-    likes_count.short_description = 'Likes'
-    
     def likes_list(self, obj):
         """Show all users who liked this topic"""
         users = obj.likes.all()
@@ -176,6 +172,13 @@ class UserProfileAdmin(ImportExportModelAdmin):
     search_fields = ['user__username', 'user__email']
 
 
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'topics_count', 'replies_count', 'likes_given', 'likes_received', 'followers_count', 'following_count']
+    search_fields = ['user__username']
+    readonly_fields = ['user', 'topics_count', 'replies_count', 'likes_given', 'likes_received', 'followers_count', 'following_count']
+
+
 @admin.register(Bookmark)
 class BookmarkAdmin(ImportExportModelAdmin):
     resource_class = BookmarkResource
@@ -234,8 +237,8 @@ class ReportAdmin(ImportExportModelAdmin):
 @admin.register(TopicImage)
 class TopicImageAdmin(ImportExportModelAdmin):
     resource_class = TopicImageResource
-    list_display = ['topic', 'caption', 'order', 'created_at']
-    list_filter = ['created_at']
+    list_display = ['topic', 'caption', 'order', 'status', 'created_at']
+    list_filter = ['status', 'created_at']
     search_fields = ['topic__title', 'caption']
     readonly_fields = ['created_at']
 
@@ -275,12 +278,20 @@ class PollVoteAdmin(ImportExportModelAdmin):
 
 @admin.register(ReplyImage)
 class ReplyImageAdmin(admin.ModelAdmin):
-    list_display = ['reply', 'caption', 'order', 'created_at']
-    list_filter = ['created_at']
+    list_display = ['reply', 'caption', 'order', 'status', 'created_at']
+    list_filter = ['status', 'created_at']
     search_fields = ['caption', 'reply__content']
     readonly_fields = ['created_at']
 
 
+@admin.register(ImageUpload)
+class ImageUploadAdmin(admin.ModelAdmin):
+    list_display = ['target', 'object_id', 'status', 'attempts', 'created_at', 'processed_at']
+    list_filter = ['status', 'target']
+    readonly_fields = ['staged_path', 'error', 'created_at', 'claimed_at', 'processed_at']
+    ordering = ['-id']
+
+
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(admin.ModelAdmin):
     """Admin interface for site-wide settings (Singleton)"""
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    """Migrations that rebuild forum_topic drop the search triggers; put them back"""
+    from .search import ensure_search_index
+
+    ensure_search_index(using)
 
 
 class ForumConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'forum'
+
+    def ready(self):
+        # Register signal handlers that keep denormalized counters in sync
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(restore_search_index, sender=self)
@@ -7,7 +7,7 @@ from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from .serializers import UserSerializer, UserProfileSerializer
 from .models import UserProfile
-from gamification.services import GamificationService
+from gamification.events import dispatch as dispatch_gamification_event
 
 
 @api_view(['POST'])
@@ -140,8 +140,8 @@ def login(request):
         if not hasattr(authenticated_user, 'profile'):
             UserProfile.objects.create(user=authenticated_user)
 
-        # Update daily streak (runs in background, no need to return)
-        GamificationService.update_daily_streak(authenticated_user)
+        # Update daily streak (queued when GAMIFICATION_ASYNC is enabled)
+        dispatch_gamification_event('daily_login', authenticated_user)
 
         return Response({
             'access': str(refresh.access_token),
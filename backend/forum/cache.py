@@ -0,0 +1,133 @@
+"""
+Caching helpers: anonymous API response cache and process-local snapshots
+
+Cached data is grouped into namespaces (e.g. 'topics', 'categories').
+Every namespace has a version stamp stored in the cache; it is part of each
+cache key, so invalidating a namespace only needs to replace its stamp and
+works on any cache backend (no key scanning). Stamps are bumped by the model
+signal handlers in forum.signals and advertisements.signals, and by writers
+that bypass signals (forum.toggles).
+
+Topic view counts are the exception: they are flushed every few seconds
+(see forum.view_counter), so cached topic lists are not dropped for them and
+may show views up to RESPONSE_CACHE_TIMEOUT old.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+
+KEY_PREFIX = 'response-cache'
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:version:{namespace}'
+
+
+def _new_version():
+    return str(time.time_ns())
+
+
+def get_versions(namespaces):
+    """Return the current version stamp of each namespace, creating missing ones"""
+    keys = [_version_key(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [str(versions[key]) for key in keys]
+
+
+def invalidate(*namespaces):
+    """Drop every cached response in the given namespaces"""
+    cache.set_many({_version_key(namespace): _new_version() for namespace in namespaces}, timeout=None)
+
+
+def _response_key(namespaces, request):
+    """Build a cache key from the namespace versions, host, path and query parameters"""
+    query = sorted(
+        (key, value) for key, values in request.query_params.lists() for value in values
+    )
+    raw = '|'.join([
+        ','.join(get_versions(namespaces)),
+        request.get_host(),
+        request.path,
+        repr(query),
+    ])
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f"{KEY_PREFIX}:{'.'.join(namespaces)}:{digest}"
+
+
+def cache_anonymous_response(*namespaces, timeout=None):
+    """Cache successful GET responses for anonymous users
+
+    Authenticated users always get a fresh response since payloads may
+    include viewer-specific fields. Use method_decorator() for viewset methods.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+
+            key = _response_key(namespaces, request)
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+                response['X-Response-Cache'] = 'HIT'
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and response.data is not None:
+                cache_timeout = timeout if timeout is not None else settings.RESPONSE_CACHE_TIMEOUT
+                cache.set(key, response.data, cache_timeout)
+                response['X-Response-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+class ProcessLocalCache:
+    """Keep a value in process memory until its shared version stamp changes
+
+    Reads cost a single cache lookup and no database query. The stamp lives
+    in the Django cache so every worker notices invalidate(); with the
+    default per-process local-memory backend other workers may keep a stale
+    copy for at most ``max_age`` seconds.
+    """
+
+    def __init__(self, name, loader, max_age=60):
+        self.name = f'local:{name}'
+        self.loader = loader
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._expires_at = 0
+
+    def get(self):
+        version = get_versions([self.name])[0]
+        if self._version == version and time.monotonic() < self._expires_at:
+            return self._value
+
+        with self._lock:
+            if self._version != version or time.monotonic() >= self._expires_at:
+                self._value = self.loader()
+                self._version = version
+                self._expires_at = time.monotonic() + self.max_age
+            return self._value
+
+    def peek(self):
+        """Return the value held by this process without loading it (None if not loaded)"""
+        return self._value
+
+    def invalidate(self):
+        """Force every process to reload the value on its next read"""
+        invalidate(self.name)
+        self._version = None
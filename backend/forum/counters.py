@@ -0,0 +1,122 @@
+"""
+Helpers to keep the denormalized Topic/Reply counters and UserStats rollups in
+sync with their source tables
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+TOPIC_COUNTER_FIELDS = ('replies_count', 'likes_count', 'bookmarks_count')
+USER_STATS_FIELDS = (
+    'topics_count', 'replies_count', 'likes_given', 'likes_received',
+    'followers_count', 'following_count',
+)
+
+
+def _count_subquery(queryset, topic_field='topic'):
+    """Correlated COUNT(*) subquery for rows pointing at the outer row (a topic by default)"""
+    counts = queryset.filter(**{topic_field: OuterRef('pk')}).order_by().values(topic_field).annotate(
+        total=Count('pk')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def topic_counter_expressions(fields=TOPIC_COUNTER_FIELDS):
+    """Build the UPDATE expressions that recompute the given Topic counters"""
+    from .models import Bookmark, Reply, Topic
+
+    expressions = {
+        'replies_count': lambda: _count_subquery(Reply.objects.filter(is_hidden=False)),
+        'likes_count': lambda: _count_subquery(Topic.likes.through.objects.all()),
+        'bookmarks_count': lambda: _count_subquery(Bookmark.objects.all()),
+    }
+    return {field: expressions[field]() for field in fields}
+
+
+def refresh_topic_counters(topic_ids=None, fields=TOPIC_COUNTER_FIELDS):
+    """Recompute counters for the given topics (or all topics) in a single UPDATE
+
+    Returns the number of topic rows updated.
+    """
+    from .models import Topic
+
+    queryset = Topic.objects.all()
+    if topic_ids is not None:
+        topic_ids = [topic_id for topic_id in topic_ids if topic_id is not None]
+        if not topic_ids:
+            return 0
+        queryset = queryset.filter(pk__in=topic_ids)
+
+    # QuerySet.update() leaves updated_at alone, so counters never reorder the topic list
+    return queryset.update(**topic_counter_expressions(fields))
+
+
+def refresh_reply_likes(reply_ids=None):
+    """Recompute Reply.likes_count for the given replies (or all replies) in a single UPDATE"""
+    from .models import Reply
+
+    queryset = Reply.objects.all()
+    if reply_ids is not None:
+        reply_ids = [reply_id for reply_id in reply_ids if reply_id is not None]
+        if not reply_ids:
+            return 0
+        queryset = queryset.filter(pk__in=reply_ids)
+
+    return queryset.update(likes_count=_count_subquery(Reply.likes.through.objects.all(), 'reply'))
+
+
+def user_stats_expressions(fields=USER_STATS_FIELDS):
+    """Build the UPDATE expressions that recompute the given UserStats fields"""
+    from .models import Follow, Reply, Topic
+
+    TopicLikes = Topic.likes.through
+    ReplyLikes = Reply.likes.through
+    expressions = {
+        'topics_count': lambda: _count_subquery(Topic.objects.all(), 'author'),
+        'replies_count': lambda: _count_subquery(Reply.objects.filter(is_hidden=False), 'author'),
+        'likes_given': lambda: (
+            _count_subquery(TopicLikes.objects.all(), 'user')
+            + _count_subquery(ReplyLikes.objects.all(), 'user')
+        ),
+        'likes_received': lambda: (
+            _count_subquery(TopicLikes.objects.all(), 'topic__author')
+            + _count_subquery(ReplyLikes.objects.all(), 'reply__author')
+        ),
+        'followers_count': lambda: _count_subquery(Follow.objects.all(), 'following'),
+        'following_count': lambda: _count_subquery(Follow.objects.all(), 'follower'),
+    }
+    return {field: expressions[field]() for field in fields}
+
+
+def ensure_user_stats(user_ids):
+    """Create missing UserStats rows (zeroed) for the given users"""
+    from .models import UserStats
+
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in user_ids], ignore_conflicts=True
+    )
+
+
+def refresh_user_stats(user_ids, fields=USER_STATS_FIELDS):
+    """Recompute the given stats for the given users in a single UPDATE
+
+    Returns the number of UserStats rows updated.
+    """
+    from .models import UserStats
+
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return 0
+
+    ensure_user_stats(user_ids)
+    return UserStats.objects.filter(pk__in=user_ids).update(**user_stats_expressions(fields))
+
+
+def adjust_user_stats(user_id, **deltas):
+    """Shift a user's stats by relative amounts (``likes_given=1``) without recounting"""
+    from .models import UserStats
+
+    ensure_user_stats([user_id])
+    return UserStats.objects.filter(pk=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
@@ -0,0 +1,146 @@
+"""
+"Following topics" feed
+
+Fan-out on write: when a user posts a topic, a FeedEntry is written for each
+of their followers, so reading a feed is a range scan of one indexed table
+instead of an ``author_id IN (...)`` query over all topics. With
+FEED_FANOUT_ASYNC the new topic is only queued (PendingFanOut) and the
+process_feed_fan_out command writes the entries, so posting does not pay for
+the followers' rows. Following someone backfills their topics (all of them,
+or the most recent FEED_BACKFILL_LIMIT when that is set; older ones then do
+not appear in the feed), unfollowing removes them again.
+
+Authors with more than FEED_FANOUT_MAX_FOLLOWERS followers are not fanned
+out (one post would write that many rows); their topics are merged into
+their followers' feeds at read time instead. When such an author drops back
+to the limit, their topics are copied into every follower's feed, so
+the topics they posted meanwhile do not disappear from those feeds.
+
+Feeds are ordered by the topic's (created_at, id), the same key whether
+they are served from FeedEntry or from Topic, so cursors work on both.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, PendingFanOut, Topic, UserStats
+
+FEED_ORDERING = '-created_at'
+
+
+def is_high_fanout(user_id):
+    """Whether the author has too many followers to fan out to"""
+    return UserStats.objects.filter(
+        pk=user_id, followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def _entries(user_ids, topics):
+    return [
+        FeedEntry(user_id=user_id, topic_id=topic.id, author_id=topic.author_id, created_at=topic.created_at)
+        for user_id in user_ids
+        for topic in topics
+    ]
+
+
+def _backfilled_topics(author_id, limit=None):
+    """The author's topics to copy into a feed, newest first (FEED_BACKFILL_LIMIT of them if set)"""
+    limit = settings.FEED_BACKFILL_LIMIT if limit is None else limit
+    topics = Topic.objects.filter(author_id=author_id).order_by('-created_at', '-id').only(
+        'id', 'author_id', 'created_at'
+    )
+    return list(topics[:limit] if limit else topics)
+
+
+def on_topic_created(topic):
+    """Fan a new topic out now, or queue it when FEED_FANOUT_ASYNC is enabled"""
+    if settings.FEED_FANOUT_ASYNC:
+        PendingFanOut.objects.create(topic=topic)
+        return 0
+    return fan_out(topic)
+
+
+def process_pending(batch_size=100):
+    """Fan out one batch of queued topics; returns the number of topics handled"""
+    with transaction.atomic():
+        queryset = PendingFanOut.objects.select_related('topic')
+        if connection.features.has_select_for_update_skip_locked:
+            # Several workers can drain the queue without picking the same rows
+            queryset = queryset.select_for_update(skip_locked=True, of=('self',))
+        pending = list(queryset.order_by('created_at')[:batch_size])
+
+        for entry in pending:
+            fan_out(entry.topic)
+        PendingFanOut.objects.filter(pk__in=[entry.pk for entry in pending]).delete()
+
+    return len(pending)
+
+
+def fan_out(topic):
+    """Add a new topic to the feed of every follower of its author"""
+    if is_high_fanout(topic.author_id):
+        return 0
+    follower_ids = list(
+        Follow.objects.filter(following_id=topic.author_id).values_list('follower_id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(_entries(follower_ids, [topic]), batch_size=1000, ignore_conflicts=True)
+    return len(follower_ids)
+
+
+def backfill(follower_id, following_id, limit=None):
+    """Copy the followed user's topics into the follower's feed"""
+    if is_high_fanout(following_id):
+        return 0
+    topics = _backfilled_topics(following_id, limit)
+    FeedEntry.objects.bulk_create(_entries([follower_id], topics), batch_size=1000, ignore_conflicts=True)
+    return len(topics)
+
+
+def backfill_followers(author_id, limit=None):
+    """Copy the author's topics into the feed of every follower"""
+    topics = _backfilled_topics(author_id, limit)
+    follower_ids = list(
+        Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(_entries(follower_ids, topics), batch_size=1000, ignore_conflicts=True)
+    return len(follower_ids)
+
+
+def restore_fan_out(author_id):
+    """Backfill the followers' feeds if the author just dropped back to the fan-out limit
+
+    Called after an unfollow (followers_count already refreshed).
+    """
+    at_limit = UserStats.objects.filter(
+        pk=author_id, followers_count=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+    return backfill_followers(author_id) if at_limit else 0
+
+
+def trim(follower_id, following_id):
+    """Remove the unfollowed user's topics from the follower's feed"""
+    deleted, _ = FeedEntry.objects.filter(user_id=follower_id, author_id=following_id).delete()
+    return deleted
+
+
+def high_fanout_following(user):
+    """IDs of followed users whose topics are read at request time"""
+    return list(
+        Follow.objects.filter(
+            follower=user, following__stats__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('following_id', flat=True)
+    )
+
+
+def pulled_feed(user, author_ids):
+    """Topic queryset of the feed including topics by high-fanout authors"""
+    return Topic.objects.filter(
+        Q(id__in=FeedEntry.objects.filter(user=user).values('topic_id')) | Q(author_id__in=author_ids)
+    )
+
+
+def topics_for_entries(entries):
+    """Load the topics of a page of feed entries, keeping the page order"""
+    topic_ids = [entry.topic_id for entry in entries]
+    topics = Topic.objects.with_related().in_bulk(topic_ids)
+    return [topics[topic_id] for topic_id in topic_ids if topic_id in topics]
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from forum.feed import process_pending
+
+
+class Command(BaseCommand):
+    help = "Copy queued topics into their authors' followers' feeds (FEED_FANOUT_ASYNC mode)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of topics to fan out per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new topics instead of exiting when the queue is empty'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        processed_count = 0
+
+        self.stdout.write('Fanning out queued topics...')
+
+        while True:
+            processed = process_pending(batch_size)
+            processed_count += processed
+
+            if processed:
+                self.stdout.write(f'  Fanned out {processed} topics')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'\nCompleted! Fanned out {processed_count} topics.'))
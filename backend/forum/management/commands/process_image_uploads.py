@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from forum.uploads import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Upload staged topic, reply and profile images to storage (IMAGE_UPLOAD_ASYNC mode)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Number of images to upload per batch (default: 50)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new uploads instead of exiting when the queue is empty'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        processed_count = 0
+
+        self.stdout.write('Processing image uploads...')
+
+        while True:
+            processed = process_pending(batch_size)
+            processed_count += processed
+
+            if processed:
+                self.stdout.write(f'  Processed {processed} uploads')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'\nCompleted! Processed {processed_count} uploads.'))
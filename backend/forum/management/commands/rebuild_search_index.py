@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from forum.search import backend_for_vendor
+
+
+class Command(BaseCommand):
+    help = 'Re-create the topic full-text search index and refill it from the topic table'
+
+    def handle(self, *args, **options):
+        backend = backend_for_vendor(connection.vendor)
+
+        if not backend.install_sql:
+            self.stdout.write(f'No full-text index for the {connection.vendor} database, nothing to rebuild.')
+            return
+
+        self.stdout.write(f'Rebuilding {backend.name} search index...')
+
+        # Installing is idempotent; it also restores SQLite triggers dropped by
+        # migrations that rebuild the topic table
+        with connection.schema_editor() as schema_editor:
+            backend.install(schema_editor)
+
+        self.stdout.write(self.style.SUCCESS('\nCompleted! Search index rebuilt.'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from forum.counters import refresh_reply_likes, topic_counter_expressions
+from forum.models import Reply, Topic
+
+
+class Command(BaseCommand):
+    help = 'Rebuild denormalized Topic counters (replies, likes, bookmarks) and Reply like counts from their source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of topic IDs to recompute per UPDATE statement (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        bounds = Topic.objects.aggregate(first=Min('id'), last=Max('id'))
+
+        if bounds['first'] is None:
+            self.stdout.write('No topics found, nothing to rebuild.')
+            return
+
+        self.stdout.write('Rebuilding topic counters...')
+
+        updated_count = 0
+        start = bounds['first']
+        while start <= bounds['last']:
+            end = start + batch_size
+            # One UPDATE per ID range keeps each statement short on large tables
+            updated_count += Topic.objects.filter(id__gte=start, id__lt=end).update(
+                **topic_counter_expressions()
+            )
+            start = end
+
+        self.stdout.write('Rebuilding reply like counts...')
+
+        reply_count = 0
+        bounds = Reply.objects.aggregate(first=Min('id'), last=Max('id'))
+        start = bounds['first']
+        while start is not None and start <= bounds['last']:
+            end = start + batch_size
+            reply_count += refresh_reply_likes(
+                Reply.objects.filter(id__gte=start, id__lt=end).values_list('id', flat=True)
+            )
+            start = end
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nCompleted! Rebuilt counters for {updated_count} topics and {reply_count} replies.'
+        ))
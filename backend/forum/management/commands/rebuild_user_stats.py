@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from forum.counters import ensure_user_stats, user_stats_expressions
+from forum.models import UserStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UserStats profile rollups (topics, replies, likes, follows) from their source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of user IDs to recompute per UPDATE statement (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        bounds = User.objects.aggregate(first=Min('id'), last=Max('id'))
+
+        if bounds['first'] is None:
+            self.stdout.write('No users found, nothing to rebuild.')
+            return
+
+        self.stdout.write('Rebuilding user stats...')
+
+        updated_count = 0
+        start = bounds['first']
+        while start <= bounds['last']:
+            end = start + batch_size
+            # Users created before the rollup existed have no row yet
+            ensure_user_stats(
+                User.objects.filter(id__gte=start, id__lt=end).values_list('id', flat=True)
+            )
+            # One UPDATE per ID range keeps each statement short on large tables
+            updated_count += UserStats.objects.filter(pk__gte=start, pk__lt=end).update(
+                **user_stats_expressions()
+            )
+            start = end
+
+        self.stdout.write(self.style.SUCCESS(f'\nCompleted! Rebuilt stats for {updated_count} users.'))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:30
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_topic_counters(apps, schema_editor):
+    Topic = apps.get_model('forum', 'Topic')
+    Reply = apps.get_model('forum', 'Reply')
+    Bookmark = apps.get_model('forum', 'Bookmark')
+    TopicLikes = Topic.likes.through
+
+    def count_for_topic(queryset):
+        counts = queryset.filter(topic=OuterRef('pk')).order_by().values('topic').annotate(
+            total=Count('pk')
+        ).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    Topic.objects.update(
+        replies_count=count_for_topic(Reply.objects.filter(is_hidden=False)),
+        likes_count=count_for_topic(TopicLikes.objects.all()),
+        bookmarks_count=count_for_topic(Bookmark.objects.all()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0027_sitesettings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='bookmarks_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Number of bookmarks'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Number of likes'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='replies_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Number of visible replies'),
+        ),
+        migrations.RunPython(populate_topic_counters, migrations.RunPython.noop),
+    ]
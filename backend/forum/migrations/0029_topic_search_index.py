@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:45
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    """Create the full-text index for the current database (see forum.search)"""
+    from forum.search import backend_for_vendor
+
+    try:
+        backend_for_vendor(schema_editor.connection.vendor).install(schema_editor)
+    except OperationalError:
+        # SQLite compiled without FTS5: search falls back to unindexed matching
+        pass
+
+
+def drop_search_index(apps, schema_editor):
+    from forum.search import backend_for_vendor
+
+    backend_for_vendor(schema_editor.connection.vendor).uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0028_topic_bookmarks_count_topic_likes_count_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
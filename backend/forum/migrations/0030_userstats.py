@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_user_stats(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserStats = apps.get_model('forum', 'UserStats')
+    Topic = apps.get_model('forum', 'Topic')
+    Reply = apps.get_model('forum', 'Reply')
+    Follow = apps.get_model('forum', 'Follow')
+    TopicLikes = Topic.likes.through
+    ReplyLikes = Reply.likes.through
+
+    def count_for_user(queryset, field):
+        counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in User.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        topics_count=count_for_user(Topic.objects.all(), 'author'),
+        replies_count=count_for_user(Reply.objects.filter(is_hidden=False), 'author'),
+        likes_given=(
+            count_for_user(TopicLikes.objects.all(), 'user')
+            + count_for_user(ReplyLikes.objects.all(), 'user')
+        ),
+        likes_received=(
+            count_for_user(TopicLikes.objects.all(), 'topic__author')
+            + count_for_user(ReplyLikes.objects.all(), 'reply__author')
+        ),
+        followers_count=count_for_user(Follow.objects.all(), 'following'),
+        following_count=count_for_user(Follow.objects.all(), 'follower'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('forum', '0029_topic_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('topics_count', models.IntegerField(default=0)),
+                ('replies_count', models.IntegerField(default=0, help_text='Visible (non-hidden) replies')),
+                ('likes_given', models.IntegerField(default=0, help_text='Topic and reply likes given')),
+                ('likes_received', models.IntegerField(default=0, help_text='Likes received on topics and replies')),
+                ('followers_count', models.IntegerField(default=0)),
+                ('following_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'User Stats',
+                'verbose_name_plural': 'User Stats',
+            },
+        ),
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
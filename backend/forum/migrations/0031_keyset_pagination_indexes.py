@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0030_userstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='bookmark_user_created_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['topic', 'parent', 'created_at', 'id'], name='reply_thread_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='reply_author_created_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['updated_at', 'id'], name='topic_updated_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['created_at', 'id'], name='topic_created_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='topic_cat_created_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['category', 'updated_at', 'id'], name='topic_cat_updated_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='topic_author_created_key_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_feeds(apps, schema_editor):
+    """Backfill every follower's feed with the followed users' topics (see FEED_BACKFILL_LIMIT)"""
+    Follow = apps.get_model('forum', 'Follow')
+    Topic = apps.get_model('forum', 'Topic')
+    FeedEntry = apps.get_model('forum', 'FeedEntry')
+    UserStats = apps.get_model('forum', 'UserStats')
+
+    high_fanout = set(UserStats.objects.filter(
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('user_id', flat=True))
+
+    recent_topics = {}
+    for follower_id, following_id in Follow.objects.values_list('follower_id', 'following_id').iterator():
+        if following_id in high_fanout:
+            continue
+        if following_id not in recent_topics:
+            topics = Topic.objects.filter(author_id=following_id).order_by('-created_at', '-id')
+            if settings.FEED_BACKFILL_LIMIT:
+                topics = topics[:settings.FEED_BACKFILL_LIMIT]
+            recent_topics[following_id] = list(topics.values_list('id', 'created_at'))
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(user_id=follower_id, topic_id=topic_id, author_id=following_id, created_at=created_at)
+                for topic_id, created_at in recent_topics[following_id]
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0031_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='forum.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Feed entries',
+                'indexes': [models.Index(fields=['user', 'created_at', 'topic'], name='feed_entry_user_key_idx'), models.Index(fields=['user', 'author'], name='feed_entry_user_author_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'topic'), name='feed_entry_unique_topic')],
+            },
+        ),
+        migrations.RunPython(populate_feeds, migrations.RunPython.noop),
+    ]
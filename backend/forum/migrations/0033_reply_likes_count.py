@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:55
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_reply_likes_count(apps, schema_editor):
+    Reply = apps.get_model('forum', 'Reply')
+    ReplyLikes = Reply.likes.through
+
+    counts = ReplyLikes.objects.filter(reply=OuterRef('pk')).order_by().values('reply').annotate(
+        total=Count('pk')
+    ).values('total')
+    Reply.objects.update(likes_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0032_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Number of likes'),
+        ),
+        migrations.RunPython(populate_reply_likes_count, migrations.RunPython.noop),
+    ]
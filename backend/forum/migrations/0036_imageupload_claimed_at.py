@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0035_tag_slug_allow_unicode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker started uploading it', null=True),
+        ),
+        migrations.AlterField(
+            model_name='imageupload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
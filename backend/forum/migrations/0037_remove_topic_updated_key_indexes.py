@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0036_imageupload_claimed_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='topic',
+            name='topic_updated_key_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='topic',
+            name='topic_cat_updated_key_idx',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0037_remove_topic_updated_key_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingFanOut',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='forum.topic')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,6 +1,9 @@
+import copy
+
 from django.db import models
 from django.contrib.auth.models import User
 from cloudinary.models import CloudinaryField
+from .cache import ProcessLocalCache
 
 
 class Category(models.Model):
@@ -41,12 +44,24 @@ class CategoryRule(models.Model):
         return f"{self.category.title} - {self.title}"
 
 
+class TagQuerySet(models.QuerySet):
+    def with_usage_count(self):
+        """Annotate the number of topics using each tag (read by Tag.usage_count)"""
+        return self.annotate(num_topics=models.Count('topics'))
+
+    def popular(self):
+        """Most used tags first, ties broken by name"""
+        return self.with_usage_count().order_by('-num_topics', 'name')
+
+
 class Tag(models.Model):
     """Tags for topics"""
     name = models.CharField(max_length=50, unique=True)
-    slug = models.SlugField(max_length=50, unique=True)
+    slug = models.SlugField(max_length=50, unique=True, allow_unicode=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = TagQuerySet.as_manager()
+    
     class Meta:
         ordering = ['name']
     
@@ -56,9 +71,63 @@ class Tag(models.Model):
     @property
     def usage_count(self):
         """Count how many topics use this tag"""
+        # Prefer the count annotated by Tag.objects.with_usage_count()
+        if hasattr(self, 'num_topics'):
+            return self.num_topics
         return self.topics.count()
 
 
+POPULAR_TAGS_LIMIT = 10
+
+
+def _load_popular_tags():
+    return list(Tag.objects.popular()[:POPULAR_TAGS_LIMIT])
+
+
+# Refreshed by forum.signals whenever tag usage changes
+popular_tags_cache = ProcessLocalCache('popular-tags', _load_popular_tags)
+
+
+class TopicQuerySet(models.QuerySet):
+    def with_related(self):
+        """Load everything TopicSerializer touches in a fixed number of queries
+
+        Authors, profiles, categories and polls are joined in the main query;
+        tags, images and poll options (with annotated vote counts) are each
+        fetched with one extra query for the whole page.
+        """
+        return self.select_related(
+            'author', 'author__profile', 'category', 'poll'
+        ).prefetch_related(
+            'tags',
+            'images',
+            models.Prefetch(
+                'poll__options',
+                # Meta.ordering is not applied to GROUP BY queries; repeat it
+                queryset=PollOption.objects.annotate(
+                    num_votes=models.Count('votes')
+                ).order_by('order', 'created_at')
+            ),
+        )
+
+    def related_to(self, topic, tag_ids, min_shared_tags=3):
+        """Topics in the same category sharing at least ``min_shared_tags`` of ``tag_ids``
+
+        The overlap is counted in SQL through the topic/tag join table (indexed
+        by tag), so the cost depends on how many topics use those tags rather
+        than on the size of the category.
+        """
+        return self.filter(
+            category_id=topic.category_id, tags__in=tag_ids
+        ).exclude(
+            pk=topic.pk
+        ).annotate(
+            shared_tags=models.Count('tags')
+        ).filter(
+            shared_tags__gte=min_shared_tags
+        ).order_by('-shared_tags', '-updated_at')
+
+
 class Topic(models.Model):
     """Forum topics/posts"""
     title = models.CharField(max_length=200)
@@ -71,19 +140,24 @@ class Topic(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     views = models.IntegerField(default=0)
     
+    # Denormalized counters, kept in sync by forum.signals (see forum.counters)
+    replies_count = models.IntegerField(default=0, editable=False, help_text='Number of visible replies')
+    likes_count = models.IntegerField(default=0, editable=False, help_text='Number of likes')
+    bookmarks_count = models.IntegerField(default=0, editable=False, help_text='Number of bookmarks')
+    
+    objects = TopicQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-updated_at']
+        # (field, id) keys used by KeysetPagination
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='topic_created_key_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='topic_cat_created_key_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='topic_author_created_key_idx'),
+        ]
     
     def __str__(self):
         return self.title
-    
-    @property
-    def replies_count(self):
-        return self.replies.filter(is_hidden=False).count()
-    
-    @property
-    def likes_count(self):
-        return self.likes.count()
 
 
 class Reply(models.Model):
@@ -97,28 +171,43 @@ class Reply(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Denormalized like counter, kept in sync by forum.signals and forum.toggles
+    likes_count = models.IntegerField(default=0, editable=False, help_text='Number of likes')
+    
     class Meta:
         verbose_name_plural = 'Replies'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['topic', 'parent', 'created_at', 'id'], name='reply_thread_key_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='reply_author_created_key_idx'),
+        ]
     
     def __str__(self):
         return f"Reply to {self.topic.title} by {self.author.username}"
     
     @property
     def replies_count(self):
+        # Prefer the count computed by forum.threads.ReplyThreadLoader
+        if hasattr(self, 'num_child_replies'):
+            return self.num_child_replies
         return self.child_replies.filter(is_hidden=False).count()
-    
-    @property
-    def likes_count(self):
-        return self.likes.count()
+
+
+IMAGE_STATUS_CHOICES = [
+    ('pending', 'Pending'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed'),
+]
 
 
 class ReplyImage(models.Model):
     """Images attached to replies"""
     reply = models.ForeignKey(Reply, on_delete=models.CASCADE, related_name='images')
-    image = CloudinaryField('image', folder='reply_images')
+    # Empty while the upload is pending (see forum.uploads)
+    image = CloudinaryField('image', null=True, blank=True, folder='reply_images')
     caption = models.CharField(max_length=200, blank=True)
     order = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=IMAGE_STATUS_CHOICES, default='ready')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -161,6 +250,62 @@ class Follow(models.Model):
         return f"{self.follower.username} -> {self.following.username}"
 
 
+class UserStats(models.Model):
+    """Per-user profile statistics rollup
+
+    Kept in sync by forum.signals (see forum.counters.refresh_user_stats) and
+    rebuilt by the rebuild_user_stats command.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    topics_count = models.IntegerField(default=0)
+    replies_count = models.IntegerField(default=0, help_text='Visible (non-hidden) replies')
+    likes_given = models.IntegerField(default=0, help_text='Topic and reply likes given')
+    likes_received = models.IntegerField(default=0, help_text='Likes received on topics and replies')
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'User Stats'
+        verbose_name_plural = 'User Stats'
+    
+    def __str__(self):
+        return f"{self.user.username}'s stats"
+
+
+class FeedEntry(models.Model):
+    """A topic in a user's "following topics" feed (written on post, see forum.feed)
+
+    created_at copies the topic's creation time so the feed can be paged on
+    (created_at, topic_id) without joining the topic table.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='feed_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name_plural = 'Feed entries'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'topic'], name='feed_entry_unique_topic'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'topic'], name='feed_entry_user_key_idx'),
+            models.Index(fields=['user', 'author'], name='feed_entry_user_author_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.topic_id} in {self.user_id}'s feed"
+
+
+class PendingFanOut(models.Model):
+    """A new topic waiting to be copied into its author's followers' feeds (FEED_FANOUT_ASYNC mode)"""
+    topic = models.OneToOneField(Topic, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Fan-out of topic {self.topic_id}"
+
+
 class Bookmark(models.Model):
     """User bookmarks for topics"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookmarks')
@@ -170,6 +315,9 @@ class Bookmark(models.Model):
     class Meta:
         unique_together = ['user', 'topic']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='bookmark_user_created_key_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} bookmarked {self.topic.title}"
@@ -219,9 +367,11 @@ class Report(models.Model):
 class TopicImage(models.Model):
     """Images attached to topics"""
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='images')
-    image = CloudinaryField('image', folder='topic_images')
+    # Empty while the upload is pending (see forum.uploads)
+    image = CloudinaryField('image', null=True, blank=True, folder='topic_images')
     caption = models.CharField(max_length=200, blank=True)
     order = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=IMAGE_STATUS_CHOICES, default='ready')
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -231,6 +381,44 @@ class TopicImage(models.Model):
         return f"Image for {self.topic.title}"
 
 
+class ImageUpload(models.Model):
+    """Staged image file waiting for the upload worker (IMAGE_UPLOAD_ASYNC mode)
+
+    ``target`` names the model and field the uploaded image is written to
+    (see forum.uploads.TARGETS) and ``object_id`` the row.
+    """
+    TARGET_CHOICES = [
+        ('topic_image', 'Topic Image'),
+        ('reply_image', 'Reply Image'),
+        ('user_image', 'Profile Image'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    staged_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text='When a worker started uploading it')
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='image_upload_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_target_display()} {self.object_id} ({self.status})"
+
+
 class Poll(models.Model):
     """Polls attached to topics"""
     topic = models.OneToOneField(Topic, on_delete=models.CASCADE, related_name='poll')
@@ -260,6 +448,9 @@ class PollOption(models.Model):
     
     @property
     def votes_count(self):
+        # Prefer the count annotated by Topic.objects.with_related()
+        if hasattr(self, 'num_votes'):
+            return self.num_votes
         return self.votes.count()
     
     @property
@@ -378,6 +569,8 @@ class SiteSettings(models.Model):
         """Ensure only one instance exists (Singleton pattern)"""
         self.pk = 1
         super().save(*args, **kwargs)
+        # Bump the version stamp so every worker reloads the cached copy
+        site_settings_cache.invalidate()
     
     def delete(self, *args, **kwargs):
         """Prevent deletion"""
@@ -385,6 +578,17 @@ class SiteSettings(models.Model):
     
     @classmethod
     def load(cls):
-        """Load the singleton instance"""
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
+        """Load the singleton instance (cached in process memory, no query on hot paths)
+
+        Returns a copy, so callers can modify and save it without changing
+        what other requests see before the save.
+        """
+        return copy.copy(site_settings_cache.get())
+
+
+def _load_site_settings():
+    obj, created = SiteSettings.objects.get_or_create(pk=1)
+    return obj
+
+
+site_settings_cache = ProcessLocalCache('site-settings', _load_site_settings)
@@ -1,7 +1,201 @@
-from rest_framework.pagination import PageNumberPagination
+"""
+Pagination classes
+
+CustomPageNumberPagination is the default for every list endpoint. Clients
+that page deep into large lists can opt into KeysetPagination with
+``?pagination=cursor`` (the ``next``/``previous`` links it returns carry a
+``cursor`` parameter): pages are selected with a WHERE on an indexed
+``(field, id)`` key instead of an OFFSET, so page 1000 costs the same as
+page 1, and the total count is only computed when asked for. Cursors only
+walk keys that never change once a row exists (created_at, id): rows sorted
+on a mutable key such as updated_at or replies_count would move between
+pages during a walk, so those orderings keep page numbers.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
-    max_page_size = 10000  # Allow clients to request up to 10000 items
+    max_page_size = 1000  # Every page costs an OFFSET scan and a COUNT; use cursors to go further
+
+
+def estimate_count(queryset):
+    """Row count from the query planner on PostgreSQL, an exact COUNT elsewhere"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over an ``(ordering field, tiebreak field)`` key
+
+    ``?count=exact`` adds the exact total, ``?count=estimate`` the planner's
+    estimate (see estimate_count); by default ``count`` is null.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+    stable_fields = ('created_at', 'id')
+
+    def __init__(self, ordering='-created_at', tiebreak='id'):
+        if not self.supports(ordering):
+            raise ValueError(f'Cannot walk a cursor over the mutable ordering {ordering!r}')
+        self.field = ordering.lstrip('-')
+        self.descending = ordering.startswith('-')
+        self.tiebreak = tiebreak
+
+    @classmethod
+    def supports(cls, ordering):
+        """Whether ``ordering`` is a stable key a cursor can walk"""
+        return ordering.lstrip('-') in cls.stable_fields
+
+    @classmethod
+    def requested(cls, request):
+        """Whether the client asked for cursor pagination"""
+        params = request.query_params
+        return params.get('pagination') == 'cursor' or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset)
+        self.count = self.get_count(queryset, request)
+
+        reverse = cursor is not None and cursor[2]
+        descending = self.descending != reverse
+        if cursor is not None:
+            queryset = queryset.filter(self._beyond(cursor[0], cursor[1], descending))
+
+        prefix = '-' if descending else ''
+        rows = list(
+            queryset.order_by(f'{prefix}{self.field}', f'{prefix}{self.tiebreak}')[:self.page_size + 1]
+        )
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            # Walking backwards: the rows came in reverse order
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def decode_cursor(self, request, queryset):
+        """Return (value, id, reverse) from the cursor parameter, or None on the first page
+
+        The value is converted with the ordering field, so a tampered cursor
+        is a 404 rather than a database error.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if value is None or not isinstance(pk, int) or not isinstance(reverse, bool):
+                raise ValueError
+            value = queryset.model._meta.get_field(self.field).to_python(value)
+            return value, pk, reverse
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.field)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        raw = json.dumps([value, getattr(row, self.tiebreak), reverse]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def _link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def _beyond(self, value, pk, descending):
+        """Rows after (value, pk) in the walking direction
+
+        Written as ``field <= value AND (field < value OR id < pk)`` (mirrored
+        for ascending) so the database can range-scan the (field, id) index.
+        """
+        strict, edge = ('lt', 'lte') if descending else ('gt', 'gte')
+        return Q(**{f'{self.field}__{edge}': value}) & (
+            Q(**{f'{self.field}__{strict}': value}) | Q(**{f'{self.tiebreak}__{strict}': pk})
+        )
+
+
+def paginator_for(request, ordering, tiebreak='id'):
+    """Keyset pagination when the client asks for it on a stable key, page numbers otherwise"""
+    if KeysetPagination.requested(request) and KeysetPagination.supports(ordering):
+        return KeysetPagination(ordering, tiebreak)
+    return CustomPageNumberPagination()
+
+
+class KeysetPaginationMixin:
+    """Let a generic view switch to KeysetPagination on ``keyset_ordering``"""
+    keyset_ordering = '-created_at'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if KeysetPagination.requested(self.request):
+                self._paginator = KeysetPagination(self.keyset_ordering)
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
@@ -0,0 +1,51 @@
+"""
+Background flushing for in-memory write buffers
+
+The view counter and the ad event buffer flush on the next add() once their
+interval has passed, which leaves the last events before a quiet period in
+memory until the process exits. PeriodicFlush runs the flush from a daemon
+thread every interval as well, so at most one interval of events is at risk
+when a worker is killed.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlush:
+    """Call ``flush()`` every ``interval`` seconds from a daemon thread
+
+    The thread is started lazily by ensure_started() and again in a forked
+    child (threads do not survive fork, e.g. gunicorn --preload).
+    """
+
+    def __init__(self, flush, interval, name):
+        self.flush = flush
+        self.interval = interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name=f'{self.name}-flush', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Periodic flush of %s failed', self.name)
+            finally:
+                close_old_connections()
@@ -0,0 +1,288 @@
+"""
+Full-text search backends for topics
+
+Every backend filters a Topic queryset down to the topics matching a query
+and annotates them with ``search_rank`` (higher is better) and
+``search_snippet`` (the matched text, turned into escaped HTML with <mark>
+highlights by ``backend.snippet()``):
+
+- PostgreSQL: a generated ``search_vector`` tsvector column with a GIN index,
+  ranked with ts_rank_cd and highlighted with ts_headline
+- SQLite: an FTS5 external-content table (forum_topic_fts) kept in sync by
+  triggers, ranked with bm25() and highlighted with snippet()
+- Anything else: icontains matching ranked by engagement (no index)
+
+Both indexes are created by migration 0029 (and re-created by the
+rebuild_search_index command) and are updated by the database itself
+whenever a topic's title or content changes. They are not part of Django's
+model state, so a later migration that rebuilds forum_topic (SQLite remakes
+the table for most ALTERs) drops them silently; ensure_search_index() runs
+after every migrate and re-installs whatever is missing.
+"""
+import logging
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.utils import OperationalError
+from django.db.models import F, Q, Value
+from django.utils.html import escape, strip_tags
+
+# Title matches weigh more than content matches
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+# The database marks matches with these characters; snippet() escapes the
+# text and only then swaps them for <mark> tags
+HIGHLIGHT_START = '\ufff9'
+HIGHLIGHT_END = '\ufffb'
+SNIPPET_WORDS = 24
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Tags cut in half at the edge of a snippet survive strip_tags()
+_CUT_TAG_RE = re.compile(r'<[^>\s.]*(?=\.\.\.$|$)')
+
+
+def search_terms(query):
+    """Split a user query into plain word tokens (drops any query syntax)"""
+    return _TOKEN_RE.findall(query.lower())[:16]
+
+
+class BaseSearchBackend:
+    name = 'base'
+    install_sql = []
+    uninstall_sql = []
+
+    def search(self, queryset, query):
+        """Return ``queryset`` filtered to matching topics, annotated with rank and snippet"""
+        raise NotImplementedError
+
+    def install(self, schema_editor):
+        """Create the index objects (idempotent) and fill them from the topic table
+
+        ``schema_editor`` may also be a plain cursor; only execute() is used.
+        """
+        for statement in self.install_sql:
+            schema_editor.execute(statement)
+
+    def uninstall(self, schema_editor):
+        for statement in self.uninstall_sql:
+            schema_editor.execute(statement)
+
+    def is_installed(self, connection):
+        """Whether every index object exists in the database"""
+        return True
+
+    def snippet(self, topic, query):
+        """Return an HTML-safe snippet of the topic with the matched words in <mark>"""
+        raw = getattr(topic, 'search_snippet', '') or highlight(strip_tags(topic.content), query)
+        # Topic content is HTML; snippets are plain text with only the highlights
+        text = _CUT_TAG_RE.sub('', strip_tags(raw))
+        return escape(text).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    name = 'postgresql'
+    install_sql = [
+        """
+        ALTER TABLE forum_topic ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(content, '')), 'B')
+        ) STORED
+        """,
+        'CREATE INDEX IF NOT EXISTS forum_topic_search_vector_idx ON forum_topic USING GIN (search_vector)',
+    ]
+    uninstall_sql = [
+        'DROP INDEX IF EXISTS forum_topic_search_vector_idx',
+        'ALTER TABLE forum_topic DROP COLUMN IF EXISTS search_vector',
+    ]
+
+    def is_installed(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_indexes WHERE tablename = 'forum_topic' "
+                "AND indexname = 'forum_topic_search_vector_idx'"
+            )
+            return cursor.fetchone()[0] == 1
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        # Prefix-match the last word so results show up while typing
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        ts = "to_tsquery('english', %s)"
+        headline_options = (
+            f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, '
+            f'MaxWords={SNIPPET_WORDS}, MinWords=8'
+        )
+        return queryset.extra(
+            where=[f'forum_topic.search_vector @@ {ts}'],
+            params=[tsquery],
+            select={
+                'search_rank': f'ts_rank_cd(forum_topic.search_vector, {ts})',
+                'search_snippet': f"ts_headline('english', forum_topic.content, {ts}, %s)",
+            },
+            select_params=[tsquery, tsquery, headline_options],
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    name = 'sqlite'
+    install_sql = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS forum_topic_fts USING fts5(
+            title, content, content='forum_topic', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_topic_fts_insert AFTER INSERT ON forum_topic BEGIN
+            INSERT INTO forum_topic_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_topic_fts_delete AFTER DELETE ON forum_topic BEGIN
+            INSERT INTO forum_topic_fts(forum_topic_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+        END
+        """,
+        # Django saves every column, so only reindex when the text actually changed
+        """
+        CREATE TRIGGER IF NOT EXISTS forum_topic_fts_update AFTER UPDATE OF title, content ON forum_topic
+        WHEN old.title IS NOT new.title OR old.content IS NOT new.content BEGIN
+            INSERT INTO forum_topic_fts(forum_topic_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO forum_topic_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+        END
+        """,
+        "INSERT INTO forum_topic_fts(forum_topic_fts) VALUES('rebuild')",
+    ]
+    uninstall_sql = [
+        'DROP TRIGGER IF EXISTS forum_topic_fts_insert',
+        'DROP TRIGGER IF EXISTS forum_topic_fts_delete',
+        'DROP TRIGGER IF EXISTS forum_topic_fts_update',
+        'DROP TABLE IF EXISTS forum_topic_fts',
+    ]
+    objects = {
+        'forum_topic_fts', 'forum_topic_fts_insert', 'forum_topic_fts_delete', 'forum_topic_fts_update',
+    }
+
+    def is_installed(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)", sorted(self.objects)
+            )
+            return {row[0] for row in cursor.fetchall()} == self.objects
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        # Quote every token so user input can never be parsed as FTS5 syntax
+        match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        return queryset.extra(
+            tables=['forum_topic_fts'],
+            where=['forum_topic_fts.rowid = forum_topic.id', 'forum_topic_fts MATCH %s'],
+            params=[match.strip()],
+            select={
+                # bm25() is lower for better matches; negate it so higher ranks first
+                'search_rank': f'-bm25(forum_topic_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT})',
+                'search_snippet': (
+                    f"snippet(forum_topic_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', "
+                    f"'...', {SNIPPET_WORDS})"
+                ),
+            },
+        )
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Unindexed fallback for databases without a full-text index"""
+    name = 'simple'
+
+    def search(self, queryset, query):
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        # No relevance score without an index; rank by engagement instead
+        return queryset.annotate(search_rank=F('replies_count'), search_snippet=Value(''))
+
+
+def highlight(text, query, words=SNIPPET_WORDS):
+    """Mark matched words in Python (for backends that cannot build snippets)"""
+    terms = set(search_terms(query))
+    tokens = text.split()
+    start = next(
+        (i for i, token in enumerate(tokens) if any(term in token.lower() for term in terms)), 0
+    )
+    start = max(start - words // 4, 0)
+    snippet = []
+    for token in tokens[start:start + words]:
+        if any(term in token.lower() for term in terms):
+            snippet.append(f'{HIGHLIGHT_START}{token}{HIGHLIGHT_END}')
+        else:
+            snippet.append(token)
+    prefix = '...' if start > 0 else ''
+    suffix = '...' if start + words < len(tokens) else ''
+    return f"{prefix}{' '.join(snippet)}{suffix}"
+
+
+def backend_for_vendor(vendor):
+    """Return the indexed backend for a database vendor, or the unindexed fallback"""
+    if vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    return SimpleSearchBackend()
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS):
+    """Re-install the full-text index if any of its objects is missing
+
+    Returns True when the index had to be re-installed (and refilled). Does
+    nothing until migration 0029 has been applied.
+    """
+    global _backend
+    connection = connections[using]
+    backend = backend_for_vendor(connection.vendor)
+    applied = MigrationRecorder(connection).applied_migrations()
+    if not backend.install_sql or ('forum', '0029_topic_search_index') not in applied:
+        return False
+    if backend.is_installed(connection):
+        return False
+
+    logger.warning('The %s search index was missing objects; re-installing it', backend.name)
+    try:
+        # A cursor rather than a schema editor, which SQLite refuses inside atomic blocks
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            backend.install(cursor)
+    except OperationalError:
+        # SQLite compiled without FTS5 (see migration 0029)
+        return False
+    _backend = None
+    return True
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Return the search backend for the default database"""
+    global _backend
+    if _backend is None:
+        backend = backend_for_vendor(connection.vendor)
+        if backend.name == 'sqlite':
+            # SQLite builds without FTS5 have no index table; fall back
+            with connection.cursor() as cursor:
+                if 'forum_topic_fts' not in connection.introspection.table_names(cursor):
+                    backend = SimpleSearchBackend()
+        _backend = backend
+    return _backend
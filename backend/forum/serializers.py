@@ -2,8 +2,9 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import (
     Category, CategoryRule, Topic, Reply, UserProfile, ReportReason, Report, Bookmark,
-    TopicImage, Poll, PollOption, PollVote, Tag, ReplyImage, SiteSettings
+    TopicImage, Poll, PollOption, PollVote, Tag, ReplyImage, SiteSettings, UserStats
 )
+from .viewer_state import ViewerState
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -54,7 +55,7 @@ class ReplyImageSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ReplyImage
-        fields = ['id', 'image', 'image_url', 'caption', 'order', 'created_at']
+        fields = ['id', 'image', 'image_url', 'caption', 'order', 'status', 'created_at']
         read_only_fields = ['created_at']
     
     def get_image_url(self, obj):
@@ -67,6 +68,29 @@ class ReplyImageSerializer(serializers.ModelSerializer):
         return None
 
 
+class TopicListSerializer(serializers.ListSerializer):
+    """Registers the page of topics so viewer lookups are batched"""
+    
+    def to_representation(self, data):
+        topics = list(data.all() if hasattr(data, 'all') else data)
+        ViewerState.from_context(self.context).add_topics(topics)
+        return super().to_representation(topics)
+
+
+class ReplyListSerializer(serializers.ListSerializer):
+    """Registers the page of replies (and their loaded children) so viewer lookups are batched"""
+    
+    def to_representation(self, data):
+        replies = list(data.all() if hasattr(data, 'all') else data)
+        viewer_state = ViewerState.from_context(self.context)
+        viewer_state.add_replies(replies)
+        thread = self.context.get('reply_thread')
+        if thread is not None:
+            for reply in replies:
+                viewer_state.add_replies(thread.children_of(reply))
+        return super().to_representation(replies)
+
+
 class ReplySerializer(serializers.ModelSerializer):
     author = serializers.SerializerMethodField()
     likes_count = serializers.IntegerField(read_only=True)
@@ -86,6 +110,7 @@ class ReplySerializer(serializers.ModelSerializer):
                   'likes_count', 'user_has_liked', 'child_replies', 'replies_count', 'is_hidden', 
                   'resolved_report', 'pending_reports_count', 'images', 'created_at', 'updated_at']
         read_only_fields = ['author', 'topic', 'likes_count', 'is_hidden']
+        list_serializer_class = ReplyListSerializer
     
     def get_author(self, obj):
         """Serialize author with context"""
@@ -119,7 +144,7 @@ class ReplySerializer(serializers.ModelSerializer):
     def get_user_has_liked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
+            return ViewerState.from_context(self.context).has_liked_reply(obj)
         return False
     
     def get_child_replies(self, obj):
@@ -129,8 +154,12 @@ class ReplySerializer(serializers.ModelSerializer):
             return []
         
         request = self.context.get('request')
+        thread = self.context.get('reply_thread')
         
-        if request and request.user.is_authenticated:
+        if thread is not None:
+            # Children were already loaded and filtered by the thread loader
+            child_replies = thread.children_of(obj)
+        elif request and request.user.is_authenticated:
             # Show non-hidden replies + user's own hidden replies
             from django.db.models import Q
             child_replies = obj.child_replies.filter(
@@ -148,12 +177,16 @@ class ReplySerializer(serializers.ModelSerializer):
     def get_resolved_report(self, obj):
         # Only return resolved report info if the current user is the author
         request = self.context.get('request')
-        if request and request.user.is_authenticated and obj.author == request.user:
-            from .models import Report
-            resolved_report = Report.objects.filter(
-                reply=obj, 
-                status='resolved'
-            ).select_related('reason').first()
+        if request and request.user.is_authenticated and obj.author_id == request.user.id:
+            thread = self.context.get('reply_thread')
+            if thread is not None:
+                resolved_report = thread.resolved_report_for(obj)
+            else:
+                from .models import Report
+                resolved_report = Report.objects.filter(
+                    reply=obj, 
+                    status='resolved'
+                ).select_related('reason').first()
             
             if resolved_report:
                 return {
@@ -167,7 +200,10 @@ class ReplySerializer(serializers.ModelSerializer):
     def get_pending_reports_count(self, obj):
         # Only return pending reports count if the current user is the author
         request = self.context.get('request')
-        if request and request.user.is_authenticated and obj.author == request.user:
+        if request and request.user.is_authenticated and obj.author_id == request.user.id:
+            thread = self.context.get('reply_thread')
+            if thread is not None:
+                return thread.pending_reports_count(obj)
             from .models import Report
             return Report.objects.filter(reply=obj, status='pending').count()
         return 0
@@ -179,7 +215,7 @@ class TopicImageSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = TopicImage
-        fields = ['id', 'image', 'image_url', 'caption', 'order', 'created_at']
+        fields = ['id', 'image', 'image_url', 'caption', 'order', 'status', 'created_at']
         read_only_fields = ['created_at']
     
     def get_image_url(self, obj):
@@ -204,7 +240,7 @@ class PollOptionSerializer(serializers.ModelSerializer):
     def get_user_has_voted(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return PollVote.objects.filter(poll_option=obj, user=request.user).exists()
+            return ViewerState.from_context(self.context).has_voted(obj)
         return False
 
 
@@ -221,19 +257,18 @@ class PollSerializer(serializers.ModelSerializer):
     
     def get_options(self, obj):
         """Serialize poll options with proper context"""
-        options = obj.options.all().order_by('order')
+        # Rely on Meta ordering so prefetched options are reused
+        options = obj.options.all()
         return PollOptionSerializer(options, many=True, context=self.context).data
     
     def get_user_vote(self, obj):
         """Get which option the user voted for"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            vote = PollVote.objects.filter(
-                poll_option__poll=obj,
-                user=request.user
-            ).select_related('poll_option').first()
-            if vote:
-                return vote.poll_option.id
+            viewer_state = ViewerState.from_context(self.context)
+            for option in obj.options.all():
+                if viewer_state.has_voted(option):
+                    return option.id
         return None
 
 
@@ -258,6 +293,7 @@ class TopicSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'author', 'category', 'category_name', 
                   'content', 'tags', 'tag_ids', 'replies_count', 'likes_count', 'views', 'images', 'poll', 'created_at', 'updated_at']
         read_only_fields = ['author', 'views']
+        list_serializer_class = TopicListSerializer
     
     def get_author(self, obj):
         """Serialize author with context"""
@@ -275,7 +311,7 @@ class TopicDetailSerializer(serializers.ModelSerializer):
     likes_count = serializers.ReadOnlyField()
     user_has_liked = serializers.SerializerMethodField()
     user_has_bookmarked = serializers.SerializerMethodField()
-    bookmarks_count = serializers.SerializerMethodField()
+    bookmarks_count = serializers.ReadOnlyField()
     images = TopicImageSerializer(many=True, read_only=True)
     poll = PollSerializer(read_only=True)
     tags = serializers.SerializerMethodField()
@@ -284,6 +320,7 @@ class TopicDetailSerializer(serializers.ModelSerializer):
         model = Topic
         fields = ['id', 'title', 'author', 'category', 'content', 'tags',
                   'replies_count', 'likes_count', 'user_has_liked', 'views', 'images', 'poll', 'created_at', 'updated_at', 'user_has_bookmarked', 'bookmarks_count']
+        list_serializer_class = TopicListSerializer
     
     def get_author(self, obj):
         """Serialize author with context"""
@@ -296,18 +333,23 @@ class TopicDetailSerializer(serializers.ModelSerializer):
     def get_user_has_liked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
+            return ViewerState.from_context(self.context).has_liked_topic(obj)
         return False
     
     def get_user_has_bookmarked(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Bookmark.objects.filter(user=request.user, topic=obj).exists()
+            return ViewerState.from_context(self.context).has_bookmarked_topic(obj)
         return False
+
+
+class UserProfileListSerializer(serializers.ListSerializer):
+    """Registers the listed users so is_following is answered with one query"""
     
-    def get_bookmarks_count(self, obj):
-        """Return the number of users who bookmarked this topic"""
-        return Bookmark.objects.filter(topic=obj).count()
+    def to_representation(self, data):
+        profiles = list(data.all() if hasattr(data, 'all') else data)
+        ViewerState.from_context(self.context).add_users(profile.user_id for profile in profiles)
+        return super().to_representation(profiles)
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -335,6 +377,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
                   'facebook_url', 'linkedin_url', 'tiktok_url']
         read_only_fields = ['id', 'username', 'email', 'first_name', 'last_name', 'points', 'date_joined', 'user_image_url',
                             'topics_count', 'replies_count', 'likes_given', 'likes_received', 'followers_count', 'following_count', 'is_following']
+        list_serializer_class = UserProfileListSerializer
     
     def validate_bio(self, value):
         """Validate bio field"""
@@ -351,52 +394,40 @@ class UserProfileSerializer(serializers.ModelSerializer):
             return obj.user_image.url
         return None
     
+    def _stats(self, obj):
+        """The user's stats rollup (select_related('user__stats') avoids a query)"""
+        try:
+            return obj.user.stats
+        except UserStats.DoesNotExist:
+            # No activity recorded yet
+            return UserStats(user=obj.user)
+    
     def get_topics_count(self, obj):
         """Get total number of topics created by user"""
-        return obj.user.topics.count()
+        return self._stats(obj).topics_count
     
     def get_replies_count(self, obj):
-        """Get total number of replies created by user"""
-        return obj.user.replies.filter(is_hidden=False).count()
+        """Get total number of visible replies created by user"""
+        return self._stats(obj).replies_count
     
     def get_likes_given(self, obj):
         """Get total number of likes given by user (topics + replies)"""
-        topics_likes = obj.user.liked_topics.count()
-        replies_likes = obj.user.liked_replies.count()
-        return topics_likes + replies_likes
+        return self._stats(obj).likes_given
     
     def get_likes_received(self, obj):
         """Get total number of likes received on user's topics and replies"""
-        from django.db.models import Count
-        
-        # Count likes on user's topics
-        topics_likes = Topic.objects.filter(author=obj.user).aggregate(
-            total_likes=Count('likes')
-        )['total_likes'] or 0
-        
-        # Count likes on user's replies
-        replies_likes = Reply.objects.filter(author=obj.user).aggregate(
-            total_likes=Count('likes')
-        )['total_likes'] or 0
-        
-        return topics_likes + replies_likes
+        return self._stats(obj).likes_received
     
     def get_followers_count(self, obj):
-        """Get number of followers - placeholder for now"""
-        from .models import Follow
-        return Follow.objects.filter(following=obj.user).count()
+        """Get number of followers"""
+        return self._stats(obj).followers_count
 
     def get_following_count(self, obj):
-        from .models import Follow
-        return Follow.objects.filter(follower=obj.user).count()
+        return self._stats(obj).following_count
 
     def get_is_following(self, obj):
         """Whether the requesting user is following this profile"""
-        request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
-            return False
-        from .models import Follow
-        return Follow.objects.filter(follower=request.user, following=obj.user).exists()
+        return ViewerState.from_context(self.context).is_following(obj.user_id)
 
 
 class ReportReasonSerializer(serializers.ModelSerializer):
@@ -0,0 +1,221 @@
+"""
+Signal handlers for the forum app
+"""
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cache
+from . import feed
+from .counters import refresh_reply_likes, refresh_topic_counters, refresh_user_stats
+from .models import (
+    Bookmark, Category, CategoryRule, Follow, Reply, SiteSettings, Tag, Topic, popular_tags_cache
+)
+
+
+@receiver(post_save, sender=Reply)
+@receiver(post_delete, sender=Reply)
+def update_topic_replies_count(sender, instance, **kwargs):
+    """Covers reply creation, deletion and hide/unhide (is_hidden changes)"""
+    refresh_topic_counters([instance.topic_id], fields=['replies_count'])
+
+
+@receiver(post_save, sender=Bookmark)
+def bookmark_created(sender, instance, created, **kwargs):
+    if created:
+        # Relative update: one statement, no recount (see forum.toggles.toggle_bookmark)
+        Topic.objects.filter(pk=instance.topic_id).update(bookmarks_count=F('bookmarks_count') + 1)
+
+
+@receiver(post_delete, sender=Bookmark)
+def bookmark_deleted(sender, instance, **kwargs):
+    Topic.objects.filter(pk=instance.topic_id).update(bookmarks_count=F('bookmarks_count') - 1)
+
+
+@receiver(m2m_changed, sender=Topic.likes.through)
+def update_topic_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Topic.likes_count in sync for both topic.likes and user.liked_topics"""
+    if action == 'pre_clear' and reverse:
+        # user.liked_topics.clear() does not report which topics were affected
+        instance._cleared_topic_ids = list(instance.liked_topics.values_list('pk', flat=True))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        topic_ids = [instance.pk]
+    elif action == 'post_clear':
+        topic_ids = getattr(instance, '_cleared_topic_ids', [])
+    else:
+        topic_ids = pk_set or []
+
+    refresh_topic_counters(topic_ids, fields=['likes_count'])
+
+
+@receiver(m2m_changed, sender=Reply.likes.through)
+def update_reply_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Reply.likes_count in sync for both reply.likes and user.liked_replies"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_reply_ids = list(instance.liked_replies.values_list('pk', flat=True))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        reply_ids = [instance.pk]
+    elif action == 'post_clear':
+        reply_ids = getattr(instance, '_cleared_reply_ids', [])
+    else:
+        reply_ids = pk_set or []
+
+    refresh_reply_likes(reply_ids)
+
+
+@receiver(post_save, sender=Topic)
+def topic_saved_user_stats(sender, instance, created, **kwargs):
+    if created:
+        refresh_user_stats([instance.author_id], fields=['topics_count'])
+
+
+@receiver(post_save, sender=Reply)
+def reply_saved_user_stats(sender, instance, **kwargs):
+    # Covers creation and hide/unhide
+    refresh_user_stats([instance.author_id], fields=['replies_count'])
+
+
+@receiver(pre_delete, sender=Topic)
+@receiver(pre_delete, sender=Reply)
+def remember_likers(sender, instance, **kwargs):
+    """Likes are deleted by cascade without m2m signals; remember who gave them"""
+    instance._liker_ids = list(instance.likes.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Reply)
+def post_deleted_user_stats(sender, instance, **kwargs):
+    fields = ['topics_count'] if sender is Topic else ['replies_count']
+    refresh_user_stats([instance.author_id], fields=fields + ['likes_received'])
+    refresh_user_stats(getattr(instance, '_liker_ids', []), fields=['likes_given'])
+
+
+def _refresh_like_stats(model, related_name, instance, action, reverse, pk_set):
+    """Refresh likes_given/likes_received for the users affected by a like change"""
+    cleared_attr = f'_cleared_{model._meta.model_name}_like_ids'
+    if action == 'pre_clear':
+        # clear() does not report which rows it removes
+        related = getattr(instance, related_name) if reverse else instance.likes
+        setattr(instance, cleared_attr, list(related.values_list('pk', flat=True)))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    ids = getattr(instance, cleared_attr, []) if action == 'post_clear' else list(pk_set or [])
+    if reverse:
+        liker_ids, object_ids = [instance.pk], ids
+    else:
+        liker_ids, object_ids = ids, [instance.pk]
+
+    author_ids = model.objects.filter(pk__in=object_ids).values_list('author_id', flat=True)
+    refresh_user_stats(liker_ids, fields=['likes_given'])
+    refresh_user_stats(author_ids, fields=['likes_received'])
+
+
+@receiver(m2m_changed, sender=Topic.likes.through)
+def topic_likes_user_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    _refresh_like_stats(Topic, 'liked_topics', instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Reply.likes.through)
+def reply_likes_user_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    _refresh_like_stats(Reply, 'liked_replies', instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_user_stats(sender, instance, **kwargs):
+    refresh_user_stats([instance.following_id], fields=['followers_count'])
+    refresh_user_stats([instance.follower_id], fields=['following_count'])
+
+
+@receiver(post_save, sender=Topic)
+def fan_out_topic(sender, instance, created, **kwargs):
+    if created:
+        feed.on_topic_created(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed(sender, instance, **kwargs):
+    feed.trim(instance.follower_id, instance.following_id)
+    feed.restore_fan_out(instance.following_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryRule)
+@receiver(post_delete, sender=CategoryRule)
+def invalidate_category_responses(sender, **kwargs):
+    cache.invalidate('categories', 'topics')
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def invalidate_topic_responses(sender, **kwargs):
+    cache.invalidate('topics', 'categories', 'tags')
+
+
+@receiver(post_save, sender=Reply)
+@receiver(post_delete, sender=Reply)
+def invalidate_reply_responses(sender, **kwargs):
+    # Topic lists show reply counts
+    cache.invalidate('topics')
+
+
+@receiver(post_save, sender=Bookmark)
+@receiver(post_delete, sender=Bookmark)
+def invalidate_bookmark_responses(sender, **kwargs):
+    # Topic lists show bookmark counts
+    cache.invalidate('topics')
+
+
+@receiver(m2m_changed, sender=Topic.likes.through)
+def invalidate_topic_like_responses(sender, action, **kwargs):
+    # Topic lists show like counts (forum.toggles invalidates for its direct writes)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cache.invalidate('topics')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_responses(sender, **kwargs):
+    cache.invalidate('tags', 'topics')
+
+
+@receiver(m2m_changed, sender=Topic.tags.through)
+def invalidate_topic_tag_responses(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cache.invalidate('tags', 'topics')
+
+
+@receiver(m2m_changed, sender=Topic.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Topic)
+def invalidate_popular_tags(sender, action=None, **kwargs):
+    """Tag usage changes when tags are (un)assigned or topics are deleted"""
+    if action is None or action in ('post_add', 'post_remove', 'post_clear'):
+        popular_tags_cache.invalidate()
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+def invalidate_site_settings_responses(sender, **kwargs):
+    cache.invalidate('site-settings')
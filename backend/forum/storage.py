@@ -0,0 +1,108 @@
+"""
+Image storage backends
+
+The upload pipeline (see forum.uploads) talks to storage through
+image_storage(), configured with IMAGE_UPLOAD_STORAGE. Backends return the
+value stored in a CloudinaryField ("image/upload/v<version>/<public_id>.<format>").
+
+CloudinaryImageStorage is the production backend. LocalImageStorage copies
+files under MEDIA_ROOT instead, so tests and local development never call
+Cloudinary (the URLs CloudinaryField builds for those values are not served).
+"""
+import os
+import shutil
+import time
+import uuid
+
+import cloudinary
+import cloudinary.uploader
+import cloudinary.utils
+from cloudinary.models import CloudinaryField
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class ImageStorage:
+    """Interface for image storage backends"""
+
+    def save(self, source, folder):
+        """Store a file (path or file object) in ``folder``; returns the field value"""
+        raise NotImplementedError
+
+    def delete(self, value):
+        """Remove a stored file given its field value"""
+        raise NotImplementedError
+
+    def direct_upload_params(self, folder):
+        """Signed parameters letting a client upload straight to the storage"""
+        raise NotImplementedError
+
+    def verify_direct_upload(self, data, folder):
+        """Field value for a client-reported direct upload, or None if it is not genuine
+
+        Backends without direct uploads accept none.
+        """
+        return None
+
+
+class CloudinaryImageStorage(ImageStorage):
+    def save(self, source, folder):
+        if hasattr(source, 'seekable') and source.seekable():
+            source.seek(0)
+        resource = cloudinary.uploader.upload_resource(
+            source, folder=folder, type='upload', resource_type='image'
+        )
+        return resource.get_prep_value()
+
+    def delete(self, value):
+        cloudinary.uploader.destroy(CloudinaryField().parse_cloudinary_resource(value).public_id)
+
+    def direct_upload_params(self, folder):
+        config = cloudinary.config()
+        params = {'folder': folder, 'timestamp': int(time.time())}
+        return {
+            **params,
+            'signature': cloudinary.utils.api_sign_request(params, config.api_secret),
+            'api_key': config.api_key,
+            'upload_url': cloudinary.utils.cloudinary_api_url('upload', resource_type='image'),
+        }
+
+    def verify_direct_upload(self, data, folder):
+        public_id = str(data.get('public_id') or '')
+        version = str(data.get('version') or '')
+        image_format = str(data.get('format') or '')
+        if not public_id.startswith(f'{folder}/') or not version.isdigit() or not image_format:
+            return None
+        if not cloudinary.utils.verify_api_response_signature(public_id, version, data.get('signature')):
+            return None
+        return f'image/upload/v{version}/{public_id}.{image_format}'
+
+
+class LocalImageStorage(ImageStorage):
+    """Stores images under MEDIA_ROOT; for tests and local development"""
+
+    def save(self, source, folder):
+        name = getattr(source, 'name', source)
+        extension = os.path.splitext(str(name))[1].lstrip('.').lower() or 'jpg'
+        public_id = f'{folder}/{uuid.uuid4().hex}'
+        destination = os.path.join(settings.MEDIA_ROOT, f'{public_id}.{extension}')
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+        if isinstance(source, (str, os.PathLike)):
+            shutil.copyfile(source, destination)
+        else:
+            if hasattr(source, 'seekable') and source.seekable():
+                source.seek(0)
+            with open(destination, 'wb') as output:
+                shutil.copyfileobj(source, output)
+        return f'image/upload/{public_id}.{extension}'
+
+    def delete(self, value):
+        path = os.path.join(settings.MEDIA_ROOT, value.removeprefix('image/upload/'))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def image_storage():
+    """The configured IMAGE_UPLOAD_STORAGE backend"""
+    return import_string(settings.IMAGE_UPLOAD_STORAGE)()
@@ -1,3 +1,1078 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.http import http_date
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from . import feed
+from .models import (
+    Bookmark, Category, FeedEntry, Follow, ImageUpload, PendingFanOut, Poll, PollOption, PollVote, Reply,
+    ReplyImage, Report, SiteSettings, Tag, Topic, TopicImage, UserStats, popular_tags_cache,
+    site_settings_cache
+)
+from .pagination import KeysetPagination
+from .periodic import PeriodicFlush
+from . import search
+from .toggles import toggle_bookmark, toggle_like
+from .topic_writer import add_topic_images, resolve_tags
+from .uploads import process_pending
+from .view_counter import ViewCounterBuffer
+
+
+def make_user(username='driver'):
+    return User.objects.create_user(username, f'{username}@example.com')
+
+
+def count_queries(client, url):
+    """Number of queries a successful GET of ``url`` runs"""
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    return len(queries)
+
+
+def make_topic(author, category=None, **kwargs):
+    category = category or Category.objects.create(title='Engines', description='Engines')
+    return Topic.objects.create(
+        title=kwargs.pop('title', 'Oil change'), content=kwargs.pop('content', '...'), author=author,
+        category=category, **kwargs
+    )
+
+
+class ResolveTagsTests(TestCase):
+    def test_creates_missing_tags_and_reuses_existing(self):
+        existing = Tag.objects.create(name='bmw', slug='bmw')
+
+        tags = resolve_tags([' BMW', 'audi', 'audi ', ''])
+
+        self.assertEqual([tag.name for tag in tags], ['bmw', 'audi'])
+        self.assertEqual(tags[0], existing)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_non_ascii_names_get_their_own_tags(self):
+        first = resolve_tags(['ბმვ'])
+        second = resolve_tags(['მერსედესი'])
+
+        self.assertEqual([tag.name for tag in first], ['ბმვ'])
+        self.assertEqual([tag.name for tag in second], ['მერსედესი'])
+        self.assertNotEqual(first[0].slug, second[0].slug)
+        self.assertEqual(second[0].slug, 'მერსედესი')
+
+    def test_colliding_slugs_get_a_suffix(self):
+        tags = resolve_tags(['C++', 'c', '!!!', '???'])
+
+        self.assertEqual([tag.name for tag in tags], ['c++', 'c', '!!!', '???'])
+        self.assertEqual(len({tag.slug for tag in tags}), 4)
+        self.assertEqual(Tag.objects.get(name='c++').slug, 'c')
+        self.assertEqual(Tag.objects.get(name='c').slug, 'c-2')
+
+    def test_never_matches_another_tags_slug(self):
+        Tag.objects.create(name='c sharp', slug='c')
+
+        tags = resolve_tags(['c'])
+
+        self.assertEqual(tags[0].name, 'c')
+        self.assertEqual(tags[0].slug, 'c-2')
+
+
+
+class TopicWriteValidationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.category = Category.objects.create(title='Engines', description='Engines')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_topic(self, **data):
+        return self.client.post('/api/topics/', {
+            'title': 'Oil change', 'content': '...', 'category': self.category.id, **data
+        }, format='json')
+
+    def test_topic_with_a_poll_is_created(self):
+        response = self.create_topic(
+            poll_question='Which oil?', poll_options=['5W-30', '10W-40'], poll_option_orders=['1', '0']
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([option['text'] for option in response.data['poll']['options']], ['10W-40', '5W-30'])
+
+    def test_malformed_orders_are_rejected(self):
+        response = self.create_topic(
+            poll_question='Which oil?', poll_options=['5W-30'], poll_option_orders=['first']
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('poll_option_orders', response.data)
+        self.assertFalse(Topic.objects.exists())
+
+    def test_malformed_direct_upload_order_is_rejected(self):
+        topic = make_topic(self.user, self.category)
+
+        with self.assertRaises(ValidationError):
+            add_topic_images(topic, [], [], [], [('image/upload/v1/topic_images/a.jpg', {'order': [1]})])
+
+
+class ViewCounterBufferTests(TestCase):
+    def setUp(self):
+        author = make_user()
+        self.topic = make_topic(author)
+        self.other = make_topic(author, category=self.topic.category, title='Brakes')
+
+    def test_add_reports_pending_views_including_the_flushed_one(self):
+        buffer = ViewCounterBuffer(flush_interval=3600, flush_threshold=3)
+
+        self.assertEqual(buffer.add(self.topic.id), 1)
+        self.assertEqual(buffer.add(self.topic.id), 2)
+        # The third view triggers the flush and is still reported
+        self.assertEqual(buffer.add(self.topic.id), 3)
+
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.views, 3)
+        self.assertEqual(buffer.pending(self.topic.id), 0)
+
+    def test_failed_flush_keeps_every_view_exactly_once(self):
+        buffer = ViewCounterBuffer(flush_interval=3600, flush_threshold=1000)
+        buffer.add(self.topic.id)
+        buffer.add(self.other.id, count=2)
+
+        update = QuerySet.update
+        calls = []
+
+        def fail_second_update(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 2:
+                raise RuntimeError('database went away')
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', fail_second_update):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+
+        # The first UPDATE was rolled back along with the failed one
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.views, 0)
+        self.assertEqual((buffer.pending(self.topic.id), buffer.pending(self.other.id)), (1, 2))
+
+        self.assertEqual(buffer.flush(), 2)
+        self.topic.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.topic.views, self.other.views), (1, 2))
+
+
+class PeriodicFlushTests(TestCase):
+    def test_flushes_in_the_background_and_survives_errors(self):
+        flushed = threading.Event()
+        calls = []
+
+        def flush():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('first flush fails')
+            flushed.set()
+
+        timer = PeriodicFlush(flush, 0.05, 'test')
+        with self.assertLogs('forum.periodic', level='ERROR'):
+            timer.ensure_started()
+            timer.ensure_started()
+            self.assertTrue(flushed.wait(5))
+        self.assertGreaterEqual(len(calls), 2)
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+class FeedFanOutTests(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.followers = [make_user(f'fan{i}') for i in range(3)]
+        for follower in self.followers:
+            Follow.objects.create(follower=follower, following=self.author)
+
+    def test_topics_of_high_fanout_authors_are_pulled_at_read_time(self):
+        topic = make_topic(self.author)
+
+        self.assertFalse(FeedEntry.objects.filter(topic=topic).exists())
+        self.assertEqual(feed.high_fanout_following(self.followers[0]), [self.author.id])
+        self.assertIn(topic, feed.pulled_feed(self.followers[0], [self.author.id]))
+
+    def test_dropping_back_to_the_limit_backfills_followers(self):
+        topic = make_topic(self.author)
+
+        Follow.objects.get(follower=self.followers[0], following=self.author).delete()
+
+        self.assertEqual(feed.high_fanout_following(self.followers[1]), [])
+        self.assertEqual(
+            set(FeedEntry.objects.filter(topic=topic).values_list('user_id', flat=True)),
+            {self.followers[1].id, self.followers[2].id}
+        )
+
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.author = make_user('author')
+        self.follower = make_user('fan')
+        self.category = Category.objects.create(title='Engines', description='Engines')
+        self.topics = [make_topic(self.author, self.category, title=f'Topic {n}') for n in range(3)]
+
+    def feed_topic_ids(self):
+        return set(FeedEntry.objects.filter(user=self.follower).values_list('topic_id', flat=True))
+
+    def test_following_backfills_every_topic(self):
+        Follow.objects.create(follower=self.follower, following=self.author)
+
+        self.assertEqual(self.feed_topic_ids(), {topic.id for topic in self.topics})
+
+    @override_settings(FEED_BACKFILL_LIMIT=2)
+    def test_backfill_limit_keeps_the_most_recent_topics(self):
+        Follow.objects.create(follower=self.follower, following=self.author)
+
+        self.assertEqual(self.feed_topic_ids(), {self.topics[1].id, self.topics[2].id})
+
+    @override_settings(FEED_FANOUT_ASYNC=True)
+    def test_async_fan_out_is_queued_for_the_worker(self):
+        Follow.objects.create(follower=self.follower, following=self.author)
+        topic = make_topic(self.author, self.category)
+
+        self.assertNotIn(topic.id, self.feed_topic_ids())
+        self.assertTrue(PendingFanOut.objects.filter(topic=topic).exists())
+
+        call_command('process_feed_fan_out', stdout=io.StringIO())
+
+        self.assertIn(topic.id, self.feed_topic_ids())
+        self.assertFalse(PendingFanOut.objects.exists())
+
+
+class ImageUploadMixin:
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.addCleanup(shutil.rmtree, staging_dir)
+        storage_settings = override_settings(
+            IMAGE_UPLOAD_STORAGE='forum.storage.LocalImageStorage',
+            MEDIA_ROOT=media_root,
+            IMAGE_UPLOAD_STAGING_DIR=staging_dir,
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+        self.media_root, self.staging_dir = media_root, staging_dir
+
+        self.user = make_user()
+        self.category = Category.objects.create(title='Engines', description='Engines')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def image(self, name):
+        return SimpleUploadedFile(name, b'\x89PNG' + name.encode(), content_type='image/png')
+
+    def post_topic(self, **data):
+        return self.client.post('/api/topics/', {
+            'title': 'Turbo', 'content': 'Photos', 'category': self.category.id, **data
+        }, format='multipart')
+
+    def stored_files(self):
+        return sorted(name for _, _, names in os.walk(self.media_root) for name in names)
+
+
+@override_settings(IMAGE_UPLOAD_ASYNC=False)
+class SyncImageUploadTests(ImageUploadMixin, TransactionTestCase):
+    """Uploads run on commit, so these tests need real transactions"""
+
+    def test_sync_upload_stores_files_when_the_topic_commits(self):
+        response = self.post_topic(images=[self.image('a.png'), self.image('b.png')], image_captions=['front', 'back'])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([image['status'] for image in response.data['images']], ['ready', 'ready'])
+        images = TopicImage.objects.filter(topic_id=response.data['id']).order_by('order')
+        self.assertEqual([image.status for image in images], ['ready', 'ready'])
+        self.assertEqual([image.caption for image in images], ['front', 'back'])
+        self.assertTrue(all(str(image.image).startswith('topic_images/') for image in images))
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_sync_upload_on_edit_returns_stored_images(self):
+        topic_id = self.post_topic().data['id']
+
+        response = self.client.patch(f'/api/topics/{topic_id}/', {
+            'title': 'Turbo', 'content': 'Photos', 'category': self.category.id, 'images': [self.image('a.png')]
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([image['status'] for image in response.data['images']], ['ready'])
+        self.assertIsNotNone(response.data['images'][0]['image_url'])
+
+    def test_sync_reply_upload_returns_stored_images(self):
+        topic = make_topic(self.user, self.category)
+
+        response = self.client.post('/api/replies/', {
+            'topic': topic.id, 'content': 'Same here', 'images': [self.image('a.png'), self.image('b.png')]
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([image['status'] for image in response.data['images']], ['ready', 'ready'])
+        self.assertTrue(all(image['image_url'] for image in response.data['images']))
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_sync_profile_upload_returns_the_new_image(self):
+        response = self.client.post(
+            f'/api/profiles/{self.user.id}/upload_image/', {'user_image': self.image('me.png')},
+            format='multipart'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['pending'])
+        self.assertIsNotNone(response.data['profile']['user_image_url'])
+
+    def test_direct_profile_upload_returns_the_new_image(self):
+        value = 'image/upload/user_images/me.png'
+        with mock.patch('forum.storage.LocalImageStorage.verify_direct_upload', return_value=value):
+            response = self.client.post(
+                f'/api/profiles/{self.user.id}/upload_image/', {'uploaded_image': '{}'}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['profile']['user_image_url'].endswith('/user_images/me.png'))
+
+    def test_sync_upload_skips_rolled_back_writes(self):
+        response = self.post_topic(
+            images=[self.image('a.png')], poll_question='Best?', poll_options=['Yes'],
+            poll_option_orders=['not a number']
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TopicImage.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+
+class ImageUploadTests(ImageUploadMixin, TestCase):
+    @override_settings(IMAGE_UPLOAD_ASYNC=True)
+    def test_async_upload_is_staged_then_processed(self):
+        response = self.post_topic(images=[self.image('a.png'), self.image('b.png')])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([image['status'] for image in response.data['images']], ['pending', 'pending'])
+        self.assertEqual(len(os.listdir(self.staging_dir)), 2)
+        self.assertEqual(self.stored_files(), [])
+
+        self.assertEqual(process_pending(), 2)
+
+        images = TopicImage.objects.filter(topic_id=response.data['id'])
+        self.assertEqual({image.status for image in images}, {'ready'})
+        self.assertEqual(set(ImageUpload.objects.values_list('status', flat=True)), {'done'})
+        self.assertEqual(os.listdir(self.staging_dir), [])
+        self.assertEqual(len(self.stored_files()), 2)
+        self.assertEqual(process_pending(), 0)
+
+    @override_settings(IMAGE_UPLOAD_ASYNC=True)
+    def test_failed_uploads_are_retried_then_marked_failed(self):
+        response = self.post_topic(images=[self.image('a.png')])
+        for name in os.listdir(self.staging_dir):
+            os.remove(os.path.join(self.staging_dir, name))
+
+        for attempt in range(5):
+            self.assertEqual(process_pending(), 1)
+
+        upload = ImageUpload.objects.get()
+        self.assertEqual((upload.status, upload.attempts), ('failed', 5))
+        self.assertEqual(TopicImage.objects.get(topic_id=response.data['id']).status, 'failed')
+
+    def test_rejects_direct_uploads_with_a_bad_signature(self):
+        with override_settings(IMAGE_UPLOAD_STORAGE='forum.storage.CloudinaryImageStorage'):
+            response = self.post_topic(uploaded_images=[
+                '{"public_id": "topic_images/abc", "version": "1", "signature": "forged", "format": "png"}'
+            ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Topic.objects.exists())
+
+
+class SiteSettingsTests(TestCase):
+    def setUp(self):
+        site_settings_cache.invalidate()
+        self.addCleanup(site_settings_cache.invalidate)
+
+    def test_load_returns_a_copy_of_the_cached_instance(self):
+        settings = SiteSettings.load()
+        settings.auto_hide_reported_replies = 2
+
+        self.assertEqual(SiteSettings.load().auto_hide_reported_replies, 5)
+
+        settings.save()
+        self.assertEqual(SiteSettings.load().auto_hide_reported_replies, 2)
+
+
+class AutoHideReportedRepliesTests(TestCase):
+    def setUp(self):
+        site_settings_cache.invalidate()
+        self.addCleanup(site_settings_cache.invalidate)
+        author = make_user('author')
+        self.reply = Reply.objects.create(topic=make_topic(author), author=author, content='Buy my tyres')
+        self.reporters = [make_user(f'reporter{i}') for i in range(3)]
+
+    def set_threshold(self, threshold):
+        settings = SiteSettings.load()
+        settings.auto_hide_reported_replies = threshold
+        settings.save()
+
+    def report(self, reporter):
+        client = APIClient()
+        client.force_authenticate(reporter)
+        response = client.post('/api/reports/', {'reply': self.reply.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.reply.refresh_from_db()
+
+    def test_reply_is_hidden_once_pending_reports_reach_the_threshold(self):
+        self.set_threshold(2)
+
+        self.report(self.reporters[0])
+        self.assertFalse(self.reply.is_hidden)
+        self.report(self.reporters[1])
+        self.assertTrue(self.reply.is_hidden)
+
+    def test_reviewed_reports_do_not_count(self):
+        self.set_threshold(2)
+        self.report(self.reporters[0])
+        Report.objects.update(status='dismissed')
+
+        self.report(self.reporters[1])
+        self.assertFalse(self.reply.is_hidden)
+
+    def test_threshold_zero_disables_auto_hiding(self):
+        self.set_threshold(0)
+
+        for reporter in self.reporters:
+            self.report(reporter)
+        self.assertFalse(self.reply.is_hidden)
+
+
+class UserProfileLookupTests(TestCase):
+    def test_profile_is_looked_up_by_user_id(self):
+        user = make_user()
+
+        response = APIClient().get(f'/api/profiles/{user.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], user.username)
+
+    def test_unknown_or_malformed_ids_are_not_found(self):
+        client = APIClient()
+
+        self.assertEqual(client.get('/api/profiles/999/').status_code, 404)
+        self.assertEqual(client.get('/api/profiles/abc/').status_code, 404)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        category = Category.objects.create(title='Engines', description='Engines')
+        self.topics = [make_topic(user, category, title=f'Topic {n}') for n in range(5)]
+
+    def test_cursor_walks_every_topic_forwards_and_back(self):
+        url = '/api/topics/?pagination=cursor&page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(topic['id'] for topic in response.data['results'])
+            last, url = response, response.data['next']
+
+        self.assertEqual(seen, [topic.id for topic in reversed(self.topics)])
+
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual([topic['id'] for topic in previous.data['results']], seen[2:4])
+
+    def test_edited_topics_do_not_move_during_a_walk(self):
+        response = self.client.get('/api/topics/?pagination=cursor&page_size=2')
+        seen = [topic['id'] for topic in response.data['results']]
+        # On an updated_at key the edit would move this topic onto the page already read
+        self.topics[0].title = 'Edited'
+        self.topics[0].save()
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen.extend(topic['id'] for topic in response.data['results'])
+
+        self.assertEqual(seen, [topic.id for topic in reversed(self.topics)])
+
+    def test_mutable_orderings_keep_page_numbers(self):
+        category = self.topics[0].category
+
+        response = self.client.get(
+            f'/api/categories/{category.id}/topics/?ordering=-replies_count&pagination=cursor&page_size=2'
+        )
+
+        self.assertEqual(response.data['count'], 5)
+        self.assertIn('page=2', response.data['next'])
+        with self.assertRaises(ValueError):
+            KeysetPagination('-updated_at')
+
+    def test_tampered_cursor_is_not_found(self):
+        for payload in (b'["not a date", 1, false]', b'[{"a": 1}, 1, false]', b'["2026-01-01T00:00:00", "1", false]'):
+            cursor = base64.urlsafe_b64encode(payload).decode('ascii')
+            response = self.client.get(f'/api/topics/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404, payload)
+
+        self.assertEqual(self.client.get('/api/topics/?cursor=%%%').status_code, 404)
+
+
+
+class TopicCounterTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.reader = make_user('mechanic')
+        self.topic = make_topic(self.author)
+
+    def assertCounters(self, replies=0, likes=0, bookmarks=0):
+        self.topic.refresh_from_db()
+        self.assertEqual(
+            (self.topic.replies_count, self.topic.likes_count, self.topic.bookmarks_count),
+            (replies, likes, bookmarks)
+        )
+
+    def test_replies_count_follows_creation_deletion_and_hiding(self):
+        first = Reply.objects.create(topic=self.topic, author=self.reader, content='Use 5W-30')
+        second = Reply.objects.create(topic=self.topic, author=self.reader, content='Check the filter')
+        self.assertCounters(replies=2)
+
+        first.is_hidden = True
+        first.save()
+        self.assertCounters(replies=1)
+
+        first.is_hidden = False
+        first.save()
+        self.assertCounters(replies=2)
+
+        second.delete()
+        self.assertCounters(replies=1)
+
+    def test_likes_count_follows_both_sides_of_the_relation(self):
+        self.topic.likes.add(self.reader)
+        self.assertCounters(likes=1)
+
+        self.reader.liked_topics.clear()
+        self.assertCounters(likes=0)
+
+    def test_bookmarks_count_follows_bookmarks(self):
+        bookmark = Bookmark.objects.create(user=self.reader, topic=self.topic)
+        self.assertCounters(bookmarks=1)
+
+        bookmark.delete()
+        self.assertCounters(bookmarks=0)
+
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.reader = make_user('mechanic')
+        self.topic = make_topic(self.author)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_visible_replies_are_counted(self):
+        reply = Reply.objects.create(topic=self.topic, author=self.reader, content='Use 5W-30')
+        self.assertEqual(self.stats(self.reader).replies_count, 1)
+
+        reply.is_hidden = True
+        reply.save()
+        self.assertEqual(self.stats(self.reader).replies_count, 0)
+
+    def test_deleting_a_liked_topic_updates_both_users(self):
+        self.topic.likes.add(self.reader)
+        self.assertEqual(self.stats(self.author).likes_received, 1)
+        self.assertEqual(self.stats(self.reader).likes_given, 1)
+
+        self.topic.delete()
+
+        self.assertEqual((self.stats(self.author).topics_count, self.stats(self.author).likes_received), (0, 0))
+        self.assertEqual(self.stats(self.reader).likes_given, 0)
+
+    def test_follows_are_counted_on_both_sides(self):
+        follow = Follow.objects.create(follower=self.reader, following=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+        follow.delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+    def test_rebuild_recomputes_drifted_rows(self):
+        Reply.objects.create(topic=self.topic, author=self.reader, content='Use 5W-30')
+        UserStats.objects.update(topics_count=7, replies_count=7)
+
+        call_command('rebuild_user_stats', stdout=io.StringIO())
+
+        self.assertEqual((self.stats(self.author).topics_count, self.stats(self.author).replies_count), (1, 0))
+        self.assertEqual(self.stats(self.reader).replies_count, 1)
+
+    def test_profile_reads_counts_from_the_rollup(self):
+        Follow.objects.create(follower=self.reader, following=self.author)
+
+        response = APIClient().get(f'/api/profiles/{self.author.id}/')
+
+        self.assertEqual(response.data['topics_count'], 1)
+        self.assertEqual(response.data['followers_count'], 1)
+
+
+class ToggleTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.reader = make_user('reader')
+        self.topic = make_topic(self.author)
+
+    def test_toggle_like_shifts_counters(self):
+        self.assertEqual(toggle_like(self.topic, self.reader), (True, 1))
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.likes_count, 1)
+        self.assertTrue(self.topic.likes.filter(pk=self.reader.pk).exists())
+        self.assertEqual(UserStats.objects.get(user=self.reader).likes_given, 1)
+        self.assertEqual(UserStats.objects.get(user=self.author).likes_received, 1)
+
+        self.assertEqual(toggle_like(self.topic, self.reader), (False, 0))
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.likes_count, 0)
+        self.assertEqual(UserStats.objects.get(user=self.reader).likes_given, 0)
+        self.assertEqual(UserStats.objects.get(user=self.author).likes_received, 0)
+
+    def test_toggle_like_on_a_reply(self):
+        reply = Reply.objects.create(topic=self.topic, author=self.author, content='Use 5W-30')
+
+        self.assertEqual(toggle_like(reply, self.reader), (True, 1))
+        reply.refresh_from_db()
+        self.assertEqual(reply.likes_count, 1)
+        self.assertEqual(toggle_like(reply, self.reader), (False, 0))
+
+    def test_toggle_bookmark_shifts_counter(self):
+        self.assertEqual(toggle_bookmark(self.topic, self.reader), (True, 1))
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.bookmarks_count, 1)
+
+        self.assertEqual(toggle_bookmark(self.topic, self.reader), (False, 0))
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.bookmarks_count, 0)
+        self.assertFalse(Bookmark.objects.exists())
+
+    def test_like_endpoint_reports_the_new_count(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+
+        response = client.post(f'/api/topics/{self.topic.id}/like/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['likes_count'], 1)
+
+        response = client.post(f'/api/topics/{self.topic.id}/like/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['likes_count'], 0)
+
+    def test_authors_cannot_like_or_bookmark_their_own_topic(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+
+        self.assertEqual(client.post(f'/api/topics/{self.topic.id}/like/').status_code, 400)
+        self.assertEqual(client.post(f'/api/topics/{self.topic.id}/bookmark/').status_code, 400)
+
+    @override_settings(GAMIFICATION_ASYNC=True)
+    def test_queued_like_reports_an_empty_badge_list(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+
+        response = client.post(f'/api/topics/{self.topic.id}/like/')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['badges_unlocked'], [])
+        self.assertTrue(response.data['queued'])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.category = Category.objects.create(title='Engines', description='Engines')
+
+    def search(self, query):
+        backend = search.get_search_backend()
+        return list(backend.search(Topic.objects.all(), query).order_by('-search_rank'))
+
+    def test_search_terms_drop_query_syntax(self):
+        self.assertEqual(search.search_terms('Oil-change "5W-30" OR *'), ['oil', 'change', '5w', '30', 'or'])
+        self.assertEqual(len(search.search_terms(' '.join(['word'] * 40))), 16)
+        self.assertEqual(search.search_terms('  !?  '), [])
+
+    def test_highlight_marks_matching_words(self):
+        text = search.highlight('Change the oil filter every year', 'oil')
+
+        self.assertEqual(text, f'Change the {search.HIGHLIGHT_START}oil{search.HIGHLIGHT_END} filter every year')
+
+    def test_snippet_escapes_content_and_keeps_only_the_highlights(self):
+        topic = make_topic(self.author, self.category, content='<p>Oil & filter <script>x</script></p>')
+        topic.search_snippet = f'<p>{search.HIGHLIGHT_START}Oil{search.HIGHLIGHT_END} & filter <scr'
+
+        self.assertEqual(search.BaseSearchBackend().snippet(topic, 'oil'), '<mark>Oil</mark> &amp; filter ')
+
+    def test_title_matches_rank_above_content_matches(self):
+        in_content = make_topic(self.author, self.category, title='Weekend drive', content='Brakes squeal')
+        in_title = make_topic(self.author, self.category, title='Brakes squeal', content='Since Monday')
+        make_topic(self.author, self.category, title='Tyres', content='Winter tyres')
+
+        self.assertEqual(self.search('brakes'), [in_title, in_content])
+        # The last word is matched as a prefix while typing
+        self.assertEqual(self.search('squ'), [in_title, in_content])
+
+    def test_search_follows_title_changes_and_deletion(self):
+        topic = make_topic(self.author, self.category, title='Turbo whistle')
+        topic.title = 'Supercharger whine'
+        topic.save()
+
+        self.assertEqual(self.search('turbo'), [])
+        self.assertEqual(self.search('supercharger'), [topic])
+
+        topic.delete()
+        self.assertEqual(self.search('supercharger'), [])
+
+    def test_dropped_triggers_are_restored(self):
+        topic = make_topic(self.author, self.category, title='Turbo whistle')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER forum_topic_fts_update')
+
+        with self.assertLogs('forum.search', 'WARNING'):
+            self.assertTrue(search.ensure_search_index())
+        self.assertFalse(search.ensure_search_index())
+
+        topic.title = 'Supercharger whine'
+        topic.save()
+        self.assertEqual(self.search('supercharger'), [topic])
+
+    def test_search_endpoint_returns_highlighted_snippets(self):
+        topic = make_topic(self.author, self.category, title='Brakes', content='The brakes squeal when cold')
+
+        response = APIClient().get('/api/search/', {'q': 'squeal', 'filter': 'topics'})
+
+        self.assertEqual([result['id'] for result in response.data['topics']], [topic.id])
+        self.assertIn('<mark>squeal</mark>', response.data['topics'][0]['snippet'])
+
+
+class TopicListQueryTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.reader = make_user('reader')
+        self.category = Category.objects.create(title='Engines', description='Engines')
+        self.tags = [Tag.objects.create(name=name, slug=name) for name in ('oil', 'diesel')]
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def add_topics(self, count):
+        for n in range(count):
+            topic = make_topic(self.author, self.category, title=f'Topic {n}')
+            topic.tags.set(self.tags)
+            topic.likes.add(self.reader)
+            TopicImage.objects.create(topic=topic, image='image/upload/v1/topic_images/a.jpg')
+            poll = Poll.objects.create(topic=topic, question='Which oil?')
+            option = PollOption.objects.create(poll=poll, text='5W-30')
+            PollOption.objects.create(poll=poll, text='10W-40', order=1)
+            PollVote.objects.create(poll_option=option, user=self.reader)
+
+    def test_poll_options_keep_their_order(self):
+        topic = make_topic(self.author, self.category)
+        poll = Poll.objects.create(topic=topic, question='Which oil?')
+        for order, text in [(2, 'Synthetic'), (0, 'Mineral'), (1, 'Semi')]:
+            PollOption.objects.create(poll=poll, text=text, order=order)
+
+        response = self.client.get('/api/topics/')
+
+        options = response.data['results'][0]['poll']['options']
+        self.assertEqual([option['text'] for option in options], ['Mineral', 'Semi', 'Synthetic'])
+
+    def test_topic_list_query_count_does_not_grow_with_the_page(self):
+        url = '/api/topics/?page_size=20'
+        self.add_topics(1)
+        expected = count_queries(self.client, url)
+
+        self.add_topics(9)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class ReplyThreadQueryTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.reader = make_user('reader')
+        self.topic = make_topic(self.author)
+        # The author also sees the pending report counts of their replies
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def add_thread(self):
+        """A top-level reply with two children"""
+        top = Reply.objects.create(topic=self.topic, author=self.author, content='...')
+        children = [
+            Reply.objects.create(topic=self.topic, author=self.author, content='...', parent=top)
+            for _ in range(2)
+        ]
+        for reply in [top] + children:
+            ReplyImage.objects.create(reply=reply, image='image/upload/v1/reply_images/a.jpg')
+            Report.objects.create(reply=reply, reporter=self.reader)
+            reply.likes.add(self.reader)
+
+    def test_thread_query_count_does_not_grow_with_the_thread(self):
+        url = f'/api/replies/?topic_id={self.topic.id}&page_size=20'
+        self.add_thread()
+        expected = count_queries(self.client, url)
+
+        for _ in range(5):
+            self.add_thread()
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(response.data['results'][0]['child_replies']), 2)
+
+
+class ViewerStateQueryTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.reader = make_user('reader')
+        self.topic = make_topic(self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def test_liked_flags_cost_one_query_per_page(self):
+        url = f'/api/replies/?topic_id={self.topic.id}&page_size=20'
+
+        def add_liked_replies(count):
+            for _ in range(count):
+                top = Reply.objects.create(topic=self.topic, author=self.author, content='...')
+                top.likes.add(self.reader)
+                Reply.objects.create(
+                    topic=self.topic, author=self.author, content='...', parent=top
+                ).likes.add(self.reader)
+
+        add_liked_replies(1)
+        expected = count_queries(self.client, url)
+
+        add_liked_replies(5)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        flags = []
+        for reply in response.data['results']:
+            flags.append(reply['user_has_liked'])
+            flags.extend(child['user_has_liked'] for child in reply['child_replies'])
+        self.assertEqual(flags, [True] * 12)
+
+    def test_poll_votes_cost_one_query_per_page(self):
+        category = self.topic.category
+
+        def add_voted_polls(count):
+            for _ in range(count):
+                poll = Poll.objects.create(topic=make_topic(self.author, category), question='Which oil?')
+                PollOption.objects.create(poll=poll, text='5W-30')
+                voted = PollOption.objects.create(poll=poll, text='10W-40', order=1)
+                PollVote.objects.create(poll_option=voted, user=self.reader)
+
+        add_voted_polls(1)
+        expected = count_queries(self.client, '/api/topics/?page_size=20')
+
+        add_voted_polls(5)
+        with self.assertNumQueries(expected):
+            response = self.client.get('/api/topics/?page_size=20')
+        polls = [topic['poll'] for topic in response.data['results'] if topic['poll']]
+        self.assertEqual(len(polls), 6)
+        for poll in polls:
+            self.assertEqual(poll['user_vote'], poll['options'][1]['id'])
+            self.assertEqual([option['user_has_voted'] for option in poll['options']], [False, True])
+
+    def test_detail_flags_for_the_viewer(self):
+        Bookmark.objects.create(user=self.reader, topic=self.topic)
+
+        response = self.client.get(f'/api/topics/{self.topic.id}/')
+
+        self.assertEqual((response.data['user_has_liked'], response.data['user_has_bookmarked']), (False, True))
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = make_user()
+        self.reader = make_user('reader')
+        self.topic = make_topic(self.author)
+        self.client = APIClient()
+
+    def get_topics(self):
+        response = self.client.get('/api/topics/')
+        return response['X-Response-Cache'], response.data['results'][0]
+
+    def test_anonymous_topic_list_is_cached_until_a_topic_is_saved(self):
+        self.assertEqual(self.get_topics()[0], 'MISS')
+        self.assertEqual(self.get_topics()[0], 'HIT')
+
+        self.topic.title = 'Oil change interval'
+        self.topic.save()
+
+        state, topic = self.get_topics()
+        self.assertEqual((state, topic['title']), ('MISS', 'Oil change interval'))
+
+    def test_likes_and_bookmarks_drop_cached_topic_lists(self):
+        self.get_topics()
+
+        toggle_like(self.topic, self.reader)
+        state, topic = self.get_topics()
+        self.assertEqual((state, topic['likes_count']), ('MISS', 1))
+
+        toggle_bookmark(self.topic, self.reader)
+        self.assertEqual(self.get_topics()[0], 'MISS')
+
+    def test_authenticated_requests_are_not_cached(self):
+        self.client.force_authenticate(self.reader)
+
+        self.assertNotIn('X-Response-Cache', self.client.get('/api/topics/'))
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        category = Category.objects.create(title='Engines', description='Engines')
+        self.topics = [make_topic(self.author, category, title=f'Topic {i}') for i in range(5)]
+
+    def export(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, json.loads(b''.join(response.streaming_content))
+
+    def test_ranges_cover_every_topic_once(self):
+        ids = []
+        after = 0
+        while after is not None:
+            response, data = self.export(f'/api/sitemap/topics/?after={after}&limit=2')
+            ids.extend(row[0] for row in data['topics'])
+            self.assertEqual(data['count'], len(data['topics']))
+            after = data['next_after']
+
+        self.assertEqual(ids, [topic.id for topic in self.topics])
+
+    def test_full_export_has_no_next_range(self):
+        response, data = self.export('/api/sitemap/topics/')
+
+        self.assertEqual(data['fields'], ['id', 'updated_at', 'category_id'])
+        self.assertEqual(data['count'], 5)
+        self.assertIsNone(data['next_after'])
+
+    def test_if_modified_since_returns_304_until_a_topic_changes(self):
+        response, data = self.export('/api/sitemap/topics/')
+        last_modified = response['Last-Modified']
+
+        response = self.client.get('/api/sitemap/topics/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        later = self.topics[0].updated_at + timedelta(seconds=60)
+        Topic.objects.filter(pk=self.topics[0].pk).update(updated_at=later)
+        response, data = self.export('/api/sitemap/topics/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response['Last-Modified'], http_date(later.timestamp()))
+
+    def test_rejects_bad_ranges(self):
+        self.assertEqual(self.client.get('/api/sitemap/topics/?after=x').status_code, 400)
+        self.assertEqual(self.client.get('/api/sitemap/topics/?limit=0').status_code, 400)
+
+
+class RelatedTopicsTests(TestCase):
+    def setUp(self):
+        self.author = make_user()
+        self.category = Category.objects.create(title='Engines', description='Engines')
+        self.tags = [Tag.objects.create(name=name, slug=name) for name in ('bmw', 'e46', 'oil', 'diesel')]
+        self.updated_at = timezone.now()
+        self.topic = self.tagged('Oil change', self.tags)
+
+    def tagged(self, title, tags, category=None):
+        """Create a tagged topic, each one updated a minute after the previous"""
+        topic = make_topic(self.author, category or self.category, title=title)
+        topic.tags.set(tags)
+        self.updated_at += timedelta(minutes=1)
+        Topic.objects.filter(pk=topic.pk).update(updated_at=self.updated_at)
+        return topic
+
+    def test_ranks_by_shared_tags_then_recent_updates(self):
+        older = self.tagged('Older', self.tags[:3])
+        best = self.tagged('Best', self.tags)
+        newer = self.tagged('Newer', self.tags[1:])
+        self.tagged('Too few', self.tags[:2])
+        self.tagged('Elsewhere', self.tags, Category.objects.create(title='Tyres', description='Tyres'))
+
+        related = Topic.objects.related_to(self.topic, [tag.id for tag in self.tags])
+
+        self.assertEqual([(t.id, t.shared_tags) for t in related], [(best.id, 4), (newer.id, 3), (older.id, 3)])
+
+    def test_endpoint_returns_the_top_five(self):
+        expected = [self.tagged(f'Match {i}', self.tags).id for i in range(6)][::-1][:5]
+        client = APIClient()
+        client.force_authenticate(self.author)
+
+        response = client.get(f'/api/topics/{self.topic.id}/related/')
+
+        self.assertEqual([topic['id'] for topic in response.data], expected)
+
+    def test_topics_with_fewer_than_three_tags_have_no_related_topics(self):
+        self.topic.tags.set(self.tags[:2])
+        self.tagged('Match', self.tags)
+
+        response = self.client.get(f'/api/topics/{self.topic.id}/related/')
+
+        self.assertEqual(response.data, [])
+
+
+class PopularTagsTests(TestCase):
+    def setUp(self):
+        # The cached list outlives the test transaction; start and end empty
+        popular_tags_cache.invalidate()
+        self.addCleanup(popular_tags_cache.invalidate)
+        author = make_user()
+        self.category = Category.objects.create(title='Engines', description='Engines')
+        self.bmw, self.audi, self.oil = [
+            Tag.objects.create(name=name, slug=name) for name in ('bmw', 'audi', 'oil')
+        ]
+        self.topics = [make_topic(author, self.category, title=f'Topic {i}') for i in range(3)]
+        for topic in self.topics:
+            topic.tags.add(self.bmw)
+        self.topics[0].tags.add(self.oil)
+        self.topics[1].tags.add(self.audi)
+
+    def names(self):
+        return [(tag.name, tag.num_topics) for tag in popular_tags_cache.get()]
+
+    def test_ranks_by_usage_then_name_and_is_served_from_memory(self):
+        self.assertEqual(self.names(), [('bmw', 3), ('audi', 1), ('oil', 1)])
+
+        with self.assertNumQueries(0):
+            self.names()
+
+    def test_tag_changes_refresh_the_list(self):
+        self.names()
+
+        self.topics[2].tags.add(self.oil)
+        self.assertEqual(self.names(), [('bmw', 3), ('oil', 2), ('audi', 1)])
+
+        self.topics[0].delete()
+        self.assertEqual(self.names(), [('bmw', 2), ('audi', 1), ('oil', 1)])
+
+        self.topics[1].tags.remove(self.audi)
+        self.assertEqual(self.names(), [('bmw', 2), ('oil', 1), ('audi', 0)])
+
+    def test_popular_endpoint_reports_usage_counts(self):
+        response = self.client.get('/api/tags/popular/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(tag['name'], tag['usage_count']) for tag in response.data], [('bmw', 3), ('audi', 1), ('oil', 1)]
+        )
@@ -0,0 +1,117 @@
+"""
+Batched loader for topic reply threads
+
+Fetches every visible reply of a topic in one query, groups children under
+their parents in memory and batches the per-viewer report lookups so
+ReplySerializer can render a whole thread in a fixed number of queries.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import Reply, Report
+
+
+class ReplyThreadLoader:
+    """Load a topic's reply thread for ReplySerializer (passed as context['reply_thread'])"""
+
+    def __init__(self, topic_id, user):
+        self.topic_id = topic_id
+        self.user = user
+        self._children = defaultdict(list)
+        self._resolved_reports = {}
+        self._pending_reports_counts = {}
+
+    def visible_replies(self):
+        """All replies of the topic the viewer may see (top-level and nested)"""
+        queryset = Reply.objects.filter(topic_id=self.topic_id)
+
+        if self.user.is_authenticated:
+            # Show non-hidden replies + user's own hidden replies (so they can see the report)
+            queryset = queryset.filter(Q(is_hidden=False) | Q(author=self.user, is_hidden=True))
+        else:
+            queryset = queryset.filter(is_hidden=False)
+
+        return queryset.select_related(
+            'author__profile', 'topic__author__profile', 'parent__author'
+        ).prefetch_related('images')
+
+    def load(self):
+        """Return the top-level replies; nested replies are grouped in memory"""
+        return self._group(list(self.visible_replies()))
+
+    def top_level_replies(self):
+        """Queryset of the visible top-level replies, for paginating before loading"""
+        return self.visible_replies().filter(parent=None)
+
+    def load_nested(self, top_level):
+        """Group the nested replies below a page of top-level replies
+
+        Used with keyset pagination so only the page's part of the thread is
+        read: one query per nesting level instead of the whole topic.
+        """
+        replies = list(top_level)
+        frontier = [reply.id for reply in replies]
+        while frontier:
+            children = list(self.visible_replies().filter(parent_id__in=frontier))
+            replies.extend(children)
+            frontier = [reply.id for reply in children]
+        self._group(replies)
+        return top_level
+
+    def _group(self, replies):
+        visible_ids = {reply.id for reply in replies}
+
+        top_level = []
+        visible_children_counts = defaultdict(int)
+        for reply in replies:
+            if reply.parent_id is None:
+                top_level.append(reply)
+            elif reply.parent_id in visible_ids:
+                self._children[reply.parent_id].append(reply)
+                if not reply.is_hidden:
+                    visible_children_counts[reply.parent_id] += 1
+
+        # Used by Reply.replies_count instead of a COUNT per reply
+        for reply in replies:
+            reply.num_child_replies = visible_children_counts[reply.id]
+
+        return top_level
+
+    def prime(self, replies):
+        """Batch the report lookups for the replies about to be serialized
+
+        Likes are resolved through forum.viewer_state.ViewerState.
+        """
+        replies = list(replies)
+        for reply in list(replies):
+            replies.extend(self._children.get(reply.id, []))
+
+        if not replies or not self.user.is_authenticated:
+            return
+
+        # Report details are only shown to the author of the reply
+        own_reply_ids = [reply.id for reply in replies if reply.author_id == self.user.id]
+        if not own_reply_ids:
+            return
+
+        reports = Report.objects.filter(
+            reply_id__in=own_reply_ids, status__in=['resolved', 'pending']
+        ).select_related('reason')
+        for report in reports:
+            if report.status == 'resolved':
+                # Reports are ordered newest first; keep the latest resolved one
+                self._resolved_reports.setdefault(report.reply_id, report)
+            else:
+                self._pending_reports_counts[report.reply_id] = (
+                    self._pending_reports_counts.get(report.reply_id, 0) + 1
+                )
+
+    def children_of(self, reply):
+        return self._children.get(reply.id, [])
+
+    def resolved_report_for(self, reply):
+        return self._resolved_reports.get(reply.id)
+
+    def pending_reports_count(self, reply):
+        return self._pending_reports_counts.get(reply.id, 0)
@@ -0,0 +1,128 @@
+"""
+Bulk write helpers for TopicViewSet.create/update
+
+Tags, images and poll options submitted with a topic are written with a fixed
+number of statements however many there are: tags are resolved with one
+lookup plus one bulk insert of the missing ones, images and poll options
+with one bulk insert each. Callers wrap the whole topic write in
+transaction.atomic(); malformed client input raises a DRF ValidationError
+(a 400) and rolls it back.
+"""
+from django.db.models import Q
+from django.utils.text import slugify
+from rest_framework.exceptions import ValidationError
+
+from .models import PollOption, Tag, TopicImage
+from .uploads import create_images
+
+
+def normalize_tag_names(names):
+    """Strip and lowercase submitted tag names, dropping blanks and duplicates (order kept)"""
+    return list(dict.fromkeys(
+        name.strip().lower() for name in names if name and name.strip()
+    ))
+
+
+def _unique_slugs(names):
+    """Slugs for new tags that are free in the database and among themselves
+
+    Non-ASCII names keep their letters (allow_unicode); a name that slugifies
+    to nothing, or to a slug already taken, gets a numeric suffix.
+    """
+    max_length = Tag._meta.get_field('slug').max_length
+    bases = {
+        name: slugify(name, allow_unicode=True)[:max_length - 4].strip('-') or 'tag'
+        for name in names
+    }
+    taken_filter = Q()
+    for base in set(bases.values()):
+        taken_filter |= Q(slug=base) | Q(slug__startswith=f'{base}-')
+    taken = set(Tag.objects.filter(taken_filter).values_list('slug', flat=True))
+
+    slugs = {}
+    for name, base in bases.items():
+        slug, suffix = base, 1
+        while slug in taken:
+            suffix += 1
+            slug = f'{base}-{suffix}'
+        taken.add(slug)
+        slugs[name] = slug
+    return slugs
+
+
+def resolve_tags(names):
+    """Return Tag objects for the names, creating the missing ones in bulk
+
+    Tags are matched by name only; new tags get a unique slug (see _unique_slugs).
+    """
+    names = normalize_tag_names(names)
+    if not names:
+        return []
+
+    found = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    for _ in range(3):
+        missing = [name for name in names if name not in found]
+        if not missing:
+            break
+        slugs = _unique_slugs(missing)
+        # ignore_conflicts covers a concurrent request creating the same tag (or
+        # taking one of the slugs, in which case the next round picks another)
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slugs[name]) for name in missing], ignore_conflicts=True
+        )
+        found.update((tag.name, tag) for tag in Tag.objects.filter(name__in=missing))
+
+    return [found[name] for name in names if name in found]
+
+
+def _order(value, field):
+    """A client-submitted order value as an int"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({field: [f'Invalid order: {value!r}.']})
+
+
+def add_topic_images(topic, files, captions, orders, uploaded=()):
+    """Attach images to a topic: uploaded files plus verified direct uploads
+
+    Files go through forum.uploads.create_images (uploaded concurrently, or
+    staged for the worker); ``uploaded`` holds (value, data) pairs from
+    forum.uploads.direct_uploads. Each kind is written with a single INSERT.
+    """
+    images, image_files = [], []
+    for idx, image_file in enumerate(files):
+        # Only create if there's an actual file (not null)
+        if image_file:
+            images.append(TopicImage(
+                topic=topic,
+                caption=captions[idx] if idx < len(captions) else '',
+                order=_order(orders[idx], 'image_orders') if idx < len(orders) else idx
+            ))
+            image_files.append(image_file)
+    created = create_images('topic_image', images, image_files)
+
+    direct = [
+        TopicImage(
+            topic=topic,
+            image=value,
+            caption=str(data.get('caption') or ''),
+            order=_order(data.get('order', len(files) + idx), 'uploaded_images')
+        )
+        for idx, (value, data) in enumerate(uploaded)
+    ]
+    return created + TopicImage.objects.bulk_create(direct)
+
+
+def add_poll_options(poll, options, orders):
+    """Create a poll's options with a single INSERT (blank options are skipped)"""
+    poll_options = [
+        PollOption(
+            poll=poll,
+            text=option_text,
+            order=_order(orders[idx], 'poll_option_orders') if idx < len(orders) else idx
+        )
+        for idx, option_text in enumerate(options)
+        if option_text and option_text.strip()
+    ]
+    return PollOption.objects.bulk_create(poll_options)
@@ -0,0 +1,251 @@
+"""
+Image upload pipeline for topic images, reply images and profile images
+
+Image rows are written with status 'pending' and filled in once their file
+is stored. With IMAGE_UPLOAD_ASYNC off (the default) the files of a request
+are sent to storage concurrently on a thread pool as soon as the write
+commits, so a post with five images waits for the slowest upload instead of
+all five in turn, and nothing is uploaded for a write that rolls back. With
+it on, files are staged to IMAGE_UPLOAD_STAGING_DIR and an ImageUpload row is
+queued for each; the process_image_uploads command claims them in batches,
+uploads them outside any transaction and fills in the image fields.
+
+Clients can also upload straight to storage with signed parameters from
+the upload_signature view and submit the result (see direct_upload_value).
+"""
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ImageUpload, ReplyImage, TopicImage, UserProfile
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+# target -> (model, image field, whether the model has a status field)
+TARGETS = {
+    'topic_image': (TopicImage, 'image', True),
+    'reply_image': (ReplyImage, 'image', True),
+    'user_image': (UserProfile, 'user_image', False),
+}
+
+MAX_ATTEMPTS = 5
+
+# Uploads claimed by a worker that died are picked up again after this long
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def folder_for(target):
+    """Storage folder configured on the target's CloudinaryField"""
+    model, field_name, _ = TARGETS[target]
+    return model._meta.get_field(field_name).options.get('folder', '')
+
+
+def field_value(target, value):
+    """A stored value as the target's field holds it once loaded (a CloudinaryResource)"""
+    model, field_name, _ = TARGETS[target]
+    return model._meta.get_field(field_name).to_python(value)
+
+
+def _upload_all(storage, files):
+    """Store (source, folder) pairs concurrently; returns (value, error) pairs in input order"""
+    def upload(item):
+        source, folder = item
+        try:
+            return storage.save(source, folder), None
+        except Exception as e:
+            return None, e
+
+    if len(files) <= 1:
+        return [upload(item) for item in files]
+    with ThreadPoolExecutor(max_workers=min(settings.IMAGE_UPLOAD_WORKERS, len(files))) as executor:
+        return list(executor.map(upload, files))
+
+
+def stage(uploaded_file):
+    """Copy an uploaded file to the staging directory; returns its path"""
+    os.makedirs(settings.IMAGE_UPLOAD_STAGING_DIR, exist_ok=True)
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    path = os.path.join(settings.IMAGE_UPLOAD_STAGING_DIR, f'{uuid.uuid4().hex}{extension}')
+    with open(path, 'wb') as output:
+        for chunk in uploaded_file.chunks():
+            output.write(chunk)
+    return path
+
+
+def _queue(target, object_ids, paths):
+    ImageUpload.objects.bulk_create([
+        ImageUpload(target=target, object_id=object_id, staged_path=path)
+        for object_id, path in zip(object_ids, paths)
+    ])
+
+
+def create_images(target, images, files):
+    """Save unsaved TopicImage/ReplyImage rows as 'pending', one per uploaded file
+
+    With IMAGE_UPLOAD_ASYNC the files are queued for the worker; otherwise
+    they are uploaded when the current transaction commits (immediately
+    outside one), and rows whose upload fails are marked 'failed'.
+    """
+    if not images:
+        return []
+    model = TARGETS[target][0]
+    for image in images:
+        image.status = 'pending'
+
+    if settings.IMAGE_UPLOAD_ASYNC:
+        paths = [stage(uploaded_file) for uploaded_file in files]
+        images = model.objects.bulk_create(images)
+        _queue(target, [image.pk for image in images], paths)
+        return images
+
+    images = model.objects.bulk_create(images)
+    transaction.on_commit(lambda: _upload_images(target, images, files))
+    return images
+
+
+def _upload_images(target, images, files):
+    """Upload the files of freshly created image rows and record the outcome"""
+    folder = folder_for(target)
+    results = _upload_all(image_storage(), [(uploaded_file, folder) for uploaded_file in files])
+    uploaded, failed = {}, []
+    for image, (value, error) in zip(images, results):
+        if error is None:
+            uploaded[image.pk] = value
+        else:
+            logger.error('Uploading %s %s failed: %s', target, image.pk, error)
+            failed.append(image.pk)
+
+    with transaction.atomic():
+        _apply(target, uploaded)
+        TARGETS[target][0].objects.filter(pk__in=failed).update(status='failed')
+
+
+def set_user_image(profile, uploaded_file):
+    """Replace a profile image; returns True when the upload is queued"""
+    if settings.IMAGE_UPLOAD_ASYNC:
+        _queue('user_image', [profile.pk], [stage(uploaded_file)])
+        return True
+
+    storage = image_storage()
+    value = storage.save(uploaded_file, folder_for('user_image'))
+    # Assign the loaded form so the profile can be serialized straight away
+    profile.user_image = field_value('user_image', value)
+    try:
+        profile.save(update_fields=['user_image'])
+    except Exception:
+        # Don't leave an image in storage that nothing points to
+        storage.delete(value)
+        raise
+    return False
+
+
+def direct_upload_value(target, data):
+    """Field value for an image the client uploaded directly, or None if it does not verify
+
+    ``data`` is the storage's upload response (a dict or its JSON string).
+    """
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return None
+    if not isinstance(data, dict):
+        return None
+    return image_storage().verify_direct_upload(data, folder_for(target))
+
+
+def direct_uploads(target, entries):
+    """Verify submitted direct uploads; returns [(value, data)] or None if any is invalid"""
+    verified = []
+    for data in entries:
+        value = direct_upload_value(target, data)
+        if value is None:
+            return None
+        verified.append((value, json.loads(data) if isinstance(data, str) else data))
+    return verified
+
+
+def _apply(target, values):
+    """Write uploaded values ({object_id: value}) to the target rows"""
+    model, field_name, has_status = TARGETS[target]
+    rows = model.objects.in_bulk(list(values))
+    fields = [field_name, 'status'] if has_status else [field_name]
+    for object_id, row in rows.items():
+        setattr(row, field_name, values[object_id])
+        if has_status:
+            row.status = 'ready'
+    model.objects.bulk_update(list(rows.values()), fields)
+
+
+def _claim(batch_size):
+    """Mark a batch of queued uploads 'processing' and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = ImageUpload.objects.filter(
+            Q(status='pending') | Q(status='processing', claimed_at__lt=now - CLAIM_TIMEOUT)
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            # Several workers can drain the queue without picking the same rows
+            queryset = queryset.select_for_update(skip_locked=True)
+        uploads = list(queryset.order_by('id')[:batch_size])
+        ImageUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).update(
+            status='processing', claimed_at=now
+        )
+    return uploads
+
+
+def process_pending(batch_size=50):
+    """Upload one batch of staged images; returns the number of uploads handled
+
+    Rows are claimed in one short transaction, the files are uploaded with
+    no transaction open and the results are written in a second one.
+    """
+    uploads = _claim(batch_size)
+    if not uploads:
+        return 0
+
+    folders = {target: folder_for(target) for target in TARGETS}
+    results = _upload_all(
+        image_storage(), [(upload.staged_path, folders[upload.target]) for upload in uploads]
+    )
+
+    uploaded = {target: {} for target in TARGETS}
+    failed = {target: [] for target in TARGETS}
+    for upload, (value, error) in zip(uploads, results):
+        upload.attempts += 1
+        upload.processed_at = timezone.now()
+        if error is None:
+            upload.status = 'done'
+            upload.error = ''
+            # Later uploads for the same row (a replaced avatar) win
+            uploaded[upload.target][upload.object_id] = value
+        else:
+            upload.error = str(error)
+            upload.status = 'failed' if upload.attempts >= MAX_ATTEMPTS else 'pending'
+            if upload.status == 'failed':
+                failed[upload.target].append(upload.object_id)
+
+    with transaction.atomic():
+        for target, values in uploaded.items():
+            if values:
+                _apply(target, values)
+        for target, object_ids in failed.items():
+            model, _, has_status = TARGETS[target]
+            if object_ids and has_status:
+                model.objects.filter(pk__in=object_ids).update(status='failed')
+
+        ImageUpload.objects.bulk_update(uploads, ['status', 'attempts', 'error', 'processed_at'])
+
+    for upload in uploads:
+        if upload.status != 'pending' and os.path.exists(upload.staged_path):
+            os.remove(upload.staged_path)
+    return len(uploads)
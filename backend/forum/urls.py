@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CategoryViewSet, TagViewSet, TopicViewSet, ReplyViewSet, UserProfileViewSet, 
-    ReportReasonViewSet, ReportViewSet, search, vote_poll, get_site_settings
+    ReportReasonViewSet, ReportViewSet, search, vote_poll, get_site_settings,
+    sitemap_topics, upload_signature
 )
 
 router = DefaultRouter()
@@ -19,4 +20,6 @@ urlpatterns = [
     path('search/', search, name='search'),
     path('polls/<int:poll_id>/vote/', vote_poll, name='vote-poll'),
     path('site-settings/', get_site_settings, name='site-settings'),
+    path('sitemap/topics/', sitemap_topics, name='sitemap-topics'),
+    path('uploads/sign/', upload_signature, name='upload-signature'),
 ]
@@ -0,0 +1,115 @@
+"""
+Buffered topic view counter
+
+Views are counted in process memory and written in batches: every flush runs
+``UPDATE forum_topic SET views = views + n`` once per distinct increment n,
+for all topics that received n views. Nothing else on the row is touched
+(updated_at stays put), no model signals fire and concurrent increments are
+never lost to read-modify-write races. Flushes leave cached anonymous topic
+lists alone, so those lag by up to RESPONSE_CACHE_TIMEOUT (see forum.cache).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .periodic import PeriodicFlush
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """Collect view increments per topic and flush them periodically
+
+    A flush happens on the first add() after ``flush_interval`` seconds or
+    once ``flush_threshold`` views are pending. An interval of 0 writes
+    every view immediately. With ``periodic`` a background thread also
+    flushes every ``flush_interval`` seconds (see forum.periodic).
+    """
+
+    def __init__(self, flush_interval, flush_threshold, periodic=False):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._pending_total = 0
+        self._last_flush = time.monotonic()
+        self._timer = PeriodicFlush(self.flush, flush_interval, 'view-counter') if periodic else None
+
+    def add(self, topic_id, count=1):
+        """Record views for a topic
+
+        Returns the views recorded for it since the last flush, this one
+        included: what a topic row read before the call is missing, whether
+        or not the call itself flushed them.
+        """
+        if self._timer is not None:
+            self._timer.ensure_started()
+        with self._lock:
+            self._pending[topic_id] += count
+            self._pending_total += count
+            pending = self._pending[topic_id]
+            due = (
+                self._pending_total >= self.flush_threshold
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+        if due:
+            self.flush()
+        return pending
+
+    def pending(self, topic_id):
+        with self._lock:
+            return self._pending.get(topic_id, 0)
+
+    def flush(self):
+        """Write all pending views; returns the number of topics updated"""
+        from .models import Topic
+
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._pending_total = 0
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        # One UPDATE per distinct increment keeps the statement count low
+        by_count = defaultdict(list)
+        for topic_id, count in pending.items():
+            by_count[count].append(topic_id)
+
+        try:
+            # All or nothing, so a failed flush can put every count back
+            with transaction.atomic():
+                for count, topic_ids in by_count.items():
+                    Topic.objects.filter(pk__in=topic_ids).update(views=F('views') + count)
+        except Exception:
+            # Keep the views for the next flush rather than dropping them
+            with self._lock:
+                for topic_id, count in pending.items():
+                    self._pending[topic_id] += count
+                    self._pending_total += count
+            raise
+
+        return len(pending)
+
+
+view_counter = ViewCounterBuffer(
+    flush_interval=settings.VIEW_COUNT_FLUSH_INTERVAL,
+    flush_threshold=settings.VIEW_COUNT_FLUSH_THRESHOLD,
+    periodic=True,
+)
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_counter.flush()
+    except Exception:
+        logger.exception('Flushing buffered topic views on exit failed')
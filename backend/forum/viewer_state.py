@@ -0,0 +1,115 @@
+"""
+Per-request lookups of what the current viewer has liked, bookmarked, voted for or followed
+
+Serializers register the objects they are about to render; the first
+"has the viewer ...?" question for a relation then loads the answer for every
+registered object with a single query, instead of one EXISTS query per object.
+The state is shared through the serializer context under 'viewer_state'.
+"""
+from .models import Bookmark, Follow, PollVote, Reply, Topic
+
+
+class ViewerState:
+    """Sets of object IDs the viewer has interacted with, loaded in batches"""
+
+    TOPIC_RELATIONS = ('liked_topics', 'bookmarked_topics', 'voted_options')
+    REPLY_RELATIONS = ('liked_replies',)
+    USER_RELATIONS = ('followed_users',)
+
+    def __init__(self, user):
+        self.user = user
+        self._topic_ids = set()
+        self._reply_ids = set()
+        self._user_ids = set()
+        relations = self.TOPIC_RELATIONS + self.REPLY_RELATIONS + self.USER_RELATIONS
+        self._loaded = {relation: set() for relation in relations}
+        self._results = {relation: set() for relation in relations}
+
+    @classmethod
+    def from_context(cls, context):
+        """Return the state stored in a serializer context, creating it on first use"""
+        state = context.get('viewer_state')
+        if state is None:
+            request = context.get('request')
+            state = cls(getattr(request, 'user', None))
+            context['viewer_state'] = state
+        return state
+
+    @property
+    def is_authenticated(self):
+        return self.user is not None and self.user.is_authenticated
+
+    def add_topics(self, topics):
+        """Register topics so later lookups are batched for all of them"""
+        self._topic_ids.update(topic.id for topic in topics)
+
+    def add_replies(self, replies):
+        """Register replies so later lookups are batched for all of them"""
+        self._reply_ids.update(reply.id for reply in replies)
+
+    def add_users(self, user_ids):
+        """Register user IDs so later follow lookups are batched for all of them"""
+        self._user_ids.update(user_ids)
+
+    def has_liked_topic(self, topic):
+        return self._contains('liked_topics', topic.id)
+
+    def has_bookmarked_topic(self, topic):
+        return self._contains('bookmarked_topics', topic.id)
+
+    def has_voted(self, option):
+        # Votes are loaded per topic, so a page of polls costs a single query
+        return option.id in self._lookup('voted_options', option.poll.topic_id)
+
+    def has_liked_reply(self, reply):
+        return self._contains('liked_replies', reply.id)
+
+    def is_following(self, user_id):
+        return self._contains('followed_users', user_id)
+
+    def _contains(self, relation, object_id):
+        return object_id in self._lookup(relation, object_id)
+
+    def _lookup(self, relation, object_id):
+        """Return the loaded ID set for a relation, loading pending objects if needed"""
+        if not self.is_authenticated:
+            return self._results[relation]
+
+        loaded = self._loaded[relation]
+        if object_id not in loaded:
+            registered = self._registered(relation)
+            pending = (registered | {object_id}) - loaded
+            self._results[relation].update(self._load(relation, pending))
+            loaded.update(pending)
+        return self._results[relation]
+
+    def _registered(self, relation):
+        if relation in self.TOPIC_RELATIONS:
+            return self._topic_ids
+        if relation in self.REPLY_RELATIONS:
+            return self._reply_ids
+        return self._user_ids
+
+    def _load(self, relation, object_ids):
+        user_id = self.user.id
+        if relation == 'liked_topics':
+            queryset = Topic.likes.through.objects.filter(
+                user_id=user_id, topic_id__in=object_ids
+            ).values_list('topic_id', flat=True)
+        elif relation == 'bookmarked_topics':
+            queryset = Bookmark.objects.filter(
+                user_id=user_id, topic_id__in=object_ids
+            ).values_list('topic_id', flat=True)
+        elif relation == 'voted_options':
+            queryset = PollVote.objects.filter(
+                user_id=user_id, poll_option__poll__topic_id__in=object_ids
+            ).values_list('poll_option_id', flat=True)
+        elif relation == 'followed_users':
+            queryset = Follow.objects.filter(
+                follower_id=user_id, following_id__in=object_ids
+            ).values_list('following_id', flat=True)
+        else:
+            queryset = Reply.likes.through.objects.filter(
+                user_id=user_id, reply_id__in=object_ids
+            ).values_list('reply_id', flat=True)
+        return set(queryset)
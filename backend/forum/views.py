@@ -2,20 +2,39 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.contrib.auth.models import User
-from django.db.models import Q, Count
+from django.db.models import Q, Count, F
+from django.db import transaction
+from django.utils.decorators import method_decorator
 from .models import (
-    Category, Topic, Reply, UserProfile, ReportReason, Report, Bookmark, 
-    Poll, PollOption, PollVote, TopicImage, Tag, SiteSettings
+    Category, Topic, Reply, UserProfile, ReportReason, Report, Bookmark, FeedEntry,
+    Poll, PollOption, PollVote, Tag, SiteSettings, popular_tags_cache
 )
 from .serializers import (
     CategorySerializer, TopicSerializer, TopicDetailSerializer,
     ReplySerializer, UserSerializer, UserProfileSerializer, ReportReasonSerializer, ReportSerializer, 
     BookmarkSerializer, PollSerializer, TagSerializer, SiteSettingsSerializer
 )
-from .pagination import CustomPageNumberPagination
-from gamification.services import GamificationService
+from .cache import cache_anonymous_response
+from .pagination import (
+    CustomPageNumberPagination, KeysetPagination, KeysetPaginationMixin, paginator_for
+)
+from .threads import ReplyThreadLoader
+from .toggles import toggle_bookmark, toggle_like
+from .topic_writer import add_poll_options, add_topic_images, resolve_tags
+from .uploads import (
+    create_images, direct_upload_value, direct_uploads, field_value, folder_for, set_user_image, TARGETS
+)
+from .storage import image_storage
+from gamification.events import dispatch as dispatch_gamification_event, is_queued
+
+
+def _submitted_list(request, key):
+    """A list field from FormData (repeated keys) or JSON"""
+    if hasattr(request.data, 'getlist'):
+        return request.data.getlist(key)
+    return request.data.get(key, [])
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -23,6 +42,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     
+    @method_decorator(cache_anonymous_response('categories'))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
     def topics(self, request, pk=None):
         """Get paginated topics for this category"""
@@ -37,7 +60,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
             'created_at': 'created_at',    # Oldest first
             '-updated_at': '-updated_at',  # Recently updated
             'updated_at': 'updated_at',    # Least recently updated
-            '-replies_count': '-num_replies',  # Most replies (use annotation)
+            '-replies_count': '-replies_count',  # Most replies (denormalized counter)
         }
         
         # Use default if invalid ordering is provided
@@ -45,18 +68,12 @@ class CategoryViewSet(viewsets.ModelViewSet):
             ordering = '-created_at'
         
         # Get topics for this category with specified ordering
-        topics = Topic.objects.filter(category=category).select_related(
-            'author', 'author__profile', 'category'
-        )
+        topics = Topic.objects.filter(category=category).with_related()
         
-        # Annotate num_replies for sorting by replies (can't use replies_count as it's a property)
-        if ordering == '-replies_count':
-            topics = topics.annotate(num_replies=Count('replies')).order_by(valid_orderings[ordering])
-        else:
-            topics = topics.order_by(valid_orderings[ordering])
+        topics = topics.order_by(valid_orderings[ordering])
         
-        # Apply pagination
-        paginator = CustomPageNumberPagination()
+        # Apply pagination (?pagination=cursor walks the ordering key instead of OFFSET)
+        paginator = paginator_for(request, valid_orderings[ordering])
         page = paginator.paginate_queryset(topics, request)
         
         if page is not None:
@@ -69,30 +86,41 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """API endpoint for tags"""
-    queryset = Tag.objects.all()
+    queryset = Tag.objects.with_usage_count().order_by('name')
     serializer_class = TagSerializer
     
+    @method_decorator(cache_anonymous_response('tags'))
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """Get most popular tags by usage count"""
-        tags = Tag.objects.all()
-        # Sort by usage_count (property)
-        sorted_tags = sorted(tags, key=lambda tag: tag.usage_count, reverse=True)
-        # Limit to top 10
-        top_tags = sorted_tags[:10]
+        # Top 10 tags, counted in SQL and cached until tag usage changes
+        top_tags = popular_tags_cache.get()
         serializer = self.get_serializer(top_tags, many=True)
         return Response(serializer.data)
 
 
-class TopicViewSet(viewsets.ModelViewSet):
+class TopicViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     """API endpoint for topics"""
     queryset = Topic.objects.all()
+    # Cursors walk topics newest first; updated_at changes under a walking client
+    keyset_ordering = '-created_at'
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            # Constant number of queries per page regardless of page size
+            queryset = queryset.with_related()
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return TopicDetailSerializer
         return TopicSerializer
     
+    @method_decorator(cache_anonymous_response('topics'))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
     
@@ -106,84 +134,51 @@ class TopicViewSet(viewsets.ModelViewSet):
                 'category': request.data.get('category'),
             }
             
-            # Handle tags (can be from FormData or JSON)
-            if hasattr(request.data, 'getlist'):
-                # FormData request
-                tag_names = request.data.getlist('tags')
-            else:
-                # JSON request
-                tag_names = request.data.get('tags', [])
-            
-            # Convert tag names to Tag objects (create if needed)
-            tag_objects = []
-            if tag_names:
-                from django.utils.text import slugify
-                for tag_name in tag_names:
-                    if tag_name and tag_name.strip():
-                        tag, created = Tag.objects.get_or_create(
-                            name=tag_name.strip().lower(),
-                            defaults={'slug': slugify(tag_name.strip())}
-                        )
-                        tag_objects.append(tag.id)
-            
-            if tag_objects:
-                topic_data['tag_ids'] = tag_objects
-            
-            serializer = self.get_serializer(data=topic_data)
-            serializer.is_valid(raise_exception=True)
-            topic = serializer.save(author=request.user)
+            uploaded = direct_uploads('topic_image', _submitted_list(request, 'uploaded_images'))
+            if uploaded is None:
+                return Response(
+                    {'error': 'Invalid uploaded image.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            # Handle images (check if FormData or JSON)
-            if hasattr(request.data, 'getlist'):
-                # FormData request
-                images = request.FILES.getlist('images')
-                captions = request.data.getlist('image_captions')
-                orders = request.data.getlist('image_orders')
+            with transaction.atomic():
+                # Tags are resolved in bulk and attached after the topic is saved
+                tags = resolve_tags(_submitted_list(request, 'tags'))
                 
-                for idx, image_file in enumerate(images):
-                    TopicImage.objects.create(
-                        topic=topic,
-                        image=image_file,
-                        caption=captions[idx] if idx < len(captions) else '',
-                        order=int(orders[idx]) if idx < len(orders) else idx
-                    )
-            
-            # Handle poll (check if FormData or JSON)
-            poll_question = request.data.get('poll_question')
-            if poll_question:
-                poll = Poll.objects.create(
-                    topic=topic,
-                    question=poll_question
-                )
+                serializer = self.get_serializer(data=topic_data)
+                serializer.is_valid(raise_exception=True)
+                topic = serializer.save(author=request.user)
+                if tags:
+                    topic.tags.set(tags)
                 
-                # Get poll options
-                if hasattr(request.data, 'getlist'):
-                    # FormData request
-                    poll_options = request.data.getlist('poll_options')
-                    poll_orders = request.data.getlist('poll_option_orders')
-                else:
-                    # JSON request
-                    poll_options = request.data.get('poll_options', [])
-                    poll_orders = request.data.get('poll_option_orders', [])
+                # Handle images: uploaded files and images uploaded directly to storage
+                add_topic_images(
+                    topic,
+                    request.FILES.getlist('images'),
+                    _submitted_list(request, 'image_captions'),
+                    _submitted_list(request, 'image_orders'),
+                    uploaded
+                )
                 
-                for idx, option_text in enumerate(poll_options):
-                    if option_text and option_text.strip():  # Only create if option has text
-                        PollOption.objects.create(
-                            poll=poll,
-                            text=option_text,
-                            order=int(poll_orders[idx]) if idx < len(poll_orders) else idx
-                        )
+                # Handle poll (check if FormData or JSON)
+                poll_question = request.data.get('poll_question')
+                if poll_question:
+                    poll = Poll.objects.create(
+                        topic=topic,
+                        question=poll_question
+                    )
+                    add_poll_options(
+                        poll,
+                        _submitted_list(request, 'poll_options'),
+                        _submitted_list(request, 'poll_option_orders')
+                    )
             
             # Return the complete topic with images and poll
             # Reload topic with related objects
-            from django.db.models import Prefetch
-            topic = Topic.objects.prefetch_related(
-                'images',
-                'poll__options__votes'
-            ).select_related('author__profile', 'category').get(id=topic.id)
+            topic = Topic.objects.with_related().get(id=topic.id)
             
             # Track gamification for topic creation
-            gamification_result = GamificationService.track_topic_created(request.user)
+            gamification_result = dispatch_gamification_event('topic_created', request.user)
             
             headers = self.get_success_headers(serializer.data)
             topic_serializer = TopicDetailSerializer(topic, context={'request': request})
@@ -192,13 +187,6 @@ class TopicViewSet(viewsets.ModelViewSet):
             # Add gamification data to response
             response_data['gamification'] = gamification_result
             
-            print(f"Topic created with ID: {topic.id}")
-            print(f"Images count: {topic.images.count()}")
-            print(f"Has poll: {hasattr(topic, 'poll')}")
-            if hasattr(topic, 'poll'):
-                print(f"Poll options count: {topic.poll.options.count()}")
-            print(f"Response images: {len(response_data.get('images', []))}")
-            print(f"Response poll: {response_data.get('poll')}")
             return Response(response_data, status=status.HTTP_201_CREATED, headers=headers)
         except Exception as e:
             import traceback
@@ -213,7 +201,7 @@ class TopicViewSet(viewsets.ModelViewSet):
             instance = self.get_object()
             
             # Check if user is the author
-            if instance.author != request.user:
+            if instance.author_id != request.user.id:
                 return Response(
                     {'detail': 'You do not have permission to edit this topic.'},
                     status=status.HTTP_403_FORBIDDEN
@@ -226,92 +214,51 @@ class TopicViewSet(viewsets.ModelViewSet):
                 'category': request.data.get('category'),
             }
             
-            # Handle tags (can be from FormData or JSON)
-            if hasattr(request.data, 'getlist'):
-                # FormData request
-                tag_names = request.data.getlist('tags')
-            else:
-                # JSON request
-                tag_names = request.data.get('tags', [])
-            
-            # Convert tag names to Tag objects (create if needed)
-            tag_objects = []
-            if tag_names:
-                from django.utils.text import slugify
-                for tag_name in tag_names:
-                    if tag_name and tag_name.strip():
-                        tag, created = Tag.objects.get_or_create(
-                            name=tag_name.strip().lower(),
-                            defaults={'slug': slugify(tag_name.strip())}
-                        )
-                        tag_objects.append(tag.id)
-            
-            if tag_objects:
-                topic_data['tag_ids'] = tag_objects
-            
-            serializer = self.get_serializer(instance, data=topic_data, partial=partial)
-            serializer.is_valid(raise_exception=True)
-            topic = serializer.save()
+            uploaded = direct_uploads('topic_image', _submitted_list(request, 'uploaded_images'))
+            if uploaded is None:
+                return Response(
+                    {'error': 'Invalid uploaded image.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            # Handle images - only process new images
-            if hasattr(request.data, 'getlist'):
-                # FormData request
-                images = request.FILES.getlist('images')
-                captions = request.data.getlist('image_captions')
-                orders = request.data.getlist('image_orders')
+            with transaction.atomic():
+                # Submitted tags replace the current ones; no tags leaves them unchanged
+                tags = resolve_tags(_submitted_list(request, 'tags'))
                 
-                for idx, image_file in enumerate(images):
-                    # Only create if there's an actual file (not null)
-                    if image_file:
-                        TopicImage.objects.create(
-                            topic=topic,
-                            image=image_file,
-                            caption=captions[idx] if idx < len(captions) else '',
-                            order=int(orders[idx]) if idx < len(orders) else idx
-                        )
-            
-            # Handle poll - update or create
-            poll_question = request.data.get('poll_question')
-            if poll_question:
-                # Check if poll exists
-                if hasattr(topic, 'poll'):
-                    # Update existing poll
-                    poll = topic.poll
-                    poll.question = poll_question
-                    poll.save()
-                    # Delete old options
-                    poll.options.all().delete()
-                else:
-                    # Create new poll
-                    poll = Poll.objects.create(
-                        topic=topic,
-                        question=poll_question
-                    )
+                serializer = self.get_serializer(instance, data=topic_data, partial=partial)
+                serializer.is_valid(raise_exception=True)
+                topic = serializer.save()
+                if tags:
+                    topic.tags.set(tags)
                 
-                # Get poll options
-                if hasattr(request.data, 'getlist'):
-                    # FormData request
-                    poll_options = request.data.getlist('poll_options')
-                    poll_orders = request.data.getlist('poll_option_orders')
-                else:
-                    # JSON request
-                    poll_options = request.data.get('poll_options', [])
-                    poll_orders = request.data.get('poll_option_orders', [])
+                # Handle images - only process new images
+                add_topic_images(
+                    topic,
+                    request.FILES.getlist('images'),
+                    _submitted_list(request, 'image_captions'),
+                    _submitted_list(request, 'image_orders'),
+                    uploaded
+                )
                 
-                for idx, option_text in enumerate(poll_options):
-                    if option_text and option_text.strip():
-                        PollOption.objects.create(
-                            poll=poll,
-                            text=option_text,
-                            order=int(poll_orders[idx]) if idx < len(poll_orders) else idx
-                        )
+                # Handle poll - update or create
+                poll_question = request.data.get('poll_question')
+                if poll_question:
+                    # Update the existing poll or create a new one
+                    poll, created = Poll.objects.update_or_create(
+                        topic=topic,
+                        defaults={'question': poll_question}
+                    )
+                    if not created:
+                        # Delete old options
+                        poll.options.all().delete()
+                    add_poll_options(
+                        poll,
+                        _submitted_list(request, 'poll_options'),
+                        _submitted_list(request, 'poll_option_orders')
+                    )
             
             # Return the updated topic with images and poll
-            from django.db.models import Prefetch
-            topic = Topic.objects.prefetch_related(
-                'images',
-                'poll__options__votes'
-            ).select_related('author__profile', 'category').get(id=topic.id)
+            topic = Topic.objects.with_related().get(id=topic.id)
             
             topic_serializer = TopicDetailSerializer(topic, context={'request': request})
             return Response(topic_serializer.data)
@@ -329,10 +276,12 @@ class TopicViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def increment_views(self, request, pk=None):
         """Increment topic views"""
+        from .view_counter import view_counter
+        
         topic = self.get_object()
-        topic.views += 1
-        topic.save()
-        return Response({'views': topic.views})
+        # Buffered and written in batches; the topic row is not saved here
+        pending = view_counter.add(topic.id)
+        return Response({'views': topic.views + pending})
     
     @action(detail=True, methods=['get'])
     def related(self, request, pk=None):
@@ -340,39 +289,13 @@ class TopicViewSet(viewsets.ModelViewSet):
         topic = self.get_object()
         
         # Get topic tags
-        topic_tags = list(topic.tags.values_list('name', flat=True))
+        tag_ids = list(topic.tags.values_list('id', flat=True))
         
-        if not topic_tags or len(topic_tags) < 3:
+        if len(tag_ids) < 3:
             return Response([])
         
-        # Get all topics from the same category (excluding current topic)
-        from django.db.models import Count, Q
-        
-        # Build query to find topics with matching tags
-        related_topics = Topic.objects.filter(
-            category=topic.category
-        ).exclude(
-            id=topic.id
-        ).prefetch_related('tags', 'author')
-        
-        # Filter and annotate with matching tags count
-        topics_with_matches = []
-        for t in related_topics:
-            t_tags = list(t.tags.values_list('name', flat=True))
-            matching_tags = set(topic_tags) & set(t_tags)
-            matches_count = len(matching_tags)
-            
-            if matches_count >= 3:
-                topics_with_matches.append({
-                    'topic': t,
-                    'matches': matches_count
-                })
-        
-        # Sort by number of matches (descending)
-        topics_with_matches.sort(key=lambda x: x['matches'], reverse=True)
-        
-        # Get top 5 topics
-        top_topics = [item['topic'] for item in topics_with_matches[:5]]
+        # Top 5 topics from the same category ranked by number of shared tags
+        top_topics = Topic.objects.related_to(topic, tag_ids, min_shared_tags=3).with_related()[:5]
         
         # Serialize the topics
         serializer = TopicSerializer(top_topics, many=True, context={'request': request})
@@ -422,36 +345,34 @@ class TopicViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Prevent users from liking their own topics
-        if topic.author == user:
+        if topic.author_id == user.id:
             return Response(
                 {'error': 'You cannot like your own topic'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if user in topic.likes.all():
-            # Unlike
-            topic.likes.remove(user)
+        liked, likes_count = toggle_like(topic, user)
+        if not liked:
             return Response({
                 'status': 'unliked',
                 'user_has_liked': False,
-                'likes_count': topic.likes.count()
+                'likes_count': likes_count
             })
         else:
-            # Like
-            topic.likes.add(user)
-            
             # Check for topic likes badges for the author
-            from gamification.services import GamificationService
-            badges_unlocked = GamificationService.check_topic_likes_badges(topic.author)
+            badges_unlocked = dispatch_gamification_event('topic_liked', topic.author)
             
             response_data = {
                 'status': 'liked',
                 'user_has_liked': True,
-                'likes_count': topic.likes.count()
+                'likes_count': likes_count
             }
             
-            # Include badge info if any were unlocked
-            if badges_unlocked:
+            # Include badge info if any were unlocked; a queued check has none yet
+            if is_queued(badges_unlocked):
+                response_data['badges_unlocked'] = []
+                response_data['queued'] = True
+            elif badges_unlocked:
                 response_data['badges_unlocked'] = badges_unlocked
             
             return Response(response_data, status=status.HTTP_201_CREATED)
@@ -463,39 +384,36 @@ class TopicViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Prevent users from bookmarking their own topics
-        if topic.author == user:
+        if topic.author_id == user.id:
             return Response(
                 {'error': 'You cannot bookmark your own topic'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        bookmark = Bookmark.objects.filter(user=user, topic=topic).first()
-        
-        if bookmark:
-            # Unbookmark
-            bookmark.delete()
+        bookmarked, bookmarks_count = toggle_bookmark(topic, user)
+        if not bookmarked:
             return Response({
                 'status': 'unbookmarked',
-                'user_has_bookmarked': False
+                'user_has_bookmarked': False,
+                'bookmarks_count': bookmarks_count
             })
         else:
-            # Bookmark
-            Bookmark.objects.create(user=user, topic=topic)
-            
             # Track gamification for bookmark creation
-            gamification_result = GamificationService.track_bookmark_created(user)
+            gamification_result = dispatch_gamification_event('bookmark_created', user)
             
             return Response({
                 'status': 'bookmarked',
                 'user_has_bookmarked': True,
+                'bookmarks_count': bookmarks_count,
                 'gamification': gamification_result
             }, status=status.HTTP_201_CREATED)
 
 
-class ReplyViewSet(viewsets.ModelViewSet):
+class ReplyViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     """API endpoint for replies"""
     queryset = Reply.objects.all()
     serializer_class = ReplySerializer
+    keyset_ordering = 'created_at'
     
     def get_permissions(self):
         """Allow read-only access for unauthenticated users"""
@@ -531,6 +449,33 @@ class ReplyViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """List replies; a topic's thread is loaded in a fixed number of queries"""
+        topic_id = request.query_params.get('topic_id', None)
+        if topic_id is None:
+            return super().list(request, *args, **kwargs)
+        
+        thread = ReplyThreadLoader(topic_id, request.user)
+        if isinstance(self.paginator, KeysetPagination):
+            # Only read the page of top-level replies and the replies below them
+            page = self.paginate_queryset(thread.top_level_replies())
+            replies = thread.load_nested(page)
+        else:
+            # Load all visible replies of the topic at once and nest them in memory
+            replies = thread.load()
+            page = self.paginate_queryset(replies)
+            if page is not None:
+                replies = page
+        thread.prime(replies)
+        
+        context = self.get_serializer_context()
+        context['reply_thread'] = thread
+        serializer = ReplySerializer(replies, many=True, context=context)
+        
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
     def perform_create(self, serializer):
         # Get topic_id from request data
         topic_id = self.request.data.get('topic')
@@ -576,6 +521,14 @@ class ReplyViewSet(viewsets.ModelViewSet):
                 'parent': request.data.get('parent'),
             }
             
+            # Images uploaded directly to storage are verified before anything is written
+            uploaded = direct_uploads('reply_image', _submitted_list(request, 'uploaded_images'))
+            if uploaded is None:
+                return Response(
+                    {'error': 'Invalid uploaded image.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
             serializer = self.get_serializer(data=reply_data)
             serializer.is_valid(raise_exception=True)
             self.perform_create(serializer)
@@ -589,20 +542,26 @@ class ReplyViewSet(viewsets.ModelViewSet):
             elif 'images' in request.FILES:
                 # Single file
                 images = [request.FILES['images']]
+            images = images[:5]
+            uploaded = uploaded[:5 - len(images)]
             
-            if images:
-                from .models import ReplyImage
-                for idx, image_file in enumerate(images[:5]):  # Limit to 5 images
-                    caption = request.data.get(f'caption_{idx}', '')
-                    ReplyImage.objects.create(
-                        reply=reply,
-                        image=image_file,
-                        caption=caption,
-                        order=idx
-                    )
+            from .models import ReplyImage
+            create_images('reply_image', [
+                ReplyImage(reply=reply, caption=request.data.get(f'caption_{idx}', ''), order=idx)
+                for idx in range(len(images))
+            ], images)
+            ReplyImage.objects.bulk_create([
+                ReplyImage(
+                    reply=reply,
+                    image=value,
+                    caption=str(data.get('caption') or ''),
+                    order=len(images) + idx
+                )
+                for idx, (value, data) in enumerate(uploaded)
+            ])
             
             # Track gamification for reply creation
-            gamification_result = GamificationService.track_reply_created(request.user)
+            gamification_result = dispatch_gamification_event('reply_created', request.user)
             
             # Re-serialize to include images
             serializer = self.get_serializer(reply)
@@ -630,30 +589,26 @@ class ReplyViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Prevent users from liking their own replies
-        if reply.author == user:
+        if reply.author_id == user.id:
             return Response(
                 {'error': 'You cannot like your own reply.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if reply.likes.filter(id=user.id).exists():
-            # Unlike
-            reply.likes.remove(user)
+        liked, likes_count = toggle_like(reply, user)
+        if not liked:
             return Response({
                 'status': 'unliked',
-                'likes_count': reply.likes_count,
+                'likes_count': likes_count,
                 'user_has_liked': False
             })
         else:
-            # Like
-            reply.likes.add(user)
-            
             # Track gamification for the reply author receiving a like
-            gamification_result = GamificationService.track_like_received(reply.author)
+            gamification_result = dispatch_gamification_event('like_received', reply.author)
             
             return Response({
                 'status': 'liked',
-                'likes_count': reply.likes_count,
+                'likes_count': likes_count,
                 'user_has_liked': True,
                 'gamification': gamification_result
             })
@@ -680,19 +635,27 @@ class ReplyViewSet(viewsets.ModelViewSet):
 
 class UserProfileViewSet(viewsets.ModelViewSet):
     """API endpoint for user profiles - lookup by user ID"""
-    queryset = UserProfile.objects.all()
+    queryset = UserProfile.objects.select_related('user', 'user__stats')
     serializer_class = UserProfileSerializer
     http_method_names = ['get', 'post', 'put', 'patch', 'head', 'options']  # Allow POST for custom actions
     
     def get_object(self):
         """Get profile by user ID instead of profile ID"""
-        user_id = self.kwargs.get('pk')
         from django.contrib.auth.models import User
+        from rest_framework.exceptions import NotFound
+        
+        try:
+            user_id = int(self.kwargs.get('pk'))
+        except (TypeError, ValueError):
+            raise NotFound('User not found')
+        
+        profile = self.get_queryset().filter(user_id=user_id).first()
+        if profile is not None:
+            return profile
         
         try:
             user = User.objects.get(id=user_id)
         except User.DoesNotExist:
-            from rest_framework.exceptions import NotFound
             raise NotFound('User not found')
         
         # Get or create profile for this user
@@ -702,7 +665,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def top_members(self, request):
         """Get top members by points"""
-        top_profiles = UserProfile.objects.order_by('-points')[:10]
+        top_profiles = self.get_queryset().order_by('-points')[:10]
         serializer = self.get_serializer(top_profiles, many=True)
         return Response(serializer.data)
     
@@ -721,6 +684,12 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         
         replies = Reply.objects.filter(author=profile.user).select_related('topic', 'author').order_by('-created_at')
         
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination('-created_at')
+            page = paginator.paginate_queryset(replies, request)
+            serializer = ReplySerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+        
         # Add context to show resolved reports if viewing own profile
         serializer = ReplySerializer(replies, many=True, context={'request': request})
         return Response(serializer.data)
@@ -729,7 +698,14 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def topics(self, request, pk=None):
         """Get user's topics"""
         profile = self.get_object()
-        topics = Topic.objects.filter(author=profile.user).select_related('author', 'category').order_by('-created_at')
+        topics = Topic.objects.filter(author=profile.user).with_related().order_by('-created_at')
+        
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination('-created_at')
+            page = paginator.paginate_queryset(topics, request)
+            serializer = TopicSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+        
         serializer = TopicSerializer(topics, many=True, context={'request': request})
         return Response(serializer.data)
 
@@ -756,14 +732,14 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             Follow.objects.create(follower=user, following=target_user)
             is_following = True
 
-        # Return updated follower counts
-        followers_count = Follow.objects.filter(following=target_user).count()
-        following_count = Follow.objects.filter(follower=target_user).count()
+        # Return updated follower counts (refreshed by the Follow signals)
+        from .models import UserStats
+        stats = UserStats.objects.filter(user=target_user).first() or UserStats(user=target_user)
 
         return Response({
             'is_following': is_following,
-            'followers_count': followers_count,
-            'following_count': following_count
+            'followers_count': stats.followers_count,
+            'following_count': stats.following_count
         })
 
     @action(detail=True, methods=['get'])
@@ -805,13 +781,20 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         profile = self.get_object()
         source_user = profile.user
 
-        from .models import Follow
-        following_user_ids = Follow.objects.filter(follower=source_user).values_list('following_id', flat=True)
+        from . import feed
 
-        topics = Topic.objects.filter(author_id__in=list(following_user_ids)).select_related('author', 'category').order_by('-created_at')
+        pulled_author_ids = feed.high_fanout_following(source_user)
+        if pulled_author_ids:
+            # Some followed users are not fanned out; merge their topics in at read time
+            topics = feed.pulled_feed(source_user, pulled_author_ids).with_related().order_by('-created_at', '-id')
+            paginator = paginator_for(request, feed.FEED_ORDERING)
+            page = paginator.paginate_queryset(topics, request)
+        else:
+            # Feed entries are keyed by the topic's (created_at, id), like the topics themselves
+            entries = FeedEntry.objects.filter(user=source_user).order_by('-created_at', '-topic_id')
+            paginator = paginator_for(request, feed.FEED_ORDERING, tiebreak='topic_id')
+            page = feed.topics_for_entries(paginator.paginate_queryset(entries, request))
 
-        paginator = CustomPageNumberPagination()
-        page = paginator.paginate_queryset(topics, request)
         serializer = TopicSerializer(page, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
     
@@ -828,12 +811,19 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             )
         
         bookmarks = Bookmark.objects.filter(user=profile.user).select_related('topic', 'topic__author', 'topic__category').order_by('-created_at')
+        
+        if KeysetPagination.requested(request):
+            paginator = KeysetPagination('-created_at')
+            page = paginator.paginate_queryset(bookmarks, request)
+            serializer = BookmarkSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        
         serializer = BookmarkSerializer(bookmarks, many=True)
         return Response(serializer.data)
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], parser_classes=[MultiPartParser, FormParser])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], parser_classes=[MultiPartParser, FormParser, JSONParser])
     def upload_image(self, request, pk=None):
-        """Upload user profile image"""
+        """Upload user profile image (a file, or an image uploaded directly to storage)"""
         profile = self.get_object()
         
         # Check if user is trying to upload to their own profile
@@ -845,12 +835,28 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         
         # Get the uploaded file
         user_image = request.FILES.get('user_image')
-        if not user_image:
+        uploaded_image = request.data.get('uploaded_image')
+        if not user_image and not uploaded_image:
             return Response(
                 {'error': 'No image file provided.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if not user_image:
+            value = direct_upload_value('user_image', uploaded_image)
+            if value is None:
+                return Response(
+                    {'error': 'Invalid uploaded image.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            profile.user_image = field_value('user_image', value)
+            profile.save(update_fields=['user_image'])
+            serializer = self.get_serializer(profile)
+            return Response({
+                'message': 'Profile image uploaded successfully.',
+                'profile': serializer.data
+            }, status=status.HTTP_200_OK)
+        
         try:
             # Validate file type
             allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
@@ -868,16 +874,16 @@ class UserProfileViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Save the image to the profile
-            profile.user_image = user_image
-            profile.save()
+            # Save the image to the profile (or queue it for the upload worker)
+            pending = set_user_image(profile, user_image)
             
             # Return success response with updated profile data
             serializer = self.get_serializer(profile)
             return Response({
-                'message': 'Profile image uploaded successfully.',
+                'message': 'Profile image is being processed.' if pending else 'Profile image uploaded successfully.',
+                'pending': pending,
                 'profile': serializer.data
-            }, status=status.HTTP_200_OK)
+            }, status=status.HTTP_202_ACCEPTED if pending else status.HTTP_200_OK)
             
         except Exception as e:
             return Response(
@@ -1046,11 +1052,18 @@ class ReportViewSet(viewsets.ModelViewSet):
         return Report.objects.filter(reporter=self.request.user)
     
     def perform_create(self, serializer):
-        serializer.save(reporter=self.request.user)
-        
+        report = serializer.save(reporter=self.request.user)
+
+        # Auto-hide the reply once it reaches the configured number of pending reports
+        threshold = SiteSettings.load().auto_hide_reported_replies
+        reply = report.reply
+        if threshold > 0 and not reply.is_hidden:
+            if reply.reports.filter(status='pending').count() >= threshold:
+                reply.is_hidden = True
+                reply.save(update_fields=['is_hidden'])
+
         # Check for reports badge
-        from gamification.services import GamificationService
-        badge_result = GamificationService.check_reports_badge(self.request.user)
+        badge_result = dispatch_gamification_event('report_created', self.request.user)
         
         # Store badge info in the request for later use in create()
         self.request.badge_result = badge_result
@@ -1084,7 +1097,7 @@ class ReportViewSet(viewsets.ModelViewSet):
         response = super().create(request, *args, **kwargs)
         
         # Add badge info to response if available
-        if hasattr(request, 'badge_result') and request.badge_result['badge_unlocked']:
+        if hasattr(request, 'badge_result') and request.badge_result.get('badge_unlocked'):
             response.data['badge_unlocked'] = request.badge_result['badge_unlocked']
         
         return response
@@ -1101,7 +1114,10 @@ def search(request):
     - category: filter by category ID
     - min_replies: minimum number of replies
     - sort: 'relevance', 'recent', 'popular' (default: 'relevance')
+    - page, page_size: topic result page (default: 1, 20; max page_size: 50)
     """
+    from .search import get_search_backend
+    
     query = request.query_params.get('q', '').strip()
     filter_type = request.query_params.get('filter', 'all')
     category_id = request.query_params.get('category')
@@ -1122,6 +1138,12 @@ def search(request):
             'total': 0
         })
     
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+        page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 50)
+    except (ValueError, TypeError):
+        page, page_size = 1, 20
+    
     results = {
         'topics': [],
         'users': [],
@@ -1129,14 +1151,10 @@ def search(request):
         'total': 0
     }
     
-    # Search Topics
+    # Search Topics (full-text index, see forum.search)
     if filter_type in ['all', 'topics']:
-        topics_query = Topic.objects.select_related(
-            'author', 'author__profile', 'category'
-        ).filter(
-            Q(title__icontains=query) | 
-            Q(content__icontains=query)
-        )
+        backend = get_search_backend()
+        topics_query = backend.search(Topic.objects.with_related(), query)
         
         # Apply category filter
         if category_id:
@@ -1148,27 +1166,31 @@ def search(request):
         # Apply min replies filter
         if min_replies:
             try:
-                topics_query = topics_query.annotate(
-                    total_replies=Count('replies')
-                ).filter(total_replies__gte=int(min_replies))
+                topics_query = topics_query.filter(replies_count__gte=int(min_replies))
             except (ValueError, TypeError):
                 pass  # Skip invalid min_replies
         
-        # Apply sorting
+        # Apply sorting (counts are read straight off the topic row)
         if sort_by == 'recent':
             topics_query = topics_query.order_by('-created_at')
         elif sort_by == 'popular':
             topics_query = topics_query.annotate(
-                popularity=Count('replies') + Count('bookmarks')
+                popularity=F('replies_count') + F('bookmarks_count')
             ).order_by('-popularity', '-views')
         else:  # relevance
-            # Simple relevance: title matches first, then by engagement
-            topics_query = topics_query.annotate(
-                total_replies=Count('replies')
-            ).order_by('-total_replies', '-views')
-        
-        topics = topics_query[:20]
-        results['topics'] = TopicSerializer(topics, many=True, context={'request': request}).data
+            # Index rank (title matches weigh more), then engagement
+            topics_query = topics_query.order_by('-search_rank', '-replies_count', '-views')
+        
+        offset = (page - 1) * page_size
+        topics = list(topics_query[offset:offset + page_size])
+        topics_data = TopicSerializer(topics, many=True, context={'request': request}).data
+        for topic, topic_data in zip(topics, topics_data):
+            topic_data['snippet'] = backend.snippet(topic, query)
+        
+        results['topics'] = topics_data
+        results['topics_count'] = topics_query.count()
+        results['page'] = page
+        results['page_size'] = page_size
     
     # Search Users
     if filter_type in ['all', 'users']:
@@ -1251,6 +1273,7 @@ def vote_poll(request, poll_id):
 
 
 @api_view(['GET'])
+@cache_anonymous_response('site-settings')
 def get_site_settings(request):
     """
     Get public site settings for frontend use
@@ -1258,3 +1281,92 @@ def get_site_settings(request):
     settings = SiteSettings.load()
     serializer = SiteSettingsSerializer(settings)
     return Response(serializer.data)
+
+
+SITEMAP_CHUNK_SIZE = 2000
+
+
+@api_view(['GET'])
+def sitemap_topics(request):
+    """
+    Stream (id, updated_at, category_id) for every topic, for sitemap generation
+
+    Rows are read with values_list() in chunks and written out as they come,
+    so memory use stays flat however many topics there are. Optional
+    ?after=<id>&limit=<n> splits the export into ranges (next_after is the
+    value for the next range, null on the last one). Honours If-Modified-Since
+    against the most recent topic update.
+    """
+    from django.db.models import Max
+    from django.http import HttpResponseNotModified, StreamingHttpResponse
+    from django.utils.http import http_date, parse_http_date_safe
+    import json
+
+    try:
+        after = int(request.query_params.get('after', 0))
+        limit = request.query_params.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return Response({'error': 'after and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit is not None and limit < 1:
+        return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+    last_modified = Topic.objects.aggregate(last=Max('updated_at'))['last']
+    if last_modified is not None:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if since is not None and int(last_modified.timestamp()) <= since:
+            return HttpResponseNotModified()
+
+    rows = Topic.objects.filter(id__gt=after).order_by('id').values_list('id', 'updated_at', 'category_id')
+    if limit is not None:
+        rows = rows[:limit]
+
+    def stream():
+        yield '{"fields": ["id", "updated_at", "category_id"], "topics": ['
+        count = 0
+        last_id = None
+        for topic_id, updated_at, category_id in rows.iterator(chunk_size=SITEMAP_CHUNK_SIZE):
+            row = json.dumps([topic_id, updated_at.isoformat(), category_id])
+            yield row if count == 0 else f',{row}'
+            count += 1
+            last_id = topic_id
+        next_after = last_id if limit is not None and count == limit else None
+        yield f'], "count": {count}, "next_after": {json.dumps(next_after)}}}'
+
+    response = StreamingHttpResponse(stream(), content_type='application/json')
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+@api_view(['POST'])
+def upload_signature(request):
+    """
+    Signed parameters for uploading an image straight to storage
+
+    Body: {"target": "topic_image" | "reply_image" | "user_image"}. The client
+    posts the file to upload_url with the returned fields, then submits the
+    storage's response as an entry of uploaded_images (topics, replies) or
+    as uploaded_image (profile image).
+    """
+    if not request.user.is_authenticated:
+        return Response(
+            {'error': 'Authentication required'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    
+    target = request.data.get('target')
+    if target not in TARGETS:
+        return Response(
+            {'error': f"target must be one of: {', '.join(TARGETS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        params = image_storage().direct_upload_params(folder_for(target))
+    except NotImplementedError:
+        return Response(
+            {'error': 'Direct uploads are not supported by the configured storage.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(params)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
-from .models import Level, UserLevel, Badge, UserBadge, UserStreak
+from .models import Level, UserLevel, Badge, UserBadge, UserStreak, GamificationEvent, BadgeNotification, XPEvent
 
 
 # Resources for import/export
@@ -100,3 +100,27 @@ class UserStreakAdmin(ImportExportModelAdmin):
     search_fields = ['user__username']
     readonly_fields = ['created_at', 'updated_at']
     ordering = ['-current_streak']
+
+
+@admin.register(GamificationEvent)
+class GamificationEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'event_type', 'status', 'attempts', 'next_attempt_at', 'created_at', 'processed_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['user__username']
+    readonly_fields = ['result', 'error', 'created_at', 'processed_at']
+    ordering = ['-id']
+
+
+@admin.register(BadgeNotification)
+class BadgeNotificationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'badge', 'is_read', 'created_at']
+    list_filter = ['is_read']
+    search_fields = ['user__username', 'badge__name']
+    ordering = ['-created_at']
+
+
+@admin.register(XPEvent)
+class XPEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'amount', 'created_at']
+    search_fields = ['user__username']
+    ordering = ['-created_at']
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GamificationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gamification'
+
+    def ready(self):
+        # Keep the in-memory badge and level tables in sync with the database
+        from . import signals  # noqa: F401
@@ -0,0 +1,145 @@
+"""
+Set-based badge engine
+
+Active badge definitions are kept in process memory (refreshed when a Badge
+is saved or deleted, see gamification.signals). A BadgeEngine collects every
+badge change caused by one event, then applies them with a few bulk
+statements: one SELECT of the user's rows for the touched badges, a
+bulk_create of the missing ones (created lazily, the first time an event
+touches a badge), one bulk_update and a single XP update.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from forum.cache import ProcessLocalCache
+
+from .models import Badge, UserBadge, UserLevel
+
+
+def _load_active_badges():
+    return {badge.name: badge for badge in Badge.objects.filter(is_active=True)}
+
+
+badge_registry = ProcessLocalCache('active-badges', _load_active_badges)
+
+
+def badge_data(badge):
+    """Payload returned to the client for a newly unlocked badge"""
+    return {
+        'id': badge.id,
+        'name': badge.name,
+        'description': badge.description,
+        'icon': badge.icon,
+        'xp_reward': badge.xp_reward
+    }
+
+
+def badges_with_progress(user):
+    """Every active badge paired with the user's progress, without writing anything
+
+    One query reads the user's existing rows; badges without a row get an
+    unsaved zero-progress UserBadge (id None). Rows are only created by the
+    BadgeEngine once an event touches the user's badges. Badges keep the
+    Badge ordering (order, name).
+    """
+    badges = badge_registry.get()
+    by_badge = {
+        user_badge.badge_id: user_badge
+        for user_badge in UserBadge.objects.filter(
+            user=user, badge_id__in=[badge.id for badge in badges.values()]
+        )
+    }
+
+    user_badges = []
+    for badge in badges.values():
+        user_badge = by_badge.get(badge.id) or UserBadge(user=user, badge=badge)
+        user_badge.badge = badge
+        user_badges.append(user_badge)
+    return user_badges
+
+
+class BadgeEngine:
+    """Evaluate all badges affected by one user event in bulk
+
+    Changes are applied in the order they were added, with the same rules as
+    UserBadge.update_progress() and UserBadge.unlock_badge().
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._changes = []
+
+    def increment(self, badge_name, amount=1):
+        """Increase progress (ignored once the badge is unlocked)"""
+        self._changes.append((badge_name, amount, None))
+        return self
+
+    def set_progress(self, badge_name, value):
+        """Replace progress with an absolute value (ignored once unlocked)"""
+        self._changes.append((badge_name, 0, value))
+        return self
+
+    def commit(self, xp=0):
+        """Write progress, unlocks and XP; returns the newly unlocked badges' data"""
+        badges = badge_registry.get()
+
+        touched = {badges[name] for name, amount, value in self._changes if name in badges}
+
+        with transaction.atomic():
+            user_badges = self._user_badges(touched)
+
+            changed = {}
+            unlocked = []
+            for badge_name, amount, value in self._changes:
+                badge = badges.get(badge_name)
+                if badge is None or badge.id not in user_badges:
+                    continue
+                user_badge = user_badges[badge.id]
+                if user_badge.unlocked:
+                    continue
+
+                user_badge.progress = value if value is not None else user_badge.progress + amount
+                if user_badge.progress >= badge.requirement_count:
+                    user_badge.unlocked = True
+                    user_badge.unlocked_at = timezone.now()
+                    user_badge.progress = badge.requirement_count
+                    unlocked.append(badge)
+                changed[badge.id] = user_badge
+
+            if changed:
+                UserBadge.objects.bulk_update(
+                    list(changed.values()), ['progress', 'unlocked', 'unlocked_at']
+                )
+
+            xp += sum(badge.xp_reward for badge in unlocked)
+            if xp > 0:
+                user_level, created = UserLevel.objects.get_or_create(user=self.user)
+                user_level.add_xp(xp)
+
+        self._changes = []
+        return [badge_data(badge) for badge in unlocked]
+
+    def _user_badges(self, badges):
+        """Return the user's rows for the given badges, creating missing ones in bulk"""
+        badge_ids = {badge.id for badge in badges}
+        by_badge = {
+            user_badge.badge_id: user_badge
+            for user_badge in UserBadge.objects.filter(user=self.user, badge_id__in=badge_ids)
+        }
+
+        missing = badge_ids - by_badge.keys()
+        if missing:
+            UserBadge.objects.bulk_create(
+                [UserBadge(user=self.user, badge_id=badge_id) for badge_id in missing],
+                ignore_conflicts=True
+            )
+            # ignore_conflicts does not return primary keys; read the rows back
+            by_badge.update(
+                (user_badge.badge_id, user_badge)
+                for user_badge in UserBadge.objects.filter(user=self.user, badge_id__in=missing)
+            )
+
+        badges_by_id = {badge.id: badge for badge in badges}
+        for user_badge in by_badge.values():
+            user_badge.badge = badges_by_id[user_badge.badge_id]
+        return by_badge
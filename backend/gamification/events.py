@@ -0,0 +1,127 @@
+"""
+Gamification event dispatch
+
+Views report user actions through dispatch(). With GAMIFICATION_ASYNC off
+(the default) the event is processed immediately and its result returned,
+exactly as before. With it on, the event is written to the
+GamificationEvent outbox and the view returns at once; the
+process_gamification_events command drains the outbox in batches and
+stores unlocked badges as BadgeNotification rows for the user to fetch.
+An event whose handler fails is retried after an exponentially growing
+delay (next_attempt_at) and marked failed after MAX_ATTEMPTS.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import BadgeNotification, GamificationEvent
+from .services import GamificationService
+
+EVENT_HANDLERS = {
+    'topic_created': GamificationService.track_topic_created,
+    'reply_created': GamificationService.track_reply_created,
+    'like_received': GamificationService.track_like_received,
+    'bookmark_created': GamificationService.track_bookmark_created,
+    'daily_login': GamificationService.update_daily_streak,
+    'topic_liked': GamificationService.check_topic_likes_badges,
+    'report_created': GamificationService.check_reports_badge,
+}
+
+# Events that recompute absolute progress; repeats for a user within one
+# batch give the same result, so only the first one is processed
+IDEMPOTENT_EVENTS = {'topic_liked', 'report_created'}
+
+# Events credited to the day they happened rather than the day the worker
+# runs; handlers get that date as ``today``, and repeats are only skipped
+# within the same day
+DATED_EVENTS = {'daily_login'}
+
+MAX_ATTEMPTS = 5
+
+# Delay before the first retry of a failed event; doubled on each attempt
+RETRY_DELAY = timedelta(seconds=30)
+
+# Returned to the client instead of a result when the event is queued
+QUEUED_RESULT = {'queued': True}
+
+
+def dispatch(event_type, user):
+    """Process an event now, or queue it when GAMIFICATION_ASYNC is enabled"""
+    if settings.GAMIFICATION_ASYNC:
+        GamificationEvent.objects.create(user=user, event_type=event_type)
+        return QUEUED_RESULT
+    return EVENT_HANDLERS[event_type](user)
+
+
+def is_queued(result):
+    """Whether a dispatch() result means the event was queued, not processed"""
+    return result is QUEUED_RESULT
+
+
+def retry_delay(attempts):
+    """Backoff before retrying an event that has failed ``attempts`` times"""
+    return RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def _unlocked_badge_ids(result):
+    """Badge IDs unlocked according to a handler result"""
+    badges = list(result.get('badges_unlocked') or [])
+    if result.get('badge_unlocked'):
+        badges.append(result['badge_unlocked'])
+    return [badge['id'] for badge in badges]
+
+
+def process_pending(batch_size=100):
+    """Process one batch of queued events; returns the number of events handled"""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = GamificationEvent.objects.filter(
+            status='pending', next_attempt_at__lte=now
+        ).select_related('user')
+        if connection.features.has_select_for_update_skip_locked:
+            # Several workers can drain the outbox without picking the same rows
+            queryset = queryset.select_for_update(skip_locked=True, of=('self',))
+        events = list(queryset.order_by('id')[:batch_size])
+
+        seen = set()
+        notifications = []
+        for event in events:
+            dated = event.event_type in DATED_EVENTS
+            day = event.created_at.date() if dated else None
+            key = (event.user_id, event.event_type, day)
+            event.attempts += 1
+            event.processed_at = now
+
+            if (event.event_type in IDEMPOTENT_EVENTS or dated) and key in seen:
+                event.status = 'processed'
+                event.result = {'skipped': 'duplicate'}
+                continue
+
+            try:
+                with transaction.atomic():
+                    handler = EVENT_HANDLERS[event.event_type]
+                    result = handler(event.user, today=day) if dated else handler(event.user)
+            except Exception as e:
+                event.error = str(e)
+                if event.attempts >= MAX_ATTEMPTS:
+                    event.status = 'failed'
+                else:
+                    event.next_attempt_at = now + retry_delay(event.attempts)
+                continue
+
+            seen.add(key)
+            event.status = 'processed'
+            event.result = result
+            notifications.extend(
+                BadgeNotification(user_id=event.user_id, badge_id=badge_id)
+                for badge_id in _unlocked_badge_ids(result)
+            )
+
+        GamificationEvent.objects.bulk_update(
+            events, ['status', 'attempts', 'result', 'error', 'next_attempt_at', 'processed_at']
+        )
+        BadgeNotification.objects.bulk_create(notifications)
+
+    return len(events)
@@ -0,0 +1,135 @@
+"""
+Leaderboards
+
+All-time ranks come from a process-local snapshot of every user's XP, kept
+as a sorted list: a rank is one bisect instead of a COUNT over UserLevel.
+XP changes made by this process are applied to the snapshot in place once
+their transaction commits, and the whole snapshot is reloaded every
+LEADERBOARD_SNAPSHOT_TTL seconds, so ranks computed by other workers lag by
+at most that long.
+
+Top-N and around-me windows read UserLevel through the XP index; weekly and
+monthly boards sum the XPEvent log over the period. The log starts with the
+migration that added it (XP earned before has no date), so those boards only
+cover XP awarded since.
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from forum.cache import ProcessLocalCache
+
+from .models import UserLevel, XPEvent
+
+PERIODS = {
+    'week': timedelta(days=7),
+    'month': timedelta(days=30),
+}
+
+
+class LeaderboardSnapshot:
+    """Sorted XP values of all users supporting O(log n) rank lookups"""
+
+    def __init__(self, xp_by_user):
+        self._lock = threading.Lock()
+        # Each user's value in _xp, so a change removes exactly that user's entry
+        self._xp_by_user = dict(xp_by_user)
+        self._xp = sorted(self._xp_by_user.values())
+
+    def __len__(self):
+        return len(self._xp)
+
+    def rank_of(self, xp):
+        """1-based rank of a user with ``xp`` (ties share the best rank)"""
+        with self._lock:
+            return len(self._xp) - bisect_right(self._xp, xp) + 1
+
+    def move(self, user_id, new_xp):
+        """Apply one user's XP change; users missing from the snapshot are added"""
+        with self._lock:
+            old_xp = self._xp_by_user.get(user_id)
+            if old_xp is not None:
+                del self._xp[bisect_left(self._xp, old_xp)]
+            insort(self._xp, new_xp)
+            self._xp_by_user[user_id] = new_xp
+
+
+def _load_snapshot():
+    return LeaderboardSnapshot(UserLevel.objects.values_list('user_id', 'xp'))
+
+
+snapshot_cache = ProcessLocalCache(
+    'leaderboard', _load_snapshot, max_age=settings.LEADERBOARD_SNAPSHOT_TTL
+)
+
+
+def rank_of(user_level):
+    return snapshot_cache.get().rank_of(user_level.xp)
+
+
+def record_xp_change(user_id, new_xp):
+    """Keep this process's snapshot current after an XP award (see UserLevel.add_xp)
+
+    Applied on commit, so an award that is rolled back never reaches the snapshot.
+    """
+    def apply():
+        snapshot = snapshot_cache.peek()
+        if snapshot is not None:
+            snapshot.move(user_id, new_xp)
+
+    transaction.on_commit(apply)
+
+
+def top(limit):
+    """Highest ranked users as (rank, UserLevel) pairs"""
+    user_levels = UserLevel.objects.select_related('user').order_by('-xp', 'id')[:limit]
+    snapshot = snapshot_cache.get()
+    return [(snapshot.rank_of(user_level.xp), user_level) for user_level in user_levels]
+
+
+def around(user_level, size):
+    """The user plus up to ``size`` neighbours on each side, as (rank, UserLevel) pairs
+
+    ``user_level`` may be unsaved (a user without XP yet); it then sorts after
+    every saved row with the same XP.
+    """
+    if user_level.pk is None:
+        ahead, behind = Q(xp__gte=user_level.xp), Q(xp__lt=user_level.xp)
+    else:
+        ahead = Q(xp__gt=user_level.xp) | Q(xp=user_level.xp, id__lt=user_level.id)
+        behind = Q(xp__lt=user_level.xp) | Q(xp=user_level.xp, id__gt=user_level.id)
+    above = UserLevel.objects.select_related('user').filter(ahead).order_by('xp', '-id')[:size]
+    below = UserLevel.objects.select_related('user').filter(behind).order_by('-xp', 'id')[:size]
+
+    snapshot = snapshot_cache.get()
+    window = list(reversed(above)) + [user_level] + list(below)
+    return [(snapshot.rank_of(entry.xp), entry) for entry in window]
+
+
+def period_top(period, limit):
+    """Users who earned the most XP in the period, as (rank, user_id, period_xp)
+
+    Cached for a minute; the XP log makes these cheap to recompute anyway.
+    """
+    cache_key = f'leaderboard:{period}:{limit}'
+    rows = cache.get(cache_key)
+    if rows is None:
+        since = timezone.now() - PERIODS[period]
+        totals = XPEvent.objects.filter(created_at__gte=since).values('user').annotate(
+            period_xp=Sum('amount')
+        ).order_by('-period_xp', 'user')[:limit]
+
+        rows = []
+        previous = None
+        for position, row in enumerate(totals, start=1):
+            rank = rows[-1][0] if previous == row['period_xp'] else position
+            rows.append((rank, row['user'], row['period_xp']))
+            previous = row['period_xp']
+        cache.set(cache_key, rows, 60)
+    return rows
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from gamification.events import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Process queued gamification events (XP, streaks and badges) from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of events to process per batch (default: 100)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new events instead of exiting when the outbox is empty'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the outbox is empty (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        processed_count = 0
+
+        self.stdout.write('Processing gamification events...')
+
+        while True:
+            processed = process_pending(batch_size)
+            processed_count += processed
+
+            if processed:
+                self.stdout.write(f'  Processed {processed} events')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'\nCompleted! Processed {processed_count} events.'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0010_userlevel_xp_index_xpevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamificationevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,6 +1,9 @@
+from bisect import bisect_right
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from cloudinary.models import CloudinaryField
+from forum.cache import ProcessLocalCache
 
 
 class Level(models.Model):
@@ -22,10 +25,42 @@ class Level(models.Model):
         return f"Level {self.level_number}: {self.name} ({self.xp_required} XP)"
 
 
+class LevelTable:
+    """Active levels held in memory, looked up by number or by XP (bisect)"""
+    
+    def __init__(self, levels):
+        self._by_number = {level.level_number: level for level in levels}
+        by_xp = sorted(levels, key=lambda level: (level.xp_required, level.level_number))
+        self._thresholds = [level.xp_required for level in by_xp]
+        # Highest level number reachable at or below each threshold
+        self._best = []
+        for level in by_xp:
+            if not self._best or level.level_number > self._best[-1].level_number:
+                self._best.append(level)
+            else:
+                self._best.append(self._best[-1])
+    
+    def get(self, level_number):
+        return self._by_number.get(level_number)
+    
+    def highest_for_xp(self, xp):
+        """Highest active level whose XP requirement is met, or None"""
+        index = bisect_right(self._thresholds, xp)
+        return self._best[index - 1] if index else None
+
+
+def _load_level_table():
+    return LevelTable(list(Level.objects.filter(is_active=True)))
+
+
+# Refreshed by gamification.signals when a Level is saved or deleted
+level_table = ProcessLocalCache('levels', _load_level_table)
+
+
 class UserLevel(models.Model):
     """User levels and XP tracking"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='level')
-    xp = models.IntegerField(default=0)
+    xp = models.IntegerField(default=0, db_index=True)
     level = models.IntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -45,12 +80,12 @@ class UserLevel(models.Model):
     @property
     def current_level_obj(self):
         """Get the Level object for current level"""
-        return Level.objects.filter(level_number=self.level, is_active=True).first()
+        return level_table.get().get(self.level)
     
     @property
     def next_level_obj(self):
         """Get the Level object for next level"""
-        return Level.objects.filter(level_number=self.level + 1, is_active=True).first()
+        return level_table.get().get(self.level + 1)
     
     @property
     def current_xp(self):
@@ -95,22 +130,36 @@ class UserLevel(models.Model):
     
     def add_xp(self, amount):
         """Add XP and check for level up"""
+        from .leaderboard import record_xp_change
+        
         self.xp += amount
         self.check_level_up()
         self.save()
+        
+        # Log the award for weekly/monthly leaderboards
+        XPEvent.objects.create(user_id=self.user_id, amount=amount)
+        record_xp_change(self.user_id, self.xp)
     
     def check_level_up(self):
         """Check if user should level up based on Level model"""
-        # Get all levels the user qualifies for
-        qualified_levels = Level.objects.filter(
-            xp_required__lte=self.xp,
-            is_active=True
-        ).order_by('-level_number')
+        # Highest level the user qualifies for, from the cached level table
+        highest_level = level_table.get().highest_for_xp(self.xp)
         
-        if qualified_levels.exists():
-            highest_level = qualified_levels.first()
-            if highest_level.level_number > self.level:
-                self.level = highest_level.level_number
+        if highest_level and highest_level.level_number > self.level:
+            self.level = highest_level.level_number
+
+
+class XPEvent(models.Model):
+    """Log of XP awards, used for time-windowed leaderboards"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='xp_events')
+    amount = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.user_id} +{self.amount} XP"
 
 
 class Badge(models.Model):
@@ -200,18 +249,18 @@ class UserStreak(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.current_streak} days streak"
     
-    def update_streak(self):
-        """Update streak based on activity"""
+    def update_streak(self, today=None):
+        """Update streak based on activity on ``today`` (default: the current date)"""
         from django.utils import timezone
-        today = timezone.now().date()
+        today = today or timezone.now().date()
         
         if self.last_activity_date is None:
             # First activity
             self.current_streak = 1
             self.longest_streak = 1
             self.last_activity_date = today
-        elif self.last_activity_date == today:
-            # Already counted today
+        elif self.last_activity_date >= today:
+            # Already counted today (or a later day, for a late-processed event)
             return
         elif (today - self.last_activity_date).days == 1:
             # Consecutive day
@@ -226,3 +275,56 @@ class UserStreak(models.Model):
         
         self.save()
 
+
+class GamificationEvent(models.Model):
+    """Outbox of user actions waiting for XP/badge processing (GAMIFICATION_ASYNC mode)"""
+    EVENT_CHOICES = [
+        ('topic_created', 'Topic Created'),
+        ('reply_created', 'Reply Created'),
+        ('like_received', 'Like Received'),
+        ('bookmark_created', 'Bookmark Created'),
+        ('daily_login', 'Daily Login'),
+        ('topic_liked', 'Topic Liked'),
+        ('report_created', 'Report Created'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='gamification_events')
+    event_type = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='gamification_event_queue_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.event_type} ({self.status})"
+
+
+class BadgeNotification(models.Model):
+    """Badge unlocked by a queued event, kept until the user has seen it"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='badge_notifications')
+    badge = models.ForeignKey(Badge, on_delete=models.CASCADE, related_name='notifications')
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='badge_notification_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.badge.name}"
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Level, UserLevel, Badge, UserBadge, UserStreak
+from .models import Level, UserLevel, Badge, UserBadge, UserStreak, BadgeNotification
 
 
 class LevelSerializer(serializers.ModelSerializer):
@@ -150,3 +150,13 @@ class UserGamificationSerializer(serializers.Serializer):
     badges = UserBadgeSerializer(many=True, read_only=True)
     streak_data = UserStreakSerializer(read_only=True)
     leaderboard_position = serializers.IntegerField(read_only=True)
+
+
+class BadgeNotificationSerializer(serializers.ModelSerializer):
+    """Serializer for badges unlocked by queued gamification events"""
+    badge = BadgeSerializer(read_only=True)
+    
+    class Meta:
+        model = BadgeNotification
+        fields = ['id', 'badge', 'is_read', 'created_at']
+        read_only_fields = ['badge', 'created_at']
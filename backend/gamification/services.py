@@ -2,6 +2,7 @@
 Gamification service to track user actions and award XP/badges
 """
 from django.contrib.auth.models import User
+from .badges import BadgeEngine
 from .models import UserLevel, Badge, UserBadge, UserStreak
 
 
@@ -17,12 +18,14 @@ class GamificationService:
         'daily_login': 5,
     }
     
-    @staticmethod
-    def ensure_user_badges(user):
-        """Ensure all active badges have UserBadge entries for the user"""
-        all_badges = Badge.objects.filter(is_active=True)
-        for badge in all_badges:
-            UserBadge.objects.get_or_create(user=user, badge=badge)
+    # Badges advanced by each tracked action, in the order they are reported
+    TOPIC_BADGES = ['First Post', '10 Posts', '50 Posts', 'Expert Mechanic']
+    REPLY_BADGES = ['100 Replies', 'Expert Mechanic']
+    LIKE_BADGES = ['10 Likes', '50 Likes', '100 Likes']
+    BOOKMARK_BADGES = ['Bookworm']
+    STREAK_BADGES = ['100 Days Active', '30 Days Active', '7 Days Active', '3 Days Active']
+    SINGLE_TOPIC_LIKES_BADGES = ['Viral Post', 'Popular Post', 'Liked Post']
+    TOTAL_LIKES_BADGES = ['Superstar', 'Influencer', 'Community Favorite', 'Well Liked']
     
     @staticmethod
     def award_xp(user, action_type, amount=None):
@@ -46,210 +49,71 @@ class GamificationService:
             increment: Amount to increment progress by (default: 1)
             set_progress: If provided, set progress to this value instead of incrementing
         """
-        try:
-            badge = Badge.objects.get(name=badge_name, is_active=True)
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=user,
-                badge=badge
-            )
-            was_unlocked = user_badge.unlocked
-            
-            if set_progress is not None:
-                # Set progress to specific value
-                if not user_badge.unlocked:
-                    user_badge.progress = set_progress
-                    if user_badge.progress >= badge.requirement_count:
-                        user_badge.unlock_badge()
-                    else:
-                        user_badge.save()
-            else:
-                # Increment progress
-                user_badge.update_progress(increment)
-            
-            # Return badge data if newly unlocked
-            if user_badge.unlocked and not was_unlocked:
-                from .serializers import BadgeSerializer
-                return {
-                    'id': badge.id,
-                    'name': badge.name,
-                    'description': badge.description,
-                    'icon': badge.icon,
-                    'xp_reward': badge.xp_reward
-                }
-            return None
-        except Badge.DoesNotExist:
-            return None
+        engine = BadgeEngine(user)
+        if set_progress is not None:
+            engine.set_progress(badge_name, set_progress)
+        else:
+            engine.increment(badge_name, increment)
+        unlocked = engine.commit()
+        return unlocked[0] if unlocked else None
     
     @staticmethod
-    def track_topic_created(user):
-        """Track when user creates a topic"""
-        # Ensure all badges exist for this user
-        GamificationService.ensure_user_badges(user)
+    def _track_action(user, action_type, badge_names):
+        """Award action XP and advance badges in one batch of writes"""
+        xp_awarded = GamificationService.XP_REWARDS.get(action_type, 0)
         
-        # Award XP
-        xp_awarded = GamificationService.award_xp(user, 'create_topic')
-        
-        # Update contribution badges
-        badges_unlocked = []
-        
-        badge = GamificationService.update_badge_progress(user, 'First Post')
-        if badge:
-            badges_unlocked.append(badge)
-            
-        badge = GamificationService.update_badge_progress(user, '10 Posts')
-        if badge:
-            badges_unlocked.append(badge)
-            
-        badge = GamificationService.update_badge_progress(user, '50 Posts')
-        if badge:
-            badges_unlocked.append(badge)
-            
-        badge = GamificationService.update_badge_progress(user, 'Expert Mechanic')
-        if badge:
-            badges_unlocked.append(badge)
+        engine = BadgeEngine(user)
+        for badge_name in badge_names:
+            engine.increment(badge_name)
+        badges_unlocked = engine.commit(xp=xp_awarded)
         
         return {
             'xp_awarded': xp_awarded,
             'badges_unlocked': badges_unlocked
         }
     
+    @staticmethod
+    def track_topic_created(user):
+        """Track when user creates a topic"""
+        return GamificationService._track_action(
+            user, 'create_topic', GamificationService.TOPIC_BADGES
+        )
+    
     @staticmethod
     def track_reply_created(user):
         """Track when user creates a reply"""
-        # Ensure all badges exist for this user
-        GamificationService.ensure_user_badges(user)
-        
-        # Award XP
-        xp_awarded = GamificationService.award_xp(user, 'create_reply')
-        
-        # Update contribution badges
-        badges_unlocked = []
-        
-        badge = GamificationService.update_badge_progress(user, '100 Replies')
-        if badge:
-            badges_unlocked.append(badge)
-            
-        badge = GamificationService.update_badge_progress(user, 'Expert Mechanic')
-        if badge:
-            badges_unlocked.append(badge)
-        
-        return {
-            'xp_awarded': xp_awarded,
-            'badges_unlocked': badges_unlocked
-        }
+        return GamificationService._track_action(
+            user, 'create_reply', GamificationService.REPLY_BADGES
+        )
     
     @staticmethod
     def track_like_received(user):
         """Track when user's post receives a like"""
-        # Ensure all badges exist for this user
-        GamificationService.ensure_user_badges(user)
-        
-        # Award XP
-        xp_awarded = GamificationService.award_xp(user, 'receive_like')
-        
-        # Update social badges
-        badges_unlocked = []
-        
-        badge = GamificationService.update_badge_progress(user, '10 Likes')
-        if badge:
-            badges_unlocked.append(badge)
-            
-        badge = GamificationService.update_badge_progress(user, '50 Likes')
-        if badge:
-            badges_unlocked.append(badge)
-            
-        badge = GamificationService.update_badge_progress(user, '100 Likes')
-        if badge:
-            badges_unlocked.append(badge)
-        
-        return {
-            'xp_awarded': xp_awarded,
-            'badges_unlocked': badges_unlocked
-        }
+        return GamificationService._track_action(
+            user, 'receive_like', GamificationService.LIKE_BADGES
+        )
     
     @staticmethod
     def track_bookmark_created(user):
         """Track when user creates a bookmark"""
-        # Ensure all badges exist for this user
-        GamificationService.ensure_user_badges(user)
-        
-        # Award XP
-        xp_awarded = GamificationService.award_xp(user, 'create_bookmark')
-        
-        # Update helpful badges
-        badges_unlocked = []
-        
-        badge = GamificationService.update_badge_progress(user, 'Bookworm')
-        if badge:
-            badges_unlocked.append(badge)
-        
-        return {
-            'xp_awarded': xp_awarded,
-            'badges_unlocked': badges_unlocked
-        }
+        return GamificationService._track_action(
+            user, 'create_bookmark', GamificationService.BOOKMARK_BADGES
+        )
     
     @staticmethod
-    def update_daily_streak(user):
-        """Update user's daily activity streak"""
-        # Ensure all badges exist for this user
-        GamificationService.ensure_user_badges(user)
-        
+    def update_daily_streak(user, today=None):
+        """Update user's daily activity streak (``today`` is the login date, default now)"""
         user_streak, created = UserStreak.objects.get_or_create(user=user)
-        user_streak.update_streak()
+        user_streak.update_streak(today=today)
         
-        # Award daily login XP
-        xp_awarded = GamificationService.award_xp(user, 'daily_login')
-        
-        # Update streak badges with current streak count
-        badges_unlocked = []
+        # Daily login XP plus streak badge progress based on the current streak
+        xp_awarded = GamificationService.XP_REWARDS['daily_login']
         current_streak = user_streak.current_streak
         
-        # Update progress for all streak badges based on current streak
-        if current_streak >= 100:
-            badge = GamificationService.update_badge_progress(
-                user, '100 Days Active', set_progress=current_streak
-            )
-            if badge:
-                badges_unlocked.append(badge)
-        
-        if current_streak >= 30:
-            badge = GamificationService.update_badge_progress(
-                user, '30 Days Active', set_progress=current_streak
-            )
-            if badge:
-                badges_unlocked.append(badge)
-                
-        if current_streak >= 7:
-            badge = GamificationService.update_badge_progress(
-                user, '7 Days Active', set_progress=current_streak
-            )
-            if badge:
-                badges_unlocked.append(badge)
-                
-        if current_streak >= 3:
-            badge = GamificationService.update_badge_progress(
-                user, '3 Days Active', set_progress=current_streak
-            )
-            if badge:
-                badges_unlocked.append(badge)
-        
-        # Also update progress for badges not yet reached
-        if current_streak < 100:
-            GamificationService.update_badge_progress(
-                user, '100 Days Active', set_progress=current_streak
-            )
-        if current_streak < 30:
-            GamificationService.update_badge_progress(
-                user, '30 Days Active', set_progress=current_streak
-            )
-        if current_streak < 7:
-            GamificationService.update_badge_progress(
-                user, '7 Days Active', set_progress=current_streak
-            )
-        if current_streak < 3:
-            GamificationService.update_badge_progress(
-                user, '3 Days Active', set_progress=current_streak
-            )
+        engine = BadgeEngine(user)
+        for badge_name in GamificationService.STREAK_BADGES:
+            engine.set_progress(badge_name, current_streak)
+        badges_unlocked = engine.commit(xp=xp_awarded)
         
         return {
             'xp_awarded': xp_awarded,
@@ -260,69 +124,22 @@ class GamificationService:
     @staticmethod
     def check_topic_likes_badges(topic_author):
         """Check and award badges based on topic likes"""
+        from django.db.models import Max, Sum
         from forum.models import Topic
         
-        # Ensure all badges exist for this user
-        GamificationService.ensure_user_badges(topic_author)
-        
-        badges_unlocked = []
-        
-        # Get all topics by this author
-        author_topics = Topic.objects.filter(author=topic_author)
-        
-        # Find the maximum likes on any single topic
-        max_likes_on_single_topic = 0
-        for topic in author_topics:
-            likes_count = topic.likes.count()
-            if likes_count > max_likes_on_single_topic:
-                max_likes_on_single_topic = likes_count
-        
-        # Update single topic badges with max likes progress
-        badge = GamificationService.update_badge_progress(
-            topic_author, 'Viral Post', set_progress=max_likes_on_single_topic
-        )
-        if badge:
-            badges_unlocked.append(badge)
-        
-        badge = GamificationService.update_badge_progress(
-            topic_author, 'Popular Post', set_progress=max_likes_on_single_topic
-        )
-        if badge:
-            badges_unlocked.append(badge)
-        
-        badge = GamificationService.update_badge_progress(
-            topic_author, 'Liked Post', set_progress=max_likes_on_single_topic
-        )
-        if badge:
-            badges_unlocked.append(badge)
-        
-        # Calculate total likes across all topics
-        total_likes = sum(topic.likes.count() for topic in author_topics)
-        
-        # Update total likes badges with cumulative progress
-        badge = GamificationService.update_badge_progress(
-            topic_author, 'Superstar', set_progress=total_likes
-        )
-        if badge:
-            badges_unlocked.append(badge)
-        
-        badge = GamificationService.update_badge_progress(
-            topic_author, 'Influencer', set_progress=total_likes
-        )
-        if badge:
-            badges_unlocked.append(badge)
-        
-        badge = GamificationService.update_badge_progress(
-            topic_author, 'Community Favorite', set_progress=total_likes
-        )
-        if badge:
-            badges_unlocked.append(badge)
-        
-        badge = GamificationService.update_badge_progress(
-            topic_author, 'Well Liked', set_progress=total_likes
+        # Read the denormalized like counters instead of counting per topic
+        likes = Topic.objects.filter(author=topic_author).aggregate(
+            max_likes=Max('likes_count'), total_likes=Sum('likes_count')
         )
-        if badge:
-            badges_unlocked.append(badge)
+        max_likes_on_single_topic = likes['max_likes'] or 0
+        total_likes = likes['total_likes'] or 0
+        
+        engine = BadgeEngine(topic_author)
+        for badge_name in GamificationService.SINGLE_TOPIC_LIKES_BADGES:
+            engine.set_progress(badge_name, max_likes_on_single_topic)
+        for badge_name in GamificationService.TOTAL_LIKES_BADGES:
+            engine.set_progress(badge_name, total_likes)
+        badges_unlocked = engine.commit()
         
         return {
             'total_likes': total_likes,
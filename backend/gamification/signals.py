@@ -0,0 +1,20 @@
+"""
+Signal handlers for the gamification app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .badges import badge_registry
+from .models import Badge, Level, level_table
+
+
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+def invalidate_badge_registry(sender, **kwargs):
+    badge_registry.invalidate()
+
+
+@receiver(post_save, sender=Level)
+@receiver(post_delete, sender=Level)
+def invalidate_level_table(sender, **kwargs):
+    level_table.invalidate()
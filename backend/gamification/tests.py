@@ -1,3 +1,277 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import events, leaderboard
+from .badges import BadgeEngine, badge_registry
+from .events import process_pending
+from .models import (
+    Badge, GamificationEvent, Level, LevelTable, UserBadge, UserLevel, UserStreak, XPEvent
+)
+
+
+def make_user(username='driver'):
+    return User.objects.create_user(username, f'{username}@example.com')
+
+
+class QueuedDailyLoginTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def queue_login(self, created_at):
+        event = GamificationEvent.objects.create(user=self.user, event_type='daily_login')
+        GamificationEvent.objects.filter(pk=event.pk).update(created_at=created_at)
+
+    def test_streak_uses_the_login_date_not_the_processing_date(self):
+        self.queue_login(datetime(2026, 3, 1, 23, 50, tzinfo=dt_timezone.utc))
+        self.queue_login(datetime(2026, 3, 2, 0, 10, tzinfo=dt_timezone.utc))
+        self.queue_login(datetime(2026, 3, 3, 9, 0, tzinfo=dt_timezone.utc))
+
+        process_pending()
+
+        streak = UserStreak.objects.get(user=self.user)
+        self.assertEqual(streak.current_streak, 3)
+        self.assertEqual(streak.last_activity_date, date(2026, 3, 3))
+
+    def test_repeated_logins_are_deduplicated_per_day(self):
+        self.queue_login(datetime(2026, 3, 1, 8, 0, tzinfo=dt_timezone.utc))
+        self.queue_login(datetime(2026, 3, 1, 20, 0, tzinfo=dt_timezone.utc))
+        self.queue_login(datetime(2026, 3, 2, 8, 0, tzinfo=dt_timezone.utc))
+
+        process_pending()
+
+        results = list(GamificationEvent.objects.order_by('id').values_list('result', flat=True))
+        self.assertEqual(results[1], {'skipped': 'duplicate'})
+        self.assertNotIn('skipped', results[2])
+        self.assertEqual(UserStreak.objects.get(user=self.user).current_streak, 2)
+
+
+class EventRetryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.event = GamificationEvent.objects.create(user=self.user, event_type='bookmark_created')
+
+    def process_failing(self):
+        failing = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.dict(events.EVENT_HANDLERS, {'bookmark_created': failing}):
+            return process_pending()
+
+    def test_failed_event_waits_before_it_is_retried(self):
+        self.assertEqual(self.process_failing(), 1)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.status, 'pending')
+        self.assertEqual(self.event.error, 'boom')
+        self.assertGreater(self.event.next_attempt_at, timezone.now())
+        self.assertEqual(process_pending(), 0)
+
+        GamificationEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_pending(), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.status, 'processed')
+
+    def test_delay_doubles_until_the_event_fails(self):
+        delays = []
+        for _ in range(events.MAX_ATTEMPTS):
+            GamificationEvent.objects.update(next_attempt_at=timezone.now())
+            before = timezone.now()
+            self.process_failing()
+            self.event.refresh_from_db()
+            delays.append(self.event.next_attempt_at - before)
+
+        self.assertEqual(self.event.status, 'failed')
+        for attempt, delay in enumerate(delays[:-1], start=1):
+            self.assertAlmostEqual(
+                delay.total_seconds(), events.retry_delay(attempt).total_seconds(), delta=1
+            )
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        leaderboard.snapshot_cache.invalidate()
+        self.client = APIClient()
+
+    def make_level(self, username, xp):
+        return UserLevel.objects.create(user=make_user(username), xp=xp)
+
+    def get_board(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/gamification/user-levels/leaderboard/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(entry['username'], entry['rank']) for entry in response.data]
+
+    def test_ties_share_the_best_rank(self):
+        snapshot = leaderboard.LeaderboardSnapshot({1: 50, 2: 50, 3: 10})
+
+        self.assertEqual([snapshot.rank_of(xp) for xp in (60, 50, 10, 0)], [1, 1, 3, 4])
+
+    def test_top_ranks_users_by_xp(self):
+        first = self.make_level('first', 300)
+        self.make_level('second', 200)
+        self.make_level('also_second', 200)
+
+        board = self.get_board(first.user)
+
+        self.assertEqual(board, [('first', 1), ('second', 2), ('also_second', 2)])
+
+    def test_first_award_of_a_new_user_is_added_to_the_snapshot(self):
+        self.make_level('idle', 0)
+        snapshot = leaderboard.snapshot_cache.get()
+        newcomer = UserLevel.objects.create(user=make_user('newcomer'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.add_xp(40)
+
+        self.assertEqual(len(snapshot), 2)
+        self.assertEqual((snapshot.rank_of(40), snapshot.rank_of(0)), (1, 2))
+
+    def test_rolled_back_award_leaves_the_snapshot_alone(self):
+        user_level = self.make_level('driver', 10)
+        snapshot = leaderboard.snapshot_cache.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                user_level.add_xp(500)
+                raise RuntimeError('badge award failed')
+
+        self.assertEqual((len(snapshot), snapshot.rank_of(10)), (1, 1))
+
+    def test_around_me_returns_the_neighbours(self):
+        for username, xp in [('a', 500), ('b', 400), ('c', 300), ('d', 300), ('e', 100)]:
+            self.make_level(username, xp)
+        me = User.objects.get(username='c')
+
+        board = self.get_board(me, around_me='true', size=1)
+
+        self.assertEqual(board, [('b', 2), ('c', 3), ('d', 3)])
+
+    def test_around_me_does_not_create_a_row(self):
+        self.make_level('a', 500)
+        self.make_level('b', 0)
+        me = make_user('newcomer')
+
+        board = self.get_board(me, around_me='true', size=1)
+
+        self.assertEqual(board, [('b', 2), ('newcomer', 2)])
+        self.assertFalse(UserLevel.objects.filter(user=me).exists())
+
+    def test_period_boards_only_count_xp_inside_the_window(self):
+        recent = self.make_level('recent', 0)
+        veteran = self.make_level('veteran', 0)
+        now = timezone.now()
+        for user_level, amount, days_ago in [(recent, 30, 1), (veteran, 20, 2), (veteran, 100, 20)]:
+            event = XPEvent.objects.create(user=user_level.user, amount=amount)
+            XPEvent.objects.filter(pk=event.pk).update(created_at=now - timedelta(days=days_ago))
+
+        self.assertEqual(self.get_board(recent.user, period='week'), [('recent', 1), ('veteran', 2)])
+        self.assertEqual(self.get_board(recent.user, period='month'), [('veteran', 1), ('recent', 2)])
+
+
+class BadgeEngineTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        # The registry outlives the test transaction; drop it with the rows
+        self.addCleanup(badge_registry.invalidate)
+        Badge.objects.create(
+            name='Test Writer', description='-', requirement='-', requirement_count=2, xp_reward=40
+        )
+        Badge.objects.create(
+            name='Test Starter', description='-', requirement='-', requirement_count=1, xp_reward=10
+        )
+
+    def test_unlocks_are_returned_in_the_order_they_happen(self):
+        engine = BadgeEngine(self.user)
+        engine.increment('Test Writer').increment('Test Starter').increment('Test Writer')
+
+        unlocked = engine.commit()
+
+        self.assertEqual([badge['name'] for badge in unlocked], ['Test Starter', 'Test Writer'])
+
+    def test_unlock_rewards_are_added_to_the_event_xp(self):
+        BadgeEngine(self.user).set_progress('Test Writer', 5).commit(xp=15)
+
+        self.assertEqual(UserLevel.objects.get(user=self.user).xp, 55)
+        user_badge = UserBadge.objects.get(user=self.user, badge__name='Test Writer')
+        self.assertTrue(user_badge.unlocked)
+        self.assertEqual(user_badge.progress, 2)
+
+    def test_unlocked_badges_are_not_awarded_again(self):
+        BadgeEngine(self.user).increment('Test Starter').commit()
+
+        unlocked = BadgeEngine(self.user).increment('Test Starter').increment('Missing').commit()
+
+        self.assertEqual(unlocked, [])
+        self.assertEqual(UserLevel.objects.get(user=self.user).xp, 10)
+        self.assertEqual(XPEvent.objects.filter(user=self.user).count(), 1)
+
+
+class LevelTableTests(TestCase):
+    def make_table(self, *levels):
+        return LevelTable([
+            Level(level_number=number, name=f'Level {number}', xp_required=xp)
+            for number, xp in levels
+        ])
+
+    def test_threshold_is_inclusive(self):
+        table = self.make_table((1, 0), (2, 100), (3, 250))
+
+        self.assertEqual(table.highest_for_xp(0).level_number, 1)
+        self.assertEqual(table.highest_for_xp(99).level_number, 1)
+        self.assertEqual(table.highest_for_xp(100).level_number, 2)
+        self.assertEqual(table.highest_for_xp(249).level_number, 2)
+        self.assertEqual(table.highest_for_xp(250).level_number, 3)
+        self.assertEqual(table.highest_for_xp(10 ** 6).level_number, 3)
+
+    def test_below_the_first_threshold_there_is_no_level(self):
+        table = self.make_table((1, 10), (2, 100))
+
+        self.assertIsNone(table.highest_for_xp(9))
+        self.assertIsNone(self.make_table().highest_for_xp(100))
+
+    def test_highest_level_wins_on_shared_or_inverted_thresholds(self):
+        table = self.make_table((1, 0), (2, 100), (3, 100), (4, 50))
+
+        self.assertEqual(table.highest_for_xp(50).level_number, 4)
+        self.assertEqual(table.highest_for_xp(100).level_number, 4)
+        self.assertEqual(table.get(3).xp_required, 100)
+        self.assertIsNone(table.get(5))
+
+
+class BadgeProgressReadTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(badge_registry.invalidate)
+        self.badge = Badge.objects.create(
+            name='Test Writer', description='-', requirement='-', requirement_count=4
+        )
+
+    def test_my_badges_lists_every_active_badge_without_creating_rows(self):
+        BadgeEngine(self.user).increment('Test Writer').commit()
+
+        response = self.client.get('/api/gamification/user-badges/my_badges/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), Badge.objects.filter(is_active=True).count())
+        by_name = {badge['name']: badge for badge in response.data}
+        self.assertEqual(by_name['Test Writer']['progress'], 1)
+        self.assertEqual(UserBadge.objects.filter(user=self.user).count(), 1)
+
+    def test_profile_reads_write_nothing(self):
+        other = make_user('passenger')
+
+        self.client.get(f'/api/gamification/user-badges/user_badges/?user_id={other.id}')
+        response = self.client.get(f'/api/gamification/user/{self.user.id}/')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(UserBadge.objects.exists())
+        self.assertFalse(UserLevel.objects.exists())
+        self.assertFalse(UserStreak.objects.exists())
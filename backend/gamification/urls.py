@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     LevelViewSet, UserLevelViewSet, BadgeViewSet, UserBadgeViewSet, 
-    UserStreakViewSet, user_gamification
+    UserStreakViewSet, BadgeNotificationViewSet, user_gamification
 )
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register(r'user-levels', UserLevelViewSet)
 router.register(r'badges', BadgeViewSet)
 router.register(r'user-badges', UserBadgeViewSet)
 router.register(r'streaks', UserStreakViewSet)
+router.register(r'notifications', BadgeNotificationViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
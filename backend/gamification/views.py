@@ -3,11 +3,12 @@ from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth.models import User
-from .models import Level, UserLevel, Badge, UserBadge, UserStreak
+from .models import Level, UserLevel, Badge, UserBadge, UserStreak, BadgeNotification
 from .serializers import (
     LevelSerializer, UserLevelSerializer, BadgeSerializer, UserBadgeSerializer, 
-    UserStreakSerializer, UserGamificationSerializer
+    UserStreakSerializer, UserGamificationSerializer, BadgeNotificationSerializer
 )
+from .badges import badges_with_progress
 
 
 class LevelViewSet(viewsets.ReadOnlyModelViewSet):
@@ -38,10 +39,51 @@ class UserLevelViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['get'])
     def leaderboard(self, request):
-        """Get top users by XP"""
-        top_users = UserLevel.objects.select_related('user').order_by('-xp')[:100]
-        serializer = self.get_serializer(top_users, many=True)
-        return Response(serializer.data)
+        """Get top users by XP
+        
+        Query params:
+        - period: 'all', 'week', 'month' (default: 'all'); week/month rank by XP earned in the period
+        - limit: number of users (default: 100, max: 100)
+        - around_me: 'true' to return the current user and their neighbours instead
+        - size: neighbours on each side for around_me (default: 5, max: 50)
+        """
+        from . import leaderboard
+        
+        period = request.query_params.get('period', 'all')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 100)), 1), 100)
+            size = min(max(int(request.query_params.get('size', 5)), 0), 50)
+        except (ValueError, TypeError):
+            limit, size = 100, 5
+        
+        if period in leaderboard.PERIODS:
+            rows = leaderboard.period_top(period, limit)
+            user_levels = UserLevel.objects.select_related('user').in_bulk(
+                [user_id for rank, user_id, period_xp in rows], field_name='user_id'
+            )
+            data = []
+            for rank, user_id, period_xp in rows:
+                if user_id not in user_levels:
+                    continue
+                entry = self.get_serializer(user_levels[user_id]).data
+                entry['rank'] = rank
+                entry['period_xp'] = period_xp
+                data.append(entry)
+            return Response(data)
+        
+        if request.query_params.get('around_me') in ['true', '1']:
+            # Users without a row rank as 0 XP; reads never create one
+            user_level = UserLevel.objects.filter(user=request.user).first() or UserLevel(user=request.user)
+            ranked = leaderboard.around(user_level, size)
+        else:
+            ranked = leaderboard.top(limit)
+        
+        data = []
+        for rank, user_level in ranked:
+            entry = self.get_serializer(user_level).data
+            entry['rank'] = rank
+            data.append(entry)
+        return Response(data)
 
 
 class BadgeViewSet(viewsets.ReadOnlyModelViewSet):
@@ -76,16 +118,8 @@ class UserBadgeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_badges(self, request):
         """Get current user's badges"""
-        # Get all active badges
-        all_badges = Badge.objects.filter(is_active=True)
-        user_badges = []
-        
-        for badge in all_badges:
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=request.user,
-                badge=badge
-            )
-            user_badges.append(user_badge)
+        # All active badges with progress; badges not started yet are not saved
+        user_badges = badges_with_progress(request.user)
         
         serializer = self.get_serializer(user_badges, many=True)
         return Response(serializer.data)
@@ -108,16 +142,8 @@ class UserBadgeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get all active badges
-        all_badges = Badge.objects.filter(is_active=True)
-        user_badges = []
-        
-        for badge in all_badges:
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=user,
-                badge=badge
-            )
-            user_badges.append(user_badge)
+        # All active badges with progress; badges not started yet are not saved
+        user_badges = badges_with_progress(user)
         
         serializer = self.get_serializer(user_badges, many=True)
         return Response(serializer.data)
@@ -146,6 +172,30 @@ class UserStreakViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
+class BadgeNotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """API endpoint for badges unlocked by queued gamification events"""
+    queryset = BadgeNotification.objects.all()
+    serializer_class = BadgeNotificationSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Current user's notifications; ?unread=true for unseen ones only"""
+        queryset = BadgeNotification.objects.filter(user=self.request.user).select_related('badge')
+        if self.request.query_params.get('unread') in ['true', '1']:
+            queryset = queryset.filter(is_read=False)
+        return queryset
+    
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Mark the given notification IDs (or all of them) as read"""
+        queryset = BadgeNotification.objects.filter(user=request.user, is_read=False)
+        ids = request.data.get('ids')
+        if ids:
+            queryset = queryset.filter(id__in=ids)
+        updated = queryset.update(is_read=True)
+        return Response({'marked_read': updated})
+
+
 @api_view(['GET'])
 def user_gamification(request, user_id):
     """Get complete gamification data for a user"""
@@ -160,12 +210,12 @@ def user_gamification(request, user_id):
     # Check if user is viewing their own profile
     is_own_profile = request.user.is_authenticated and request.user.id == user_id
     
-    # Get or create user level
-    user_level, created = UserLevel.objects.get_or_create(user=user)
+    # Read-only: users without XP yet get an unsaved level 1 entry
+    user_level = UserLevel.objects.filter(user=user).first() or UserLevel(user=user)
     
-    # Calculate leaderboard position
-    higher_ranked = UserLevel.objects.filter(xp__gt=user_level.xp).count()
-    leaderboard_position = higher_ranked + 1
+    # Calculate leaderboard position (bisect over the cached XP snapshot)
+    from .leaderboard import rank_of
+    leaderboard_position = rank_of(user_level)
     
     # Serialize data - level and leaderboard are always public
     data = {
@@ -176,19 +226,12 @@ def user_gamification(request, user_id):
     
     if is_own_profile:
         # For own profile: show all badges with progress
-        all_badges = Badge.objects.filter(is_active=True)
-        user_badges = []
-        for badge in all_badges:
-            user_badge, created = UserBadge.objects.get_or_create(
-                user=user,
-                badge=badge
-            )
-            user_badges.append(user_badge)
+        user_badges = badges_with_progress(user)
         
         data['badges'] = UserBadgeSerializer(user_badges, many=True, context={'request': request}).data
         
-        # Get or create streak
-        user_streak, created = UserStreak.objects.get_or_create(user=user)
+        # Streak (unsaved until the first daily login is tracked)
+        user_streak = UserStreak.objects.filter(user=user).first() or UserStreak(user=user)
         data['streak_data'] = UserStreakSerializer(user_streak, context={'request': request}).data
     else:
         # For other profiles (including unauthenticated): only show earned badges (public showcase)
@@ -1123,7 +1123,7 @@ export default function ProfilePage() {
                               <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-4">
                                 {gamification.badges.map((badge: any) => (
                                   <div
-                                    key={badge.id}
+                                    key={badge.id ?? badge.name}
                                     className={`border rounded-lg p-4 transition ${
                                       badge.unlocked
                                         ? 'border-green-300 bg-green-50 hover:border-green-500 hover:shadow-md'
@@ -6,6 +6,9 @@ import { buildApiUrl, getSiteUrl } from '@/lib/config';
 export const dynamic = 'force-dynamic';
 export const revalidate = 3600; // Revalidate every hour
 
+// Topics fetched per request to the sitemap export
+const TOPICS_PER_REQUEST = 10000;
+
 export default async function sitemap(): Promise<MetadataRoute.Sitemap> {
   // Get site URL from admin settings
   const settings = await getSiteSettings();
@@ -56,25 +59,32 @@ export default async function sitemap(): Promise<MetadataRoute.Sitemap> {
     console.error('Error fetching categories for sitemap:', error);
   }
 
-  // Fetch topics (limit to recent 1000 for performance)
+  // Fetch every topic from the lightweight sitemap export, one range at a time
   let topicPages: MetadataRoute.Sitemap = [];
   try {
-    const topicsUrl = buildApiUrl('/topics/?page_size=1000');
-    
-    console.log('Fetching topics from:', topicsUrl);
-    
-    const topicsRes = await fetch(topicsUrl, {
-      next: { revalidate: 3600 }
-    });
-    if (topicsRes.ok) {
-      const data = await topicsRes.json();
-      const topics = data.results || data;
-      topicPages = topics.map((topic: any) => ({
-        url: `${baseUrl}/topic/${topic.id}`,
-        lastModified: new Date(topic.updated_at || topic.created_at),
-        changeFrequency: 'weekly' as const,
-        priority: 0.7,
-      }));
+    let after: number | null = 0;
+    while (after !== null) {
+      const topicsUrl = buildApiUrl(`/sitemap/topics/?after=${after}&limit=${TOPICS_PER_REQUEST}`);
+
+      console.log('Fetching topics from:', topicsUrl);
+
+      const topicsRes = await fetch(topicsUrl, {
+        next: { revalidate: 3600 }
+      });
+      if (!topicsRes.ok) {
+        break;
+      }
+      // Rows are [id, updated_at, category_id]
+      const data: { topics: [number, string, number][]; next_after: number | null } = await topicsRes.json();
+      for (const [id, updatedAt] of data.topics) {
+        topicPages.push({
+          url: `${baseUrl}/topic/${id}`,
+          lastModified: new Date(updatedAt),
+          changeFrequency: 'weekly' as const,
+          priority: 0.7,
+        });
+      }
+      after = data.next_after;
     }
   } catch (error) {
     console.error('Error fetching topics for sitemap:', error);
@@ -1,7 +1,7 @@
 'use client';
 
-import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
-import { getBanners, trackBannerImpression as apiTrackImpression, trackBannerClick as apiTrackClick } from '@/lib/api';
+import React, { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react';
+import { getBanners, trackBannerEvents, trackBannerClick as apiTrackClick } from '@/lib/api';
 import { AdBanner } from '@/types';
 
 interface BannersContextType {
@@ -14,9 +14,39 @@ interface BannersContextType {
 
 const BannersContext = createContext<BannersContextType | undefined>(undefined);
 
+// Impressions are collected and sent in one request after this delay
+const IMPRESSION_BATCH_DELAY = 2000;
+
 export const BannersProvider = ({ children }: { children: React.ReactNode }) => {
   const [banners, setBanners] = useState<AdBanner[]>([]);
   const [loading, setLoading] = useState(true);
+  const pendingImpressions = useRef<number[]>([]);
+  const flushTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  const flushImpressions = useCallback(async () => {
+    flushTimer.current = null;
+    const bannerIds = pendingImpressions.current;
+    pendingImpressions.current = [];
+    if (bannerIds.length === 0) return;
+
+    try {
+      await trackBannerEvents(bannerIds.map((banner) => ({ banner, type: 'impression' as const })));
+    } catch (error) {
+      console.error('Failed to track impressions:', error);
+      bannerIds.forEach((bannerId) => sessionStorage.removeItem(`banner_impression_${bannerId}`));
+    }
+  }, []);
+
+  useEffect(() => {
+    // Send whatever is still queued when the page is hidden or closed
+    const onHide = () => {
+      if (document.visibilityState === 'hidden') {
+        flushImpressions();
+      }
+    };
+    document.addEventListener('visibilitychange', onHide);
+    return () => document.removeEventListener('visibilitychange', onHide);
+  }, [flushImpressions]);
 
   useEffect(() => {
     const fetchBanners = async () => {
@@ -62,11 +92,10 @@ export const BannersProvider = ({ children }: { children: React.ReactNode }) =>
     const hasTracked = sessionStorage.getItem(sessionKey);
 
     if (!hasTracked) {
-      try {
-        await apiTrackImpression(bannerId);
-        sessionStorage.setItem(sessionKey, 'true');
-      } catch (error) {
-        console.error('Failed to track impression:', error);
+      sessionStorage.setItem(sessionKey, 'true');
+      pendingImpressions.current.push(bannerId);
+      if (!flushTimer.current) {
+        flushTimer.current = setTimeout(flushImpressions, IMPRESSION_BATCH_DELAY);
       }
     }
   };
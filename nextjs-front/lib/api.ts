@@ -118,14 +118,17 @@ export const getCategories = async () => {
 
 export const getCategoryTopics = async (
   categoryId: string | number,
-  params?: { page?: number; page_size?: number; ordering?: string }
+  params?: { page?: number; page_size?: number; ordering?: string; pagination?: 'cursor'; cursor?: string }
 ) => {
   const response = await api.get(`/categories/${categoryId}/topics/`, { params });
   return response.data;
 };
 
 // Topics APIs
-export const getTopics = async (params?: { page?: number; page_size?: number }) => {
+// pagination: 'cursor' returns next/previous links with a cursor param instead of page numbers
+export const getTopics = async (
+  params?: { page?: number; page_size?: number; pagination?: 'cursor'; cursor?: string; count?: 'exact' | 'estimate' }
+) => {
   const response = await api.get('/topics/', { params });
   return response.data;
 };
@@ -263,6 +266,8 @@ export const searchAll = async (
     category?: string | number; 
     min_replies?: number;
     sort?: string;
+    page?: number;
+    page_size?: number;
   }
 ) => {
   const response = await api.get('/search/', { 
@@ -317,14 +322,38 @@ export const trackBannerClick = async (bannerId: string | number) => {
   return response.data;
 };
 
+// Send several impression/click events in one request
+export const trackBannerEvents = async (
+  events: { banner: number; type: 'impression' | 'click'; count?: number }[]
+) => {
+  const response = await api.post('/advertisements/banners/track/', { events });
+  return response.data;
+};
+
 // Gamification APIs
 export const getUserGamification = async (userId: string | number) => {
   const response = await api.get(`/gamification/user/${userId}/`);
   return response.data;
 };
 
-export const getLeaderboard = async () => {
-  const response = await api.get('/gamification/leaderboard/');
+export const getLeaderboard = async (params?: {
+  period?: 'all' | 'week' | 'month';
+  limit?: number;
+  around_me?: boolean;
+}) => {
+  const response = await api.get('/gamification/user-levels/leaderboard/', { params });
+  return response.data;
+};
+
+export const getBadgeNotifications = async (unreadOnly = true) => {
+  const response = await api.get('/gamification/notifications/', {
+    params: unreadOnly ? { unread: 'true' } : {}
+  });
+  return response.data;
+};
+
+export const markBadgeNotificationsRead = async (ids?: number[]) => {
+  const response = await api.post('/gamification/notifications/mark_read/', ids ? { ids } : {});
   return response.data;
 };
 
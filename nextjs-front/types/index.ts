@@ -86,6 +86,8 @@ export interface TopicImage {
   image_url?: string;
   caption?: string;
   order: number;
+  // 'pending' until the upload worker has stored the file (image_url is null until then)
+  status?: 'pending' | 'ready' | 'failed';
   created_at: string;
 }
 
@@ -131,6 +133,8 @@ export interface ReplyImage {
   image_url: string;
   caption: string;
   order: number;
+  // 'pending' until the upload worker has stored the file (image_url is null until then)
+  status?: 'pending' | 'ready' | 'failed';
   created_at: string;
 }
 
@@ -203,9 +207,12 @@ export interface PaginatedResponse<T> {
 }
 
 export interface SearchResults {
-  topics: Topic[];
+  topics: (Topic & { snippet?: string })[];
   users: UserProfile[];
   categories: Category[];
+  topics_count?: number;
+  page?: number;
+  page_size?: number;
 }
 
 export interface ReportReason {